@@ -8,9 +8,11 @@ import re
 import numpy as np
 import uuid 
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from src.agents.ingestion import csv_ingestion
 from src.agents.document_ingestion import document_ingestion
 from src.agents.analytical_agent import analytical_agent
+from src.utils.tables import table_to_dataframe
 
 # Page config
 st.set_page_config(
@@ -1007,6 +1009,23 @@ def clear_vector_db():
         st.error(f"Error clearing vector DB: {str(e)}")
         return False
 
+@st.cache_resource
+def get_cleanup_pool():
+    """Background workers for deleting temporary upload files (one per server)"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="cleanup")
+
+def _unlink_quietly(path):
+    """Delete a file, ignoring files that are already gone"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def cleanup_temp_file(path):
+    """Delete a temporary upload file without blocking the response"""
+    if path:
+        get_cleanup_pool().submit(_unlink_quietly, path)
+
 def clean_numeric_string(value):
     """Clean malformed numeric strings"""
     if pd.isna(value) or value == '':
@@ -1049,6 +1068,7 @@ def clean_csv_data(df):
 
 def load_csv_file(uploaded_file, clean_data=True):
     """Load a CSV file and ingest it"""
+    tmp_path = None
     try:
         df = pd.read_csv(uploaded_file)
         original_shape = df.shape
@@ -1064,8 +1084,6 @@ def load_csv_file(uploaded_file, clean_data=True):
         
         file_id, metadata = csv_ingestion.ingest_csv(tmp_path, vectorize=True)
         
-        os.unlink(tmp_path)
-        
         return {
             'name': uploaded_file.name,
             'file_id': file_id,
@@ -1084,9 +1102,12 @@ def load_csv_file(uploaded_file, clean_data=True):
             'error': str(e),
             'type': 'csv'
         }
+    finally:
+        cleanup_temp_file(tmp_path)
 
 def load_document_file(uploaded_file):
     """Load a document file (TXT/DOCX)"""
+    tmp_path = None
     try:
         with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded_file.name).suffix, mode='wb') as tmp_file:
             tmp_file.write(uploaded_file.getvalue())
@@ -1094,8 +1115,6 @@ def load_document_file(uploaded_file):
         
         file_id, metadata = document_ingestion.ingest_document(tmp_path, vectorize=True)
         
-        os.unlink(tmp_path)
-        
         return {
             'name': uploaded_file.name,
             'file_id': file_id,
@@ -1110,6 +1129,8 @@ def load_document_file(uploaded_file):
             'error': str(e),
             'type': 'document'
         }
+    finally:
+        cleanup_temp_file(tmp_path)
 
 def display_results(result):
     """Display query results"""
@@ -1196,7 +1217,7 @@ def display_results(result):
                 st.metric("Result", values)
         
         if 'result_table' in result and result['result_table']:
-            result_df = pd.DataFrame(result['result_table'])
+            result_df = table_to_dataframe(result['result_table'])
             st.dataframe(result_df, use_container_width=True)
             
             csv = result_df.to_csv(index=False)
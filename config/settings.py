@@ -3,12 +3,16 @@ Configuration settings for the Analytical AI Agent
 """
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Idle OpenMP workers (FAISS) sleep instead of spinning, so they do not compete
+# with BLAS and pandas threads; only read when the OpenMP runtime loads
+os.environ.setdefault("OMP_WAIT_POLICY", "PASSIVE")
+
 class Settings:
     """Global settings for the agent"""
     
@@ -17,6 +21,9 @@ class Settings:
     
     # Model names
     EMBEDDING_MODEL: str = "models/gemini-embedding-001"
+    # Truncated embedding size requested from the API (e.g. 768 or 1536);
+    # None keeps the model's full 3072 dimensions
+    EMBEDDING_OUTPUT_DIMENSIONALITY: Optional[int] = None
     GENERATIVE_MODEL: str = "gemini-2.0-flash-exp"
 
     
@@ -26,16 +33,57 @@ class Settings:
     INPUT_DIR: Path = DATA_DIR / "input"
     VECTOR_DIR: Path = DATA_DIR / "vectors"
     DOCUMENTS_DIR: Path = DATA_DIR / "documents"  # NEW: For document storage
+    CACHE_DIR: Path = BASE_DIR / ".cache"
     
     # Vector DB settings
-    VECTOR_DIMENSION: int = 3072
-    FAISS_INDEX_TYPE: str = "Flat"
+    VECTOR_DIMENSION: int = EMBEDDING_OUTPUT_DIMENSIONALITY or 3072
+    FAISS_INDEX_TYPE: str = "HNSW"  # "HNSW" (approximate, sub-linear) or "Flat" (exact)
+    HNSW_M: int = 32  # Graph neighbours per node
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 64  # Default search breadth; higher = better recall, slower
+    HNSW_MIN_VECTORS: int = 1000  # Smaller HNSW stores are searched exhaustively (exact)
+    # Stores first filled with at least this many vectors use an inverted-file
+    # (IVF) index with ~sqrt(N) lists instead of FAISS_INDEX_TYPE
+    IVF_MIN_VECTORS: int = 1000000
+    IVF_NPROBE: int = 0  # Lists scanned per query (0 = nlist // 16)
+    IVF_TRAINING_POINTS_PER_LIST: int = 64  # Training sample size per list
+    VECTOR_QUANTIZATION: str = "sq8"  # "fp32", "sq8" (int8 scalar) or "pq" (product)
+    PQ_SUBQUANTIZERS: int = 96  # Bytes per vector with "pq"; must divide VECTOR_DIMENSION
+    PQ_MIN_TRAINING_VECTORS: int = 9984  # Smaller stores fall back to "sq8"
+    SEARCH_WORKERS: int = 4  # Threads used when a query spans several stores
+    # OpenMP threads for a single-query FAISS search (0 = FAISS default); one
+    # query is faster on one core, and several stores are already searched in parallel
+    FAISS_SEARCH_THREADS: int = 1
+    # Brute-force batched searches of fp32 flat stores on a GPU (needs a GPU
+    # build of FAISS); smaller batches stay on CPU where transfers dominate
+    USE_GPU: bool = os.getenv("USE_GPU", "false").lower() == "true"
+    GPU_MIN_QUERIES: int = 32
+    VECTOR_STORE_CACHE_SIZE: int = 32  # Saved vector stores kept in memory (LRU)
+    STORE_LIST_TTL_SECONDS: float = 5.0  # Reuse of the vector directory listing
     
     # Document settings
     SUPPORTED_DOCUMENT_TYPES: List[str] = ['.txt', '.docx']  # NEW
     DEFAULT_CHUNK_SIZE: int = 1000  # NEW: Characters per chunk
     DEFAULT_CHUNK_OVERLAP: int = 200  # NEW: Overlap between chunks
     
+    # CSV parser: "pyarrow" (multithreaded, falls back to "c" on failure) or "c"
+    CSV_ENGINE: str = "pyarrow"
+    
+    # Background embedding threads for ingest(..., async_batch=True)
+    ASYNC_INGEST_WORKERS: int = 2
+    
+    # batchEmbedContents requests in flight when a file needs several batches
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    
+    # Documents ingested concurrently by ingest_documents
+    INGEST_WORKERS: int = 8
+    
+    # Threshold filters on at least this many rows use numexpr (if installed)
+    NUMEXPR_MIN_ROWS: int = 100000
+    
+    # Rows returned by a sort without an explicit limit
+    MAX_SORT_ROWS: int = 10000
+    
     # Supported intents
     SUPPORTED_INTENTS: List[str] = [
         "compare_averages",
@@ -48,9 +96,67 @@ class Settings:
         "document_query"  # NEW: For document-based queries
     ]
     
+    # Query embeddings kept in memory (also persisted under CACHE_DIR)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 4096
+    # Concurrent query embeddings are coalesced for up to this long (0 disables)
+    QUERY_EMBED_BATCH_WAIT_MS: float = 20.0
+    QUERY_EMBED_BATCH_SIZE: int = 64
+    # Document search results reused for repeated (query, file_id, top_k)
+    # lookups until documents are added (0 disables)
+    RETRIEVAL_CACHE_SIZE: int = 256
+    
+    # Disk caches of query embeddings, narratives and document answers: rows
+    # kept per file (oldest deleted first) and entry lifetime (None = no expiry)
+    DISK_CACHE_MAX_ENTRIES: int = 20000
+    DISK_CACHE_TTL_SECONDS: Optional[float] = 30 * 24 * 3600.0
+    
+    # Document embeddings kept in memory (persisted under CACHE_DIR, keyed by text hash)
+    EMBEDDING_CACHE_SIZE: int = 20000
+    EMBEDDING_CACHE_INT8: bool = True  # Persist document and query embeddings as int8 + per-vector scale
+    
+    # Texts whose SimHash differs in at most this many bits share one embedding
+    # at ingestion (e.g. 3); None embeds every distinct text
+    NEAR_DUPLICATE_MAX_HAMMING: Optional[int] = None
+    
     # LLM settings
     MAX_TOKENS: int = 2048
     TEMPERATURE: float = 0.1
+    NARRATIVE_TEMPERATURE: float = 0.0  # Deterministic, so narratives can be cached
+    NARRATIVE_CACHE_ENABLED: bool = True
+    DOCUMENT_ANSWER_CACHE_ENABLED: bool = True  # Reuse answers for identical question + context
+    # Parse formulaic queries ("top 5 by price", "rows where x > 3") with
+    # regular expressions instead of the LLM
+    INTENT_RULES_ENABLED: bool = True
+    
+    # In-process reuse of parsed intents, enhanced prompts and general answers
+    # for byte-identical prompts (same query and loaded files)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIZE: int = 4096
+    RESPONSE_CACHE_TTL_SECONDS: Optional[float] = 3600.0
+    # Reuse parsed intents, enhanced prompts and document answers for paraphrased
+    # queries whose embeddings are at least this similar (same loaded files /
+    # retrieved context only). Off by default: near-identical wordings such as
+    # "top 5" and "top 10" can embed above the threshold.
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000  # Per loaded-files / context namespace
+    SEMANTIC_CACHE_TTL_SECONDS: Optional[float] = 3600.0
+    # Random-projection LSH tables for the lookup (e.g. 4); 0 compares every entry
+    SEMANTIC_CACHE_LSH_TABLES: int = 0
+    SEMANTIC_CACHE_LSH_BITS: int = 8
+    # HNSW graph neighbours per node for the lookup (e.g. 16; used instead of
+    # LSH or the full scan); worthwhile once namespaces hold ~10K+ entries
+    SEMANTIC_CACHE_HNSW_M: int = 0
+    # Client-side cap on generation requests (e.g. 10 for a 10 RPM quota);
+    # None sends requests as they come
+    GENERATION_REQUESTS_PER_MINUTE: Optional[float] = None
+    GENERATION_BURST: int = 1  # Requests allowed back to back under the cap
+    # Retries of rate-limited/unavailable/timed-out generation requests, with
+    # exponential backoff and full jitter (0 fails on the first error)
+    GENERATION_MAX_RETRIES: int = 3
+    GENERATION_RETRY_BASE_DELAY: float = 1.0  # Seconds; doubles per attempt
+    GENERATION_RETRY_MAX_DELAY: float = 30.0
+    LLM_MAX_CONCURRENCY: int = 8  # Gemini requests in flight at once in batched processing
     
     # Pandas display settings
     MAX_ROWS_DISPLAY: int = 100
@@ -58,6 +164,13 @@ class Settings:
     # Enable fallback to general query for unrecognized intents
     ENABLE_GENERAL_QUERY_FALLBACK: bool = True
     
+    # Warm the Gemini connection and saved vector stores when the agent is imported
+    WARMUP_ON_IMPORT: bool = os.getenv("WARMUP_ON_IMPORT", "false").lower() == "true"
+    
+    # Record timing spans of pipeline stages (reported by get_status)
+    TRACE_SPANS: bool = os.getenv("TRACE_SPANS", "false").lower() == "true"
+    TRACE_MAX_SAMPLES: int = 1000  # Durations kept per span name
+    
     @classmethod
     def validate(cls) -> bool:
         """Validate settings"""
@@ -71,6 +184,13 @@ class Settings:
         
         return True
     
+    @classmethod
+    def get_embedding_namespace(cls) -> str:
+        """Get the model identifier embedding caches are keyed by"""
+        if cls.EMBEDDING_OUTPUT_DIMENSIONALITY:
+            return f"{cls.EMBEDDING_MODEL}@{cls.EMBEDDING_OUTPUT_DIMENSIONALITY}"
+        return cls.EMBEDDING_MODEL
+    
     @classmethod
     def get_vector_db_path(cls, file_id: str) -> Path:
         """Get path for vector DB file"""
@@ -80,6 +200,11 @@ class Settings:
     def get_metadata_path(cls, file_id: str) -> Path:
         """Get path for metadata file"""
         return cls.VECTOR_DIR / f"{file_id}_metadata.pkl"
+    
+    @classmethod
+    def get_metadata_table_path(cls, file_id: str) -> Path:
+        """Get path for columnar (Parquet) metadata file"""
+        return cls.VECTOR_DIR / f"{file_id}_metadata.parquet"
 
 
 # Create settings instance
@@ -10,6 +10,7 @@ from pathlib import Path
 from config.settings import settings
 from src.agents.ingestion import csv_ingestion
 from src.agents.analytical_agent import analytical_agent
+from src.utils.tables import table_length, table_rows
 
 
 def print_result(result: dict, pretty: bool = True):
@@ -39,11 +40,12 @@ def print_result(result: dict, pretty: bool = True):
             
             print(f"\n📋 RESULT TABLE (first 5 rows):")
             result_table = result.get('result_table', [])
-            if result_table:
-                for i, row in enumerate(result_table[:5]):
+            num_rows = table_length(result_table)
+            if num_rows:
+                for i, row in enumerate(table_rows(result_table, 5)):
                     print(f"  Row {i+1}: {row}")
-                if len(result_table) > 5:
-                    print(f"  ... and {len(result_table) - 5} more rows")
+                if num_rows > 5:
+                    print(f"  ... and {num_rows - 5} more rows")
             else:
                 print("  (empty)")
         print("="*80 + "\n")
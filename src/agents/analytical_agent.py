@@ -2,14 +2,21 @@
 Main Analytical AI Agent
 Orchestrates intent parsing, pandas analysis, document queries, and narrative generation
 """
-from typing import Dict, Any, List, Optional
+from typing import Awaitable, Dict, Any, List, Optional, Tuple, Union, Iterator, Callable
+import asyncio
 import json
+import logging
+
+import numpy as np
+from pydantic import TypeAdapter
 
 from config.settings import settings
-from src.utils.gemini_client import gemini_client
+from src.utils.gemini_client import gemini_client, embed_query
+from src.utils.numeric import distances_to_similarities, result_distances
+from src.utils.tables import gather_table
+from src.utils.tracing import span, span_recorder
 from src.utils.models import (
     AnalysisResult,
-    ErrorResponse,
     CompareAveragesParams,
     FilterThresholdParams,
     SortParams,
@@ -23,89 +30,184 @@ from src.agents.document_ingestion import document_ingestion
 from src.agents.pandas_engine import pandas_engine
 from src.vectordb.vector_store import vector_store_manager
 
+logger = logging.getLogger(__name__)
+
+
+def error_response(
+    error: str,
+    details: Optional[str] = None,
+    supported_intents: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Build an ErrorResponse payload as a plain dict
+    
+    Error paths carry no untrusted data, so the pydantic round-trip is skipped.
+    Unset optional fields are left out of the payload.
+    
+    Args:
+        error: Error code
+        details: Human-readable details
+        supported_intents: Intents the agent accepts
+        
+    Returns:
+        Error dict with the ErrorResponse fields
+    """
+    response: Dict[str, Any] = {"error": error}
+    if supported_intents is not None:
+        response["supported_intents"] = supported_intents
+    if details is not None:
+        response["details"] = details
+    return response
+
+
+def result_response(
+    intent: str,
+    parameters: Dict[str, Any],
+    user_query: str,
+    result_table: Any,
+    numbers: Dict[str, Any],
+    narrative: str
+) -> Dict[str, Any]:
+    """
+    Build an AnalysisResult payload as a plain dict
+    
+    Used for answers assembled by the agent itself (general and document
+    queries), which need no pydantic round-trip either.
+    
+    Args:
+        intent: Intent that produced the result
+        parameters: Parsed parameters
+        user_query: Original user query
+        result_table: Result rows
+        numbers: Computed numbers
+        narrative: Narrative text
+        
+    Returns:
+        Result dict with the AnalysisResult fields
+    """
+    return {
+        "result_table": result_table,
+        "numbers": numbers,
+        "narrative": narrative,
+        "metadata": {
+            "intent": intent,
+            "parameters": parameters,
+            "query": user_query
+        }
+    }
 
 class AnalyticalAgent:
     """Main agent for analytical queries"""
     
     def __init__(self):
         """Initialize agent"""
-        self.supported_intents = settings.SUPPORTED_INTENTS
+        # frozenset for O(1) membership checks; the list keeps the configured
+        # order for payloads and JSON
+        self.supported_intents = frozenset(settings.SUPPORTED_INTENTS)
+        self._supported_intents_list = list(settings.SUPPORTED_INTENTS)
+        
+        # intent -> (parameter validator, handler) for the deterministic intents.
+        # TypeAdapters are compiled once here instead of on every request.
+        self._dispatch: Dict[str, Tuple[TypeAdapter, Callable]] = {
+            "compare_averages": (TypeAdapter(CompareAveragesParams), pandas_engine.compare_averages),
+            "filter_threshold": (TypeAdapter(FilterThresholdParams), pandas_engine.filter_threshold),
+            "sort": (TypeAdapter(SortParams), pandas_engine.sort_data),
+            "top_n": (TypeAdapter(TopNParams), pandas_engine.top_n),
+            "compare_top": (TypeAdapter(CompareTopParams), pandas_engine.compare_top),
+            "explain_row": (TypeAdapter(ExplainRowParams), self._explain_row),
+        }
     
-    def process_query(self, user_query: str, enhance_prompt: bool = False) -> Dict[str, Any]:
+    def process_query(
+        self, 
+        user_query: str, 
+        enhance_prompt: bool = False,
+        stream: bool = False
+    ) -> Union[Dict[str, Any], Tuple[Dict[str, Any], Optional[Iterator[str]]]]:
         """
         Process a user query end-to-end
         
         Args:
             user_query: Natural language query
             enhance_prompt: Whether to enhance the query first
+            stream: Return the result before the narrative is generated
             
         Returns:
-            AnalysisResult or ErrorResponse as dict
+            AnalysisResult or ErrorResponse as dict. With stream=True, a
+            (result, narrative_stream) tuple: the result has an empty narrative
+            and narrative_stream yields it as the LLM generates text. The stream
+            is None when the narrative is already part of the result (errors,
+            general queries and document queries without matching passages).
         """
+        result, narrative_stream = self._process(user_query, enhance_prompt, stream)
+        if stream:
+            return result, narrative_stream
+        return result
+    
+    def _process(
+        self, 
+        user_query: str, 
+        enhance_prompt: bool,
+        stream: bool
+    ) -> Tuple[Dict[str, Any], Optional[Iterator[str]]]:
+        """Run the query pipeline, optionally deferring the narrative"""
         try:
             # Step 1: Optional prompt enhancement
             if enhance_prompt:
                 user_query = gemini_client.enhance_prompt(user_query)
-                print(f"Enhanced query: {user_query}")
+                logger.debug("enhanced query=%s", user_query)
             
             # Step 2: Get all available data sources
-            csv_metadata_list = [
-                meta.dict() for meta in csv_ingestion.file_metadata.values()
-            ]
-            doc_metadata_list = [
-                meta.dict() for meta in document_ingestion.document_metadata.values()
-            ]
+            csv_metadata_list = csv_ingestion.compact_metadata_dicts()
+            doc_metadata_list = document_ingestion.compact_metadata_dicts()
             
             if not csv_metadata_list and not doc_metadata_list:
-                return ErrorResponse(
+                return error_response(
                     error="no_data",
                     details="No CSV or document files have been loaded. Please ingest data first."
-                ).dict()
+                ), None
             
             # Step 3: Parse intent using LLM
-            intent_data = gemini_client.parse_intent(
-                user_query, 
-                csv_metadata_list,
-                doc_metadata_list
-            )
-            
-            intent = intent_data.get("intent")
-            parameters = intent_data.get("parameters", {})
-            
-            # Check if intent is supported
-            if intent not in self.supported_intents:
-                if settings.ENABLE_GENERAL_QUERY_FALLBACK:
-                    intent = "general_query"
-                    parameters = {"question": user_query}
-                else:
-                    return ErrorResponse(
-                        error="unsupported_intent",
-                        supported_intents=self.supported_intents,
-                        details=f"Intent '{intent}' is not supported"
-                    ).dict()
+            with span("agent.parse_intent"):
+                intent_data = gemini_client.parse_intent(
+                    user_query, 
+                    csv_metadata_list,
+                    doc_metadata_list
+                )
             
-            print(f"Parsed intent: {intent}")
-            print(f"Parameters: {parameters}")
+            intent, parameters, error = self._resolve_intent(user_query, intent_data)
+            if error is not None:
+                return error, None
             
             # Step 4: Execute based on intent type
             if intent == "general_query":
-                return self._handle_general_query(user_query, parameters, csv_metadata_list, doc_metadata_list)
+                return self._handle_general_query(user_query, parameters, csv_metadata_list, doc_metadata_list), None
             elif intent == "document_query":
-                return self._handle_document_query(user_query, parameters)
+                return self._document_query(user_query, parameters, stream)
             else:
                 # Execute deterministic pandas analysis
                 result_table, numbers = self._execute_intent(intent, parameters)
                 
-                # Generate narrative using LLM
-                narrative = gemini_client.generate_narrative(
-                    intent, 
-                    parameters, 
-                    result_table, 
-                    numbers
-                )
+                # Generate narrative using LLM (deferred when streaming)
+                narrative_stream = None
+                if stream:
+                    narrative = ""
+                    narrative_stream = gemini_client.stream_narrative(
+                        intent, 
+                        parameters, 
+                        result_table, 
+                        numbers
+                    )
+                else:
+                    with span("agent.narrative"):
+                        narrative = gemini_client.generate_narrative(
+                            intent, 
+                            parameters, 
+                            result_table, 
+                            numbers
+                        )
                 
                 # Return structured result
-                result = AnalysisResult(
+                result = AnalysisResult.model_construct(
                     result_table=result_table,
                     numbers=numbers,
                     narrative=narrative,
@@ -116,15 +218,219 @@ class AnalyticalAgent:
                     }
                 )
                 
-                return result.dict()
+                return result.model_dump(mode='python'), narrative_stream
             
         except Exception as e:
-            import traceback
-            traceback.print_exc()
-            return ErrorResponse(
+            logger.exception("execution_error")
+            return error_response(
                 error="execution_error",
                 details=str(e)
-            ).dict()
+            ), None
+    
+    def _resolve_intent(
+        self,
+        user_query: str,
+        intent_data: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Validate a parsed intent, falling back to a general query if allowed
+        
+        Args:
+            user_query: Original user query
+            intent_data: Intent dict returned by the parser
+            
+        Returns:
+            (intent, parameters, error) where error is an ErrorResponse dict
+            when the intent is unsupported and no fallback is allowed
+        """
+        intent = intent_data.get("intent")
+        parameters = intent_data.get("parameters", {})
+        
+        # Check if intent is supported
+        if intent not in self.supported_intents:
+            if settings.ENABLE_GENERAL_QUERY_FALLBACK:
+                intent = "general_query"
+                parameters = {"question": user_query}
+            else:
+                return intent, parameters, error_response(
+                    error="unsupported_intent",
+                    supported_intents=self._supported_intents_list,
+                    details=f"Intent '{intent}' is not supported"
+                )
+        
+        logger.debug("parsed intent=%s params=%s", intent, parameters)
+        
+        return intent, parameters, None
+    
+    def process_queries(self, user_queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Process a burst of user queries with batched LLM calls
+        
+        Args:
+            user_queries: Natural language queries
+            
+        Returns:
+            AnalysisResult or ErrorResponse dicts, in the same order as user_queries
+        """
+        return asyncio.run(self.aprocess_queries(user_queries))
+    
+    async def aprocess_queries(self, user_queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Async variant of process_queries
+        
+        All intents are parsed with one Gemini call, the analyses run concurrently
+        in worker threads, and the narratives of the pandas analyses are written
+        by a second batched call. If a batched call fails or returns malformed
+        output, the affected queries are retried one at a time.
+        
+        Args:
+            user_queries: Natural language queries
+            
+        Returns:
+            AnalysisResult or ErrorResponse dicts, in the same order as user_queries
+        """
+        if not user_queries:
+            return []
+        
+        csv_metadata_list = csv_ingestion.compact_metadata_dicts()
+        doc_metadata_list = document_ingestion.compact_metadata_dicts()
+        
+        if not csv_metadata_list and not doc_metadata_list:
+            return [
+                error_response(
+                    error="no_data",
+                    details="No CSV or document files have been loaded. Please ingest data first."
+                )
+                for _ in user_queries
+            ]
+        
+        # Caps the Gemini requests in flight when calls fan out per query
+        llm_slots = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        
+        # Step 1: Parse all intents in one call
+        try:
+            with span("agent.parse_intent_batch"):
+                intents = await gemini_client.aparse_intent_batch(
+                    user_queries,
+                    csv_metadata_list,
+                    doc_metadata_list
+                )
+        except Exception as e:
+            logger.warning("Batched intent parsing failed, parsing queries individually: %s", e)
+            intents = await asyncio.gather(*(
+                self._bounded(llm_slots, asyncio.to_thread(
+                    gemini_client.parse_intent, query, csv_metadata_list, doc_metadata_list
+                ))
+                for query in user_queries
+            ), return_exceptions=True)
+        
+        # Step 2: Execute all queries concurrently
+        outcomes = await asyncio.gather(*(
+            self._aexecute_query(
+                query, intent_data, csv_metadata_list, doc_metadata_list, llm_slots
+            )
+            for query, intent_data in zip(user_queries, intents)
+        ))
+        results = [result for result, _ in outcomes]
+        
+        # Step 3: Generate the pending narratives in one call
+        pending = [(i, analysis) for i, (_, analysis) in enumerate(outcomes) if analysis]
+        if pending:
+            analyses = [analysis for _, analysis in pending]
+            try:
+                with span("agent.narratives_batch"):
+                    narratives = await gemini_client.agenerate_narratives_batch(analyses)
+            except Exception as e:
+                logger.warning("Batched narrative generation failed, generating individually: %s", e)
+                narratives = await asyncio.gather(*(
+                    self._bounded(
+                        llm_slots, asyncio.to_thread(gemini_client.generate_narrative, *analysis)
+                    )
+                    for analysis in analyses
+                ), return_exceptions=True)
+            
+            for (i, _), narrative in zip(pending, narratives):
+                if isinstance(narrative, Exception):
+                    results[i] = error_response(
+                        error="execution_error",
+                        details=str(narrative)
+                    )
+                else:
+                    results[i]["narrative"] = narrative
+        
+        return results
+    
+    @staticmethod
+    async def _bounded(semaphore: asyncio.Semaphore, awaitable: Awaitable[Any]) -> Any:
+        """Await inside a semaphore slot"""
+        async with semaphore:
+            return await awaitable
+    
+    async def _aexecute_query(
+        self,
+        user_query: str,
+        intent_data: Union[Dict[str, Any], Exception],
+        csv_metadata_list: List[Dict[str, Any]],
+        doc_metadata_list: List[Dict[str, Any]],
+        llm_slots: asyncio.Semaphore
+    ) -> Tuple[Dict[str, Any], Optional[Tuple[str, Dict[str, Any], List[Dict[str, Any]], Dict[str, Any]]]]:
+        """
+        Execute one parsed query of a batch without generating its narrative
+        
+        Args:
+            user_query: Original user query
+            intent_data: Parsed intent, or the exception raised while parsing it
+            csv_metadata_list: List of CSV file metadata
+            doc_metadata_list: List of document metadata
+            llm_slots: Semaphore bounding concurrent Gemini requests
+            
+        Returns:
+            (result, analysis) where analysis is the
+            (intent, parameters, result_table, numbers) tuple still awaiting a
+            narrative, or None when the result is already complete
+        """
+        try:
+            if isinstance(intent_data, Exception):
+                raise intent_data
+            
+            intent, parameters, error = self._resolve_intent(user_query, intent_data)
+            if error is not None:
+                return error, None
+            
+            if intent == "general_query":
+                return await self._bounded(llm_slots, asyncio.to_thread(
+                    self._handle_general_query,
+                    user_query,
+                    parameters,
+                    csv_metadata_list,
+                    doc_metadata_list
+                )), None
+            elif intent == "document_query":
+                return await self._bounded(llm_slots, asyncio.to_thread(
+                    self._handle_document_query, user_query, parameters
+                )), None
+            
+            result_table, numbers = await self._execute_intent_async(intent, parameters)
+            
+            result = AnalysisResult.model_construct(
+                result_table=result_table,
+                numbers=numbers,
+                narrative="",
+                metadata={
+                    "intent": intent,
+                    "parameters": parameters,
+                    "query": user_query
+                }
+            )
+            
+            return result.model_dump(mode='python'), (intent, parameters, result_table, numbers)
+            
+        except Exception as e:
+            logger.exception("execution_error")
+            return error_response(
+                error="execution_error",
+                details=str(e)
+            ), None
     
     def _handle_general_query(
         self, 
@@ -145,51 +451,35 @@ class AnalyticalAgent:
         Returns:
             Response dictionary
         """
-        print(f"[DEBUG] Handling general query: {user_query}")
+        logger.debug("handling general query: %s", user_query)
         
-        # Get sample data if requested
-        sample_data = {}
+        # Get sample data (first rows are captured at ingestion time)
         file_id = parameters.get("file_id")
-        
-        try:
-            if file_id:
-                if file_id in csv_ingestion.dataframes:
-                    df = csv_ingestion.get_dataframe(file_id)
-                    sample_data[file_id] = df.head(3).to_dict('records')
-            else:
-                # Get samples from all CSV files
-                for fid in list(csv_ingestion.dataframes.keys())[:2]:
-                    df = csv_ingestion.get_dataframe(fid)
-                    sample_data[fid] = df.head(3).to_dict('records')
-        except Exception as e:
-            print(f"[DEBUG] Could not get sample data: {e}")
+        file_ids = [file_id] if file_id else list(csv_ingestion.sample_records)[:2]
+        sample_data = {
+            fid: csv_ingestion.sample_records[fid]
+            for fid in file_ids
+            if fid in csv_ingestion.sample_records
+        }
         
         # Generate answer using LLM
-        answer = gemini_client.answer_general_query(
-            user_query,
-            csv_metadata_list,
-            doc_metadata_list,
-            sample_data
-        )
+        with span("general_query.answer"):
+            answer = gemini_client.answer_general_query(
+                user_query,
+                csv_metadata_list,
+                doc_metadata_list,
+                sample_data
+            )
         
         # Format response
-        result = {
-            "result_table": [],
-            "numbers": {
-                "query_type": "general_information",
-                "csv_files": len(csv_metadata_list),
-                "document_files": len(doc_metadata_list),
-                "total_rows": sum(m['num_rows'] for m in csv_metadata_list) if csv_metadata_list else 0
-            },
-            "narrative": answer,
-            "metadata": {
-                "intent": "general_query",
-                "parameters": parameters,
-                "query": user_query
-            }
+        numbers = {
+            "query_type": "general_information",
+            "csv_files": len(csv_metadata_list),
+            "document_files": len(doc_metadata_list),
+            "total_rows": sum(m['num_rows'] for m in csv_metadata_list) if csv_metadata_list else 0
         }
         
-        return result
+        return result_response("general_query", parameters, user_query, [], numbers, answer)
     
     def _handle_document_query(
         self,
@@ -206,19 +496,58 @@ class AnalyticalAgent:
         Returns:
             Response dictionary
         """
-        print(f"[DEBUG] Handling document query: {user_query}")
+        return self._document_query(user_query, parameters, stream=False)[0]
+    
+    def _document_query(
+        self,
+        user_query: str,
+        parameters: Dict[str, Any],
+        stream: bool
+    ) -> Tuple[Dict[str, Any], Optional[Iterator[str]]]:
+        """
+        Search the documents and answer from the retrieved passages
+        
+        Args:
+            user_query: Original user query
+            parameters: Parsed parameters including query and file_id
+            stream: Return the result before the answer is generated
+            
+        Returns:
+            (result, answer_stream); with stream=True and matching passages the
+            result has an empty narrative and answer_stream yields it
+        """
+        logger.debug("handling document query: %s", user_query)
         
         params = DocumentQueryParams(**parameters)
         
-        # Search documents
-        search_results = document_ingestion.search_document(
-            params.query,
-            file_id=params.file_id,
-            top_k=params.top_k
-        )
+        # Search documents (repeated searches reuse the earlier results)
+        with span("document_query.retrieve"):
+            search_results = document_ingestion.search_document(
+                params.query,
+                file_id=params.file_id,
+                top_k=params.top_k
+            )
         
-        # Format results
+        # Nothing to ground an answer on: skip the LLM round-trip
+        if not search_results:
+            numbers = {
+                "query": params.query,
+                "num_results": 0,
+                "avg_similarity": 0,
+                "file_ids": []
+            }
+            return result_response(
+                "document_query", parameters, user_query, [], numbers,
+                "No relevant passages found in the loaded documents."
+            ), None
+        
+        # Format results, retrieval context and source files in one pass
+        similarities = np.fromiter(
+            (s for _, s, _ in search_results), dtype=np.float32, count=len(search_results)
+        )
         result_table = []
+        context_parts = []
+        file_ids = {}
         for chunk_text, similarity, metadata in search_results:
             result_table.append({
                 'file_id': metadata['file_id'],
@@ -229,39 +558,37 @@ class AnalyticalAgent:
                 'answer': metadata.get('answer', ''),
                 'analysis': metadata.get('analysis', '')
             })
-        
-        # Generate narrative using retrieved context
-        context_text = "\n\n".join([
-            f"[Relevance: {sim:.2f}] {chunk}" 
-            for chunk, sim, _ in search_results
-        ])
-        
-        narrative = gemini_client.answer_document_query(
-            params.query,
-            context_text,
-            search_results
-        )
+            context_parts.append(f"[Relevance: {similarity:.2f}] {chunk_text}")
+            file_ids[metadata['file_id']] = None
+        
+        # Generate narrative using retrieved context (deferred when streaming)
+        answer_stream = None
+        if stream:
+            narrative = ""
+            answer_stream = gemini_client.answer_document_query_stream(
+                params.query,
+                "\n\n".join(context_parts),
+                search_results
+            )
+        else:
+            with span("document_query.answer"):
+                narrative = gemini_client.answer_document_query(
+                    params.query,
+                    "\n\n".join(context_parts),
+                    search_results
+                )
         
         # Compute numbers
         numbers = {
             "query": params.query,
             "num_results": len(search_results),
-            "avg_similarity": sum(s for _, s, _ in search_results) / len(search_results) if search_results else 0,
-            "file_ids": list(set(m['file_id'] for _, _, m in search_results))
+            "avg_similarity": float(similarities.mean()),
+            "file_ids": list(file_ids)
         }
         
-        result = {
-            "result_table": result_table,
-            "numbers": numbers,
-            "narrative": narrative,
-            "metadata": {
-                "intent": "document_query",
-                "parameters": parameters,
-                "query": user_query
-            }
-        }
-        
-        return result
+        return result_response(
+            "document_query", parameters, user_query, result_table, numbers, narrative
+        ), answer_stream
     
     def _execute_intent(
         self, 
@@ -278,31 +605,21 @@ class AnalyticalAgent:
         Returns:
             (result_table, numbers)
         """
-        if intent == "compare_averages":
-            params = CompareAveragesParams(**parameters)
-            return pandas_engine.compare_averages(params)
-        
-        elif intent == "filter_threshold":
-            params = FilterThresholdParams(**parameters)
-            return pandas_engine.filter_threshold(params)
-        
-        elif intent == "sort":
-            params = SortParams(**parameters)
-            return pandas_engine.sort_data(params)
-        
-        elif intent == "top_n":
-            params = TopNParams(**parameters)
-            return pandas_engine.top_n(params)
-        
-        elif intent == "compare_top":
-            params = CompareTopParams(**parameters)
-            return pandas_engine.compare_top(params)
-        
-        elif intent == "explain_row":
-            return self._explain_row(ExplainRowParams(**parameters))
+        try:
+            adapter, handler = self._dispatch[intent]
+        except KeyError:
+            raise ValueError(f"Unsupported intent: {intent}") from None
         
-        else:
-            raise ValueError(f"Unsupported intent: {intent}")
+        with span(f"engine.{intent}"):
+            return handler(adapter.validate_python(parameters))
+    
+    async def _execute_intent_async(
+        self, 
+        intent: str, 
+        parameters: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Run _execute_intent in a worker thread (pandas releases the GIL in its kernels)"""
+        return await asyncio.to_thread(self._execute_intent, intent, parameters)
     
     def _explain_row(
         self, 
@@ -317,69 +634,94 @@ class AnalyticalAgent:
         Returns:
             (result_table, numbers)
         """
-        # Get file_id
-        if params.file_id:
-            file_id = params.file_id
-        else:
-            # Use first available file
-            file_ids = list(csv_ingestion.dataframes.keys())
-            if not file_ids:
-                raise ValueError("No files loaded")
-            file_id = file_ids[0]
+        # Get file_id (first available file if none is given)
+        file_id = params.file_id or csv_ingestion.default_file_id
+        if file_id is None:
+            raise ValueError("No files loaded")
         
         # Get vector store
         store = vector_store_manager.get_store(file_id)
         if not store:
             raise ValueError(f"Vector store for {file_id} not found")
         
-        # Generate query embedding
-        query_vector = gemini_client.generate_query_embedding(params.query)
+        # Generate query embedding (cached across requests)
+        query_vector = embed_query(params.query)
         
         # Search for similar rows
-        results = store.search(query_vector, k=params.top_k, file_id=file_id)
+        results = store.search(
+            query_vector, 
+            k=params.top_k, 
+            file_id=file_id, 
+            ef_search=params.ef_search
+        )
         
-        # Get actual row data
-        df = csv_ingestion.get_dataframe(file_id)
-        result_table = []
-        row_indices = []
-        distances = []
-        
-        for meta, distance in results:
-            if meta.is_row_vector:
-                row_idx = meta.row_idx
-                row_data = df.iloc[row_idx].to_dict()
-                row_data['_row_index'] = row_idx
-                row_data['_similarity_score'] = float(1 - distance)
-                result_table.append(row_data)
-                row_indices.append(row_idx)
-                distances.append(float(distance))
+        # Get actual row data in one gather over the raw column arrays
+        columns = csv_ingestion.get_columns(file_id)
+        row_results = [(meta, distance) for meta, distance in results if meta.is_row_vector]
+        row_indices = [meta.row_idx for meta, _ in row_results]
+        similarities = distances_to_similarities(
+            result_distances(row_results, len(row_results))
+        ).tolist()
+        
+        result_table = gather_table(
+            columns,
+            row_indices,
+            {'_row_index': row_indices, '_similarity_score': similarities}
+        )
         
         numbers = {
             "query": params.query,
             "top_k": params.top_k,
             "row_indices": row_indices,
-            "similarity_scores": [float(1 - d) for d in distances],
+            "similarity_scores": similarities,
             "file_id": file_id
         }
         
         return result_table, numbers
     
+    def warmup(self) -> None:
+        """
+        Pay cold-start costs before the first query arrives
+        
+        Opens the Gemini connection (TLS handshake and auth) with one query
+        embedding. It also loads every saved vector store and runs a dummy
+        search on each, so index pages are resident. Failures are logged and
+        otherwise ignored: warmup must never prevent startup.
+        """
+        try:
+            gemini_client.generate_query_embedding("warmup")
+        except Exception:
+            logger.warning("Gemini warmup failed", exc_info=True)
+        
+        for file_id in vector_store_manager.list_stores():
+            try:
+                store = vector_store_manager.get_store(file_id)
+                if store is not None and store.size() > 0:
+                    store.search(np.zeros(store.dimension, dtype=np.float32), k=1)
+            except Exception:
+                logger.warning("Vector store warmup failed for %s", file_id, exc_info=True)
+    
     def get_status(self) -> Dict[str, Any]:
         """Get agent status and loaded data info"""
         csv_files = csv_ingestion.list_files()
         doc_files = document_ingestion.list_documents()
         vector_stores = vector_store_manager.list_stores()
         
-        return {
+        status = {
             "status": "ready",
             "loaded_csv_files": len(csv_files),
             "loaded_documents": len(doc_files),
             "csv_files": csv_files,
             "documents": doc_files,
             "vector_stores": vector_stores,
-            "supported_intents": self.supported_intents
+            "supported_intents": self._supported_intents_list
         }
+        if settings.TRACE_SPANS:
+            status["spans"] = span_recorder.summary()
+        return status
 
 
 # Global agent instance
-analytical_agent = AnalyticalAgent()
\ No newline at end of file
+analytical_agent = AnalyticalAgent()
+if settings.WARMUP_ON_IMPORT:
+    analytical_agent.warmup()
\ No newline at end of file
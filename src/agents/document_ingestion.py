@@ -4,27 +4,67 @@ Handles text extraction, chunking, and vectorization
 """
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
+from collections import OrderedDict
 from datetime import datetime
 import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor
 import re
+import threading
 
-# Document readers
-import docx  # python-docx
+# Document readers (lxml ships with python-docx)
+import zipfile
+from lxml import etree
 
-from src.utils.gemini_client import gemini_client
+from config.settings import settings
+from src.utils.gemini_client import embed_documents, embed_query
+from src.utils.numeric import distances_to_similarities, result_distances
 from src.utils.models import DocumentMetadata, DocumentChunkMetadata
 from src.vectordb.vector_store import vector_store_manager
 
+# Q&A section patterns for the analysis document format (Q1:/Ans:/ANALYSIS:)
+_QUESTION_RE = re.compile(r'Q\d+:\s*(.+?)(?=\n\nAns:|$)', re.DOTALL)
+_ANSWER_RE = re.compile(r'Ans:\s*(.+?)(?=\n\nANALYSIS:|Q\d+:|$)', re.DOTALL)
+_ANALYSIS_RE = re.compile(r'ANALYSIS:\s*(.+?)(?=Q\d+:|$)', re.DOTALL)
+
+# Whitespace-separated tokens the chunker snaps window boundaries to
+_TOKEN_RE = re.compile(r'\S+')
+
+# WordprocessingML tags used when streaming DOCX bodies
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY, _W_P, _W_TBL, _W_TR, _W_TC = (_W + t for t in ('body', 'p', 'tbl', 'tr', 'tc'))
+_W_TEXT_TAGS = {_W + 't': None, _W + 'tab': '\t', _W + 'br': '\n', _W + 'cr': '\n'}
+
+
+def _docx_paragraph_text(p: etree._Element) -> str:
+    """Concatenate the text, tab and break runs of a <w:p> element"""
+    parts = []
+    for node in p.iter(*_W_TEXT_TAGS):
+        fixed = _W_TEXT_TAGS[node.tag]
+        parts.append((node.text or "") if fixed is None else fixed)
+    return "".join(parts)
+
 
 class DocumentIngestion:
     """Handles document file ingestion and vectorization"""
     
+    # Metadata fields the LLM prompts render
+    COMPACT_METADATA_FIELDS = {"file_id", "filename", "document_type", "num_characters", "num_qa_pairs"}
+    
     def __init__(self):
         """Initialize ingestion handler"""
         self.documents: Dict[str, str] = {}  # file_id -> full text
         self.document_metadata: Dict[str, DocumentMetadata] = {}
         self.document_chunks: Dict[str, List[str]] = {}  # file_id -> list of chunks
+        self._metadata_cache: Optional[List[Dict[str, Any]]] = None
+        self._compact_metadata_cache: Optional[List[Dict[str, Any]]] = None
+        self._version: int = 0
+        self._embedding_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_ingests: Dict[str, Tuple[Future, List[Any]]] = {}
+        # (query, file_id, top_k) -> search results, cleared when stores change
+        self._search_cache: "OrderedDict[Tuple[str, Optional[str], int], List[Tuple[str, float, Dict]]]" = OrderedDict()
+        self._search_lock = threading.Lock()
+        self._search_generation: int = 0
     
     def generate_file_id(self, filename: str) -> str:
         """
@@ -37,7 +77,7 @@ class DocumentIngestion:
             Unique file identifier
         """
         unique_str = f"{filename}_{datetime.now().isoformat()}"
-        file_hash = hashlib.md5(unique_str.encode()).hexdigest()[:8]
+        file_hash = hashlib.blake2b(unique_str.encode(), digest_size=4).hexdigest()
         clean_name = Path(filename).stem.replace(" ", "_")
         return f"doc_{clean_name}_{file_hash}"
     
@@ -64,18 +104,35 @@ class DocumentIngestion:
         Returns:
             Extracted text
         """
-        doc = docx.Document(filepath)
-        
-        # Extract all paragraphs
-        paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-        
-        # Extract text from tables
+        paragraphs = []
         table_texts = []
-        for table in doc.tables:
-            for row in table.rows:
-                row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
-                if row_text:
-                    table_texts.append(row_text)
+        
+        # Stream word/document.xml instead of building the python-docx object
+        # tree; only top-level paragraphs and tables are read, as before
+        with zipfile.ZipFile(filepath) as archive, archive.open('word/document.xml') as f:
+            for _, elem in etree.iterparse(f, events=('end',), tag=(_W_P, _W_TBL)):
+                parent = elem.getparent()
+                if parent is None or parent.tag != _W_BODY:
+                    continue  # Nested in a table; handled with the table
+                
+                if elem.tag == _W_P:
+                    text = _docx_paragraph_text(elem)
+                    if text.strip():
+                        paragraphs.append(text)
+                else:
+                    for row in elem.iterchildren(_W_TR):
+                        cells = (
+                            "\n".join(_docx_paragraph_text(p) for p in tc.iterchildren(_W_P)).strip()
+                            for tc in row.iterchildren(_W_TC)
+                        )
+                        row_text = " | ".join(cell for cell in cells if cell)
+                        if row_text:
+                            table_texts.append(row_text)
+                
+                # Drop the processed element and everything before it
+                elem.clear(keep_tail=True)
+                while elem.getprevious() is not None:
+                    del parent[0]
         
         # Combine all text
         full_text = "\n".join(paragraphs)
@@ -93,41 +150,51 @@ class DocumentIngestion:
         """
         Split text into overlapping chunks
         
+        Each chunk is a verbatim slice of text (line and paragraph breaks
+        kept) of at most chunk_size characters, unless a single token is
+        longer. Chunks start every chunk_size - overlap characters, snapped
+        to whitespace boundaries, so neighbours share about overlap
+        characters (the original paragraph packer approximated it as
+        overlap // 5 words).
+        
         Args:
             text: Input text
             chunk_size: Target chunk size in characters
-            overlap: Overlap between chunks
+            overlap: Overlap between chunks in characters
             
         Returns:
             List of text chunks
         """
-        # Split by paragraphs first
-        paragraphs = text.split('\n')
+        # Locate whitespace-separated tokens once; chunks are sliced from the
+        # source between token offsets so paragraph and line breaks survive
+        spans = np.array([m.span() for m in _TOKEN_RE.finditer(text)], dtype=np.int64)
+        if spans.size == 0:
+            return []
+        token_starts, token_ends = spans[:, 0], spans[:, 1]
+        num_tokens = len(spans)
+        
+        # Windows of chunk_size source characters every (chunk_size - overlap)
+        # characters, snapped to token boundaries; the last token always starts
+        # a candidate window so oversized tokens cannot leave the tail uncovered
+        stride = max(chunk_size - overlap, 1)
+        grid = np.arange(token_starts[0], token_ends[-1], stride)
+        starts = np.searchsorted(token_ends, grid, side='right')
+        starts = np.unique(np.append(starts[starts < num_tokens], num_tokens - 1))
+        ends = np.maximum(
+            np.searchsorted(token_ends, token_starts[starts] + chunk_size, side='right'),
+            starts + 1
+        )
         
-        chunks = []
-        current_chunk = ""
+        # Stop after the first window that reaches the end of the text
+        last = int(np.argmax(ends >= num_tokens))
         
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-            
-            # If adding this paragraph exceeds chunk size, save current chunk
-            if len(current_chunk) + len(para) > chunk_size and current_chunk:
-                chunks.append(current_chunk)
-                
-                # Start new chunk with overlap
-                words = current_chunk.split()
-                overlap_text = " ".join(words[-overlap//5:])  # Approximate word overlap
-                current_chunk = overlap_text + " " + para
-            else:
-                current_chunk += "\n" + para if current_chunk else para
-        
-        # Add final chunk
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        return chunks
+        return [
+            text[begin:end]
+            for begin, end in zip(
+                token_starts[starts[:last + 1]].tolist(),
+                token_ends[ends[:last + 1] - 1].tolist()
+            )
+        ]
     
     def extract_questions_and_answers(self, text: str) -> List[Dict[str, str]]:
         """
@@ -140,25 +207,22 @@ class DocumentIngestion:
             List of {question, answer, analysis} dictionaries
         """
         qa_pairs = []
+        q_matches = list(_QUESTION_RE.finditer(text))
         
-        # Pattern to match Q1:, Q2:, etc.
-        question_pattern = r'Q\d+:\s*(.+?)(?=\n\nAns:|$)'
-        answer_pattern = r'Ans:\s*(.+?)(?=\n\nANALYSIS:|Q\d+:|$)'
-        analysis_pattern = r'ANALYSIS:\s*(.+?)(?=Q\d+:|$)'
-        
-        # Find all questions
-        questions = re.finditer(question_pattern, text, re.DOTALL)
-        
-        for q_match in questions:
+        for i, q_match in enumerate(q_matches):
             question_text = q_match.group(1).strip()
-            start_pos = q_match.start()
+            
+            # Answer and analysis live between this question and the next one;
+            # bounding the search by pos/endpos keeps the scan linear without slicing
+            seg_start = q_match.end()
+            seg_end = q_matches[i + 1].start() if i + 1 < len(q_matches) else len(text)
             
             # Find corresponding answer
-            answer_match = re.search(answer_pattern, text[start_pos:], re.DOTALL)
+            answer_match = _ANSWER_RE.search(text, seg_start, seg_end)
             answer_text = answer_match.group(1).strip() if answer_match else ""
             
             # Find corresponding analysis
-            analysis_match = re.search(analysis_pattern, text[start_pos:], re.DOTALL)
+            analysis_match = _ANALYSIS_RE.search(text, seg_start, seg_end)
             analysis_text = analysis_match.group(1).strip() if analysis_match else ""
             
             qa_pairs.append({
@@ -174,7 +238,8 @@ class DocumentIngestion:
         filepath: str, 
         file_id: Optional[str] = None,
         vectorize: bool = True,
-        chunk_size: int = 1000
+        chunk_size: int = 1000,
+        async_batch: bool = False
     ) -> Tuple[str, DocumentMetadata]:
         """
         Ingest document file and optionally vectorize
@@ -184,6 +249,7 @@ class DocumentIngestion:
             file_id: Optional custom file ID
             vectorize: Whether to create embeddings
             chunk_size: Size of text chunks for embedding
+            async_batch: Embed in the background; finish with finalize_async_ingest
             
         Returns:
             Tuple of (file_id, metadata)
@@ -225,23 +291,57 @@ class DocumentIngestion:
         # Store document and metadata
         self.documents[file_id] = text
         self.document_metadata[file_id] = metadata
+        self._invalidate_metadata()
         self.document_chunks[file_id] = chunks
         
         print(f"✓ Loaded {filepath.name}: {len(text)} chars, {len(chunks)} chunks, {len(qa_pairs)} Q&A pairs")
         
         # Vectorize if requested
         if vectorize:
-            self._vectorize_document(text, chunks, qa_pairs, file_id, metadata)
+            self._vectorize_document(
+                text, chunks, qa_pairs, file_id, metadata, async_batch=async_batch
+            )
         
         return file_id, metadata
     
+    def ingest_documents(
+        self, 
+        filepaths: List[str], 
+        vectorize: bool = True,
+        chunk_size: int = 1000
+    ) -> List[Tuple[str, DocumentMetadata]]:
+        """
+        Ingest several documents concurrently
+        
+        Embedding calls are network-bound and release the GIL, so documents
+        are read, chunked and embedded on a thread pool.
+        
+        Args:
+            filepaths: Paths to document files
+            vectorize: Whether to create embeddings
+            chunk_size: Size of text chunks for embedding
+            
+        Returns:
+            List of (file_id, metadata), in the order of filepaths
+        """
+        if not filepaths:
+            return []
+        
+        workers = min(settings.INGEST_WORKERS, len(filepaths))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doc-ingest") as executor:
+            return list(executor.map(
+                lambda path: self.ingest_document(path, vectorize=vectorize, chunk_size=chunk_size),
+                filepaths
+            ))
+    
     def _vectorize_document(
         self, 
         full_text: str,
         chunks: List[str],
         qa_pairs: List[Dict[str, str]],
         file_id: str,
-        metadata: DocumentMetadata
+        metadata: DocumentMetadata,
+        async_batch: bool = False
     ) -> None:
         """
         Create embeddings for document chunks and Q&A pairs
@@ -252,35 +352,27 @@ class DocumentIngestion:
             qa_pairs: Extracted Q&A pairs
             file_id: File identifier
             metadata: Document metadata
+            async_batch: Submit the embedding job to a background thread
         """
         print(f"Creating embeddings for {file_id}...")
         
-        # Create vector store
-        store = vector_store_manager.create_store(file_id)
-        
-        vectors_list = []
+        texts = []
         metadata_list = []
         
-        # 1. Vectorize text chunks
+        # 1. Text chunks
         print(f"  - Vectorizing {len(chunks)} chunks...")
         for idx, chunk in enumerate(chunks):
-            embedding = gemini_client.generate_embedding(chunk)
-            vectors_list.append(embedding)
-            
-            vec_meta = DocumentChunkMetadata(
+            texts.append(chunk)
+            metadata_list.append(DocumentChunkMetadata(
                 file_id=file_id,
                 chunk_idx=idx,
                 chunk_type='text',
                 original_text=chunk[:500],
                 question_text=None,
                 answer_text=None
-            )
-            metadata_list.append(vec_meta)
-            
-            if (idx + 1) % 10 == 0:
-                print(f"    Processed {idx + 1}/{len(chunks)} chunks")
+            ))
         
-        # 2. Vectorize Q&A pairs separately for better retrieval
+        # 2. Q&A pairs separately for better retrieval
         if qa_pairs:
             print(f"  - Vectorizing {len(qa_pairs)} Q&A pairs...")
             for idx, qa in enumerate(qa_pairs):
@@ -289,10 +381,8 @@ class DocumentIngestion:
                 if qa['analysis']:
                     qa_text += f"\nAnalysis: {qa['analysis']}"
                 
-                embedding = gemini_client.generate_embedding(qa_text)
-                vectors_list.append(embedding)
-                
-                vec_meta = DocumentChunkMetadata(
+                texts.append(qa_text)
+                metadata_list.append(DocumentChunkMetadata(
                     file_id=file_id,
                     chunk_idx=len(chunks) + idx,
                     chunk_type='qa_pair',
@@ -300,17 +390,147 @@ class DocumentIngestion:
                     question_text=qa['question'],
                     answer_text=qa['answer'],
                     analysis_text=qa.get('analysis', '')
-                )
-                metadata_list.append(vec_meta)
+                ))
         
-        # Add all vectors to store
-        vectors_array = np.vstack(vectors_list)
-        store.add_vectors(vectors_array, metadata_list)
+        if async_batch:
+            # Embedding runs off the caller's thread; the store is built by
+            # finalize_async_ingest once the vectors are back
+            future = self._get_embedding_executor().submit(
+                embed_documents, texts, 100, settings.NEAR_DUPLICATE_MAX_HAMMING
+            )
+            self._pending_ingests[file_id] = (future, metadata_list)
+            print(f"  - Submitted {len(texts)} texts for background embedding")
+            return
+        
+        # Embed everything in batched requests and add to store
+        vectors_array = embed_documents(
+            texts, batch_size=100, max_hamming=settings.NEAR_DUPLICATE_MAX_HAMMING
+        )
+        self._store_vectors(file_id, vectors_array, metadata_list)
+    
+    def _store_vectors(
+        self, 
+        file_id: str, 
+        vectors: np.ndarray, 
+        metadata_list: List[Any]
+    ) -> None:
+        """
+        Build, fill and persist the vector store for a file
+        
+        Args:
+            file_id: File identifier
+            vectors: Embeddings (n_vectors x dimension)
+            metadata_list: Metadata per vector
+        """
+        store = vector_store_manager.create_store(file_id)
+        store.add_vectors(vectors, metadata_list)
         
         # Save to disk
         vector_store_manager.save_store(file_id)
+        self._clear_search_cache()
+        
+        print(f"✓ Created {len(metadata_list)} embeddings for {file_id}")
+    
+    def _get_embedding_executor(self) -> ThreadPoolExecutor:
+        """Get the background embedding executor, creating it on first use"""
+        if self._embedding_executor is None:
+            self._embedding_executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_INGEST_WORKERS,
+                thread_name_prefix="embed-ingest"
+            )
+        return self._embedding_executor
+    
+    def finalize_async_ingest(self, file_id: str, timeout: Optional[float] = None) -> int:
+        """
+        Wait for a background embedding job and build its vector store
+        
+        Args:
+            file_id: File ingested with async_batch=True
+            timeout: Seconds to wait for the embeddings (None waits indefinitely)
+            
+        Returns:
+            Number of vectors stored
+        """
+        if file_id not in self._pending_ingests:
+            raise ValueError(f"No pending ingest for {file_id}")
+        
+        future, metadata_list = self._pending_ingests[file_id]
+        vectors = future.result(timeout=timeout)
+        del self._pending_ingests[file_id]
+        
+        self._store_vectors(file_id, vectors, metadata_list)
+        return len(metadata_list)
+    
+    def pending_ingests(self) -> List[str]:
+        """List file_ids whose embeddings are still being processed"""
+        return list(self._pending_ingests)
+    
+    def delete_document(self, file_id: str) -> bool:
+        """
+        Unload a document and delete its vectors from memory and disk
+        
+        Use this rather than vector_store_manager.delete_store, which does
+        not know about the cached search results that still cite the file.
+        
+        Args:
+            file_id: File identifier
+            
+        Returns:
+            True if the document was loaded or had a vector store
+        """
+        existed = self.documents.pop(file_id, None) is not None
+        self.document_metadata.pop(file_id, None)
+        self.document_chunks.pop(file_id, None)
+        pending = self._pending_ingests.pop(file_id, None)
+        if pending is not None:
+            pending[0].cancel()
+        existed = vector_store_manager.delete_store(file_id) or existed
+        self._invalidate_metadata()
+        return existed
+    
+    def _invalidate_metadata(self) -> None:
+        """Drop the serialized metadata after files are added or removed"""
+        self._metadata_cache = None
+        self._compact_metadata_cache = None
+        self._version += 1
+        self._clear_search_cache()
+    
+    def _clear_search_cache(self) -> None:
+        """Drop reused search results after the searchable content changes"""
+        with self._search_lock:
+            self._search_cache.clear()
+            self._search_generation += 1
+    
+    def metadata_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Get metadata of all loaded document files as plain dicts
+        
+        The list is serialized once and reused until the loaded files change,
+        so callers must treat it as read-only.
         
-        print(f"✓ Created {len(vectors_list)} embeddings for {file_id}")
+        Returns:
+            List of metadata dicts (JSON-compatible, None fields dropped)
+        """
+        if self._metadata_cache is None:
+            self._metadata_cache = [
+                meta.model_dump(mode='json', exclude_none=True)
+                for meta in self.document_metadata.values()
+            ]
+        return self._metadata_cache
+    
+    def compact_metadata_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Get only the metadata fields the LLM prompts need (see metadata_dicts)
+        
+        Returns:
+            List of compact metadata dicts, cached until the loaded files change
+        """
+        if self._compact_metadata_cache is None:
+            self._compact_metadata_cache = [
+                meta.model_dump(mode='json', include=self.COMPACT_METADATA_FIELDS)
+                for meta in self.document_metadata.values()
+            ]
+        return self._compact_metadata_cache
     
     def get_document_text(self, file_id: str) -> str:
         """Get full document text by file_id"""
@@ -330,6 +550,18 @@ class DocumentIngestion:
             raise ValueError(f"Metadata for {file_id} not found")
         return self.document_metadata[file_id]
     
+    def embed(self, query: str) -> np.ndarray:
+        """
+        Embed a search query (cached across requests)
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Read-only query embedding
+        """
+        return embed_query(query)
+    
     def search_document(
         self, 
         query: str, 
@@ -339,6 +571,9 @@ class DocumentIngestion:
         """
         Search for relevant chunks in documents
         
+        Results of recent searches are reused until documents are added, so
+        callers must treat the returned list as read-only.
+        
         Args:
             query: Search query
             file_id: Optional file to search in
@@ -347,40 +582,68 @@ class DocumentIngestion:
         Returns:
             List of (chunk_text, similarity_score, metadata) tuples
         """
-        # Generate query embedding
-        query_vector = gemini_client.generate_query_embedding(query)
-        
-        results = []
+        key = (query, file_id, top_k)
+        with self._search_lock:
+            cached = self._search_cache.get(key)
+            if cached is not None:
+                self._search_cache.move_to_end(key)
+                return cached
+            generation = self._search_generation
+        
+        results = self.search_by_vector(self.embed(query), file_id=file_id, top_k=top_k)
+        
+        if settings.RETRIEVAL_CACHE_SIZE > 0:
+            with self._search_lock:
+                # Results computed while a document was being added are not kept
+                if generation != self._search_generation:
+                    return results
+                self._search_cache[key] = results
+                while len(self._search_cache) > settings.RETRIEVAL_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
+        return results
+    
+    def search_by_vector(
+        self, 
+        query_vector: np.ndarray, 
+        file_id: Optional[str] = None,
+        top_k: int = 3
+    ) -> List[Tuple[str, float, Dict]]:
+        """
+        Search for relevant chunks with an already computed query embedding
         
-        # Search in specific file or all files
+        Args:
+            query_vector: Query embedding (see embed)
+            file_id: Optional file to search in
+            top_k: Number of results
+            
+        Returns:
+            List of (chunk_text, similarity_score, metadata) tuples
+        """
+        # Search in specific file or all files, merged into one ranking
         file_ids = [file_id] if file_id else list(self.documents.keys())
+        if not file_ids:
+            return []
         
-        for fid in file_ids:
-            store = vector_store_manager.get_store(fid)
-            if not store:
-                continue
-            
-            # Search
-            search_results = store.search(query_vector, k=top_k, file_id=fid)
-            
-            for meta, distance in search_results:
-                similarity = 1 - distance
-                results.append((
-                    meta.original_text,
-                    float(similarity),
-                    {
-                        'file_id': meta.file_id,
-                        'chunk_type': meta.chunk_type,
-                        'question': getattr(meta, 'question_text', None),
-                        'answer': getattr(meta, 'answer_text', None),
-                        'analysis': getattr(meta, 'analysis_text', None)
-                    }
-                ))
+        search_results = vector_store_manager.search_all(query_vector, k=top_k, file_ids=file_ids)
         
-        # Sort by similarity
-        results.sort(key=lambda x: x[1], reverse=True)
+        similarities = distances_to_similarities(
+            result_distances(search_results, len(search_results))
+        ).tolist()
         
-        return results[:top_k]
+        return [
+            (
+                meta.original_text,
+                similarity,
+                {
+                    'file_id': meta.file_id,
+                    'chunk_type': meta.chunk_type,
+                    'question': getattr(meta, 'question_text', None),
+                    'answer': getattr(meta, 'answer_text', None),
+                    'analysis': getattr(meta, 'analysis_text', None)
+                }
+            )
+            for (meta, _), similarity in zip(search_results, similarities)
+        ]
     
     def list_documents(self) -> List[Dict[str, any]]:
         """List all loaded documents"""
@@ -4,11 +4,20 @@ CSV ingestion and vectorization module
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Set, Tuple, Optional
 from datetime import datetime
+import functools
 import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from src.utils.gemini_client import gemini_client
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+from config.settings import settings
+from src.utils.gemini_client import embed_documents
 from src.utils.models import FileMetadata, VectorMetadata
 from src.vectordb.vector_store import vector_store_manager
 
@@ -16,10 +25,23 @@ from src.vectordb.vector_store import vector_store_manager
 class CSVIngestion:
     """Handles CSV file ingestion and vectorization"""
     
+    # Metadata fields the LLM prompts render
+    COMPACT_METADATA_FIELDS = {"file_id", "filename", "num_rows", "num_columns", "columns", "numeric_columns"}
+    
     def __init__(self):
         """Initialize ingestion handler"""
         self.dataframes: Dict[str, pd.DataFrame] = {}
         self.file_metadata: Dict[str, FileMetadata] = {}
+        self.sample_records: Dict[str, List[Dict[str, Any]]] = {}  # file_id -> first rows
+        self.columns: Dict[str, Dict[str, np.ndarray]] = {}  # file_id -> column arrays
+        self.sorted_columns: Dict[str, Set[str]] = {}  # file_id -> ascending numeric columns
+        self.file_versions: Dict[str, int] = {}  # file_id -> bumped whenever the file is (re)loaded or deleted
+        self.column_ranges: Dict[str, Dict[str, Tuple[float, float, bool]]] = {}  # file_id -> column -> (min, max, has_nan)
+        self._metadata_cache: Optional[List[Dict[str, Any]]] = None
+        self._compact_metadata_cache: Optional[List[Dict[str, Any]]] = None
+        self._version: int = 0
+        self._embedding_executor: Optional[ThreadPoolExecutor] = None
+        self._pending_ingests: Dict[str, Tuple[Future, List[Any]]] = {}
     
     def generate_file_id(self, filename: str) -> str:
         """
@@ -33,10 +55,58 @@ class CSVIngestion:
         """
         # Create hash from filename and timestamp
         unique_str = f"{filename}_{datetime.now().isoformat()}"
-        file_hash = hashlib.md5(unique_str.encode()).hexdigest()[:8]
+        file_hash = hashlib.blake2b(unique_str.encode(), digest_size=4).hexdigest()
         clean_name = Path(filename).stem.replace(" ", "_")
         return f"{clean_name}_{file_hash}"
     
+    def read_csv(self, filepath: str) -> pd.DataFrame:
+        """
+        Read a CSV file with the configured parser
+        
+        The multithreaded PyArrow reader is much faster on large files. Its
+        date/time inference is switched off (those columns stay text, exactly
+        as the C parser returns them) and columns arrive as regular NumPy
+        dtypes. Files it cannot parse are re-read with the pandas C parser.
+        
+        Args:
+            filepath: Path to CSV file
+            
+        Returns:
+            Parsed dataframe
+        """
+        if settings.CSV_ENGINE == "pyarrow" and pa_csv is not None:
+            try:
+                return self._read_csv_arrow(filepath)
+            except Exception as e:
+                print(f"  - PyArrow CSV reader failed ({e}), using the C parser")
+        
+        return pd.read_csv(filepath)
+    
+    def _read_csv_arrow(self, filepath: str) -> pd.DataFrame:
+        """
+        Parse a CSV with pyarrow.csv, keeping temporal columns as strings
+        
+        Args:
+            filepath: Path to CSV file
+            
+        Returns:
+            Parsed dataframe
+        """
+        convert = pa_csv.ConvertOptions(strings_can_be_null=True)
+        
+        # Types are inferred from the first block; re-type temporal ones as text
+        with pa_csv.open_csv(filepath, convert_options=convert) as reader:
+            schema = reader.schema
+        
+        names = schema.names
+        if len(set(names)) != len(names):
+            raise ValueError("duplicate column names")
+        
+        convert.column_types = {
+            field.name: pa.string() for field in schema if pa.types.is_temporal(field.type)
+        }
+        return pa_csv.read_csv(filepath, convert_options=convert).to_pandas()
+    
     def analyze_dataframe(self, df: pd.DataFrame, file_id: str, filename: str) -> FileMetadata:
         """
         Analyze dataframe and extract metadata
@@ -49,19 +119,11 @@ class CSVIngestion:
         Returns:
             FileMetadata object
         """
-        # Get column types
-        column_types = {}
-        numeric_columns = []
-        text_columns = []
-        
-        for col in df.columns:
-            dtype = str(df[col].dtype)
-            column_types[col] = dtype
-            
-            if pd.api.types.is_numeric_dtype(df[col]):
-                numeric_columns.append(col)
-            else:
-                text_columns.append(col)
+        # Get column types (bool counts as numeric, as is_numeric_dtype does)
+        column_types = df.dtypes.astype(str).to_dict()
+        numeric = set(df.select_dtypes(include=['number', 'bool']).columns)
+        numeric_columns = [col for col in df.columns if col in numeric]
+        text_columns = [col for col in df.columns if col not in numeric]
         
         metadata = FileMetadata(
             file_id=file_id,
@@ -88,13 +150,41 @@ class CSVIngestion:
         Returns:
             Text representation
         """
-        parts = []
-        for col in columns:
-            value = row[col]
-            if pd.notna(value):
-                parts.append(f"{col}: {value}")
+        prefixes = self._column_prefixes(tuple(columns))
+        return " | ".join([
+            prefix + str(value)
+            for prefix, value in zip(prefixes, map(row.__getitem__, columns))
+            if pd.notna(value)
+        ])
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _column_prefixes(columns: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Build the "col: " prefixes once per column layout"""
+        return tuple(f"{col}: " for col in columns)
+    
+    def create_row_texts(self, df: pd.DataFrame) -> List[str]:
+        """
+        Create text representations of all rows at once
+        
+        Same layout as create_row_text, but each column is formatted in
+        one vectorized pass instead of building a Series per row.
+        
+        Args:
+            df: Dataframe
+            
+        Returns:
+            One text per row, in dataframe order
+        """
+        # Per column: "col: value", or None where the value is missing
+        columns = [
+            (prefix + df[col].astype(str)).where(df[col].notna(), None).tolist()
+            for prefix, col in zip(self._column_prefixes(tuple(df.columns)), df.columns)
+        ]
+        if not columns:
+            return [""] * len(df)
         
-        return " | ".join(parts)
+        return [" | ".join(filter(None, parts)) for parts in zip(*columns)]
     
     def create_column_summary(self, df: pd.DataFrame, column: str) -> str:
         """
@@ -116,8 +206,10 @@ class CSVIngestion:
                 f"Mean: {col_data.mean():.2f}, Median: {col_data.median()}"
             )
         else:
-            unique_vals = col_data.nunique()
-            top_vals = col_data.value_counts().head(3)
+            # One hashing pass serves both the unique count and the top values
+            value_counts = col_data.value_counts()
+            unique_vals = len(value_counts)
+            top_vals = value_counts.head(3)
             summary = (
                 f"Column {column}: text/categorical. "
                 f"Unique values: {unique_vals}. "
@@ -126,11 +218,56 @@ class CSVIngestion:
         
         return summary
     
+    def find_sorted_columns(self, df: pd.DataFrame) -> Set[str]:
+        """
+        Find numeric columns stored in ascending order
+        
+        Args:
+            df: Dataframe
+            
+        Returns:
+            Names of NaN-free NumPy numeric columns that are monotonic increasing
+        """
+        return {
+            col for col in df.columns
+            if isinstance(df[col].dtype, np.dtype)
+            and df[col].dtype.kind in 'biuf'
+            and df[col].is_monotonic_increasing
+        }
+    
+    def compute_column_ranges(
+        self, 
+        columns: Dict[str, np.ndarray]
+    ) -> Dict[str, Tuple[float, float, bool]]:
+        """
+        Min, max and NaN presence of each numeric column, for filter pruning
+        
+        Args:
+            columns: Column name -> column array
+            
+        Returns:
+            Column name -> (min, max, has_nan) for NumPy numeric columns with
+            at least one non-NaN value
+        """
+        ranges = {}
+        for col, values in columns.items():
+            if values.dtype.kind not in 'biuf' or values.size == 0:
+                continue
+            # fmin/fmax skip NaN and only return NaN when every value is NaN
+            low = np.fmin.reduce(values).item()
+            high = np.fmax.reduce(values).item()
+            if low != low:
+                continue
+            has_nan = values.dtype.kind == 'f' and bool(np.isnan(values).any())
+            ranges[col] = (low, high, has_nan)
+        return ranges
+    
     def ingest_csv(
         self, 
         filepath: str, 
         file_id: Optional[str] = None,
-        vectorize: bool = True
+        vectorize: bool = True,
+        async_batch: bool = False
     ) -> Tuple[str, FileMetadata]:
         """
         Ingest CSV file and optionally vectorize
@@ -139,12 +276,13 @@ class CSVIngestion:
             filepath: Path to CSV file
             file_id: Optional custom file ID
             vectorize: Whether to create embeddings
+            async_batch: Embed in the background; finish with finalize_async_ingest
             
         Returns:
             Tuple of (file_id, metadata)
         """
         # Read CSV
-        df = pd.read_csv(filepath)
+        df = self.read_csv(filepath)
         
         # Generate file ID if not provided
         if file_id is None:
@@ -156,12 +294,20 @@ class CSVIngestion:
         # Store dataframe and metadata
         self.dataframes[file_id] = df
         self.file_metadata[file_id] = metadata
+        self.sample_records[file_id] = df.head(3).to_dict('records')
+        # One contiguous buffer per column, so reductions and filters read
+        # memory at unit stride (ascontiguousarray is free when already so)
+        self.columns[file_id] = {col: np.ascontiguousarray(df[col].to_numpy()) for col in df.columns}
+        self.sorted_columns[file_id] = self.find_sorted_columns(df)
+        self.column_ranges[file_id] = self.compute_column_ranges(self.columns[file_id])
+        self.file_versions[file_id] = self.file_versions.get(file_id, 0) + 1
+        self._invalidate_metadata()
         
         print(f"✓ Loaded {filepath}: {len(df)} rows, {len(df.columns)} columns")
         
         # Vectorize if requested
         if vectorize:
-            self._vectorize_dataframe(df, file_id, metadata)
+            self._vectorize_dataframe(df, file_id, metadata, async_batch=async_batch)
         
         return file_id, metadata
     
@@ -169,7 +315,8 @@ class CSVIngestion:
         self, 
         df: pd.DataFrame, 
         file_id: str,
-        metadata: FileMetadata
+        metadata: FileMetadata,
+        async_batch: bool = False
     ) -> None:
         """
         Create embeddings for dataframe rows and columns
@@ -178,64 +325,178 @@ class CSVIngestion:
             df: Dataframe to vectorize
             file_id: File identifier
             metadata: File metadata
+            async_batch: Submit the embedding job to a background thread
         """
         print(f"Creating embeddings for {file_id}...")
         
-        # Create vector store
-        store = vector_store_manager.create_store(file_id)
-        
-        vectors_list = []
+        texts = []
         metadata_list = []
         
-        # 1. Vectorize each row
+        # 1. Rows
         print(f"  - Vectorizing {len(df)} rows...")
-        for idx, row in df.iterrows():
-            row_text = self.create_row_text(row, df.columns)
-            
-            # Generate embedding
-            embedding = gemini_client.generate_embedding(row_text)
-            vectors_list.append(embedding)
-            
-            # Create metadata
-            vec_meta = VectorMetadata(
+        for idx, row_text in zip(df.index, self.create_row_texts(df)):
+            texts.append(row_text)
+            metadata_list.append(VectorMetadata(
                 file_id=file_id,
                 row_idx=int(idx),
                 column_name=None,
                 is_row_vector=True,
                 original_text=row_text[:500]  # Store first 500 chars
-            )
-            metadata_list.append(vec_meta)
-            
-            if (idx + 1) % 50 == 0:
-                print(f"    Processed {idx + 1}/{len(df)} rows")
+            ))
         
-        # 2. Vectorize column summaries
+        # 2. Column summaries
         print(f"  - Vectorizing {len(df.columns)} column summaries...")
         for col in df.columns:
             col_summary = self.create_column_summary(df, col)
-            
-            # Generate embedding
-            embedding = gemini_client.generate_embedding(col_summary)
-            vectors_list.append(embedding)
-            
-            # Create metadata
-            vec_meta = VectorMetadata(
+            texts.append(col_summary)
+            metadata_list.append(VectorMetadata(
                 file_id=file_id,
                 row_idx=-1,  # -1 indicates column summary
                 column_name=col,
                 is_row_vector=False,
                 original_text=col_summary
+            ))
+        
+        if async_batch:
+            # Embedding runs off the caller's thread; the store is built by
+            # finalize_async_ingest once the vectors are back
+            future = self._get_embedding_executor().submit(
+                embed_documents, texts, 100, settings.NEAR_DUPLICATE_MAX_HAMMING
             )
-            metadata_list.append(vec_meta)
+            self._pending_ingests[file_id] = (future, metadata_list)
+            print(f"  - Submitted {len(texts)} texts for background embedding")
+            return
         
-        # Add all vectors to store
-        vectors_array = np.vstack(vectors_list)
-        store.add_vectors(vectors_array, metadata_list)
+        # Embed everything in batched requests and add to store
+        vectors_array = embed_documents(
+            texts, batch_size=100, max_hamming=settings.NEAR_DUPLICATE_MAX_HAMMING
+        )
+        self._store_vectors(file_id, vectors_array, metadata_list)
+    
+    def _store_vectors(
+        self, 
+        file_id: str, 
+        vectors: np.ndarray, 
+        metadata_list: List[Any]
+    ) -> None:
+        """
+        Build, fill and persist the vector store for a file
+        
+        Args:
+            file_id: File identifier
+            vectors: Embeddings (n_vectors x dimension)
+            metadata_list: Metadata per vector
+        """
+        store = vector_store_manager.create_store(file_id)
+        store.add_vectors(vectors, metadata_list)
         
         # Save to disk
         vector_store_manager.save_store(file_id)
         
-        print(f"✓ Created {len(vectors_list)} embeddings for {file_id}")
+        print(f"✓ Created {len(metadata_list)} embeddings for {file_id}")
+    
+    def _get_embedding_executor(self) -> ThreadPoolExecutor:
+        """Get the background embedding executor, creating it on first use"""
+        if self._embedding_executor is None:
+            self._embedding_executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_INGEST_WORKERS,
+                thread_name_prefix="embed-ingest"
+            )
+        return self._embedding_executor
+    
+    def finalize_async_ingest(self, file_id: str, timeout: Optional[float] = None) -> int:
+        """
+        Wait for a background embedding job and build its vector store
+        
+        Args:
+            file_id: File ingested with async_batch=True
+            timeout: Seconds to wait for the embeddings (None waits indefinitely)
+            
+        Returns:
+            Number of vectors stored
+        """
+        if file_id not in self._pending_ingests:
+            raise ValueError(f"No pending ingest for {file_id}")
+        
+        future, metadata_list = self._pending_ingests[file_id]
+        vectors = future.result(timeout=timeout)
+        del self._pending_ingests[file_id]
+        
+        self._store_vectors(file_id, vectors, metadata_list)
+        return len(metadata_list)
+    
+    def pending_ingests(self) -> List[str]:
+        """List file_ids whose embeddings are still being processed"""
+        return list(self._pending_ingests)
+    
+    def delete_file(self, file_id: str) -> bool:
+        """
+        Unload a CSV file and delete its vectors from memory and disk
+        
+        Args:
+            file_id: File identifier
+            
+        Returns:
+            True if the file was loaded or had a vector store
+        """
+        existed = self.dataframes.pop(file_id, None) is not None
+        for per_file in (
+            self.file_metadata, self.sample_records, self.columns,
+            self.sorted_columns, self.column_ranges
+        ):
+            per_file.pop(file_id, None)
+        # Bumped rather than dropped, so statistics cached for this version
+        # never match a file re-ingested under the same id
+        if file_id in self.file_versions:
+            self.file_versions[file_id] += 1
+        pending = self._pending_ingests.pop(file_id, None)
+        if pending is not None:
+            pending[0].cancel()
+        existed = vector_store_manager.delete_store(file_id) or existed
+        self._invalidate_metadata()
+        return existed
+    
+    def _invalidate_metadata(self) -> None:
+        """Drop the serialized metadata after files are added or removed"""
+        self._metadata_cache = None
+        self._compact_metadata_cache = None
+        self._version += 1
+    
+    def metadata_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Get metadata of all loaded CSV files as plain dicts
+        
+        The list is serialized once and reused until the loaded files change,
+        so callers must treat it as read-only.
+        
+        Returns:
+            List of metadata dicts (JSON-compatible, None fields dropped)
+        """
+        if self._metadata_cache is None:
+            self._metadata_cache = [
+                meta.model_dump(mode='json', exclude_none=True)
+                for meta in self.file_metadata.values()
+            ]
+        return self._metadata_cache
+    
+    def compact_metadata_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Get only the metadata fields the LLM prompts need (see metadata_dicts)
+        
+        Returns:
+            List of compact metadata dicts, cached until the loaded files change
+        """
+        if self._compact_metadata_cache is None:
+            self._compact_metadata_cache = [
+                meta.model_dump(mode='json', include=self.COMPACT_METADATA_FIELDS)
+                for meta in self.file_metadata.values()
+            ]
+        return self._compact_metadata_cache
+    
+    @property
+    def default_file_id(self) -> Optional[str]:
+        """First loaded file, used when a query names none (None if nothing is loaded)"""
+        return next(iter(self.dataframes), None)
     
     def get_dataframe(self, file_id: str) -> pd.DataFrame:
         """Get dataframe by file_id"""
@@ -243,6 +504,16 @@ class CSVIngestion:
             raise ValueError(f"File {file_id} not loaded")
         return self.dataframes[file_id]
     
+    def get_columns(self, file_id: str) -> Dict[str, np.ndarray]:
+        """Get column arrays by file_id (for positional gathers without pandas)"""
+        if file_id not in self.columns:
+            raise ValueError(f"File {file_id} not loaded")
+        return self.columns[file_id]
+    
+    def get_column(self, file_id: str, column: str) -> np.ndarray:
+        """Get one contiguous column array by file_id and column name"""
+        return self.get_columns(file_id)[column]
+    
     def get_metadata(self, file_id: str) -> FileMetadata:
         """Get metadata by file_id"""
         if file_id not in self.file_metadata:
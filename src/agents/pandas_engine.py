@@ -4,9 +4,20 @@ All numeric computations happen here - no LLM involvement
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Iterator, Tuple, Optional
 
+from config.settings import settings
 from src.agents.ingestion import csv_ingestion
+from src.utils.numeric import (
+    group_means,
+    prune_threshold,
+    sorted_threshold_range,
+    summary_stats,
+    threshold_mask,
+    top_positions
+)
+from src.utils.tables import columnar_table
 from src.utils.models import (
     CompareAveragesParams,
     FilterThresholdParams,
@@ -19,6 +30,65 @@ from src.utils.models import (
 class PandasEngine:
     """Executes deterministic pandas operations"""
     
+    def __init__(self):
+        """Initialize engine"""
+        # (file_id, column) -> (file version, column statistics)
+        self._stats_cache: Dict[Tuple[str, str], Tuple[int, Dict[str, float]]] = {}
+        # Worker threads only start on first submit
+        self._stats_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="column-stats")
+    
+    def _is_cached(self, file_id: str, column: str) -> bool:
+        """Check whether _col_stats would answer from the cache"""
+        cached = self._stats_cache.get((file_id, column))
+        return cached is not None and cached[0] == csv_ingestion.file_versions.get(file_id, 0)
+    
+    def _numeric_column(self, file_id: str, column: str) -> Optional[np.ndarray]:
+        """
+        Cached column buffer if it is a plain NumPy numeric column
+        
+        Extension dtypes (nullable ints, strings, ...) are stored as object
+        arrays, so they return None and callers fall back to pandas.
+        
+        Args:
+            file_id: File identifier
+            column: Column name (must exist)
+            
+        Returns:
+            Column array, or None
+        """
+        values = csv_ingestion.get_column(file_id, column)
+        return values if values.dtype.kind in 'biuf' else None
+    
+    def _col_stats(self, file_id: str, column: str) -> Dict[str, float]:
+        """
+        Mean, std, min and max of a column, memoized per loaded file version
+        
+        Args:
+            file_id: File identifier
+            column: Column name (must exist)
+            
+        Returns:
+            Dict with mean, std, min and max
+        """
+        version = csv_ingestion.file_versions.get(file_id, 0)
+        cached = self._stats_cache.get((file_id, column))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        values = self._numeric_column(file_id, column)
+        if values is not None:
+            mean, std, min_val, max_val = summary_stats(values)
+        else:
+            series = csv_ingestion.get_dataframe(file_id)[column]
+            mean = float(series.mean())
+            std = float(series.std())
+            min_val = float(series.min())
+            max_val = float(series.max())
+        
+        stats = {"mean": mean, "std": std, "min": min_val, "max": max_val}
+        self._stats_cache[(file_id, column)] = (version, stats)
+        return stats
+    
     def compare_averages(
         self, 
         params: CompareAveragesParams
@@ -42,8 +112,16 @@ class PandasEngine:
             if column not in df1.columns or column not in df2.columns:
                 raise ValueError(f"Column {column} not found in both files")
             
-            avg1 = float(df1[column].mean())
-            avg2 = float(df2[column].mean())
+            # Two cold columns are reduced concurrently (NumPy releases the GIL)
+            if self._is_cached(params.file1_id, column) or self._is_cached(params.file2_id, column):
+                stats1 = self._col_stats(params.file1_id, column)
+                stats2 = self._col_stats(params.file2_id, column)
+            else:
+                future = self._stats_pool.submit(self._col_stats, params.file1_id, column)
+                stats2 = self._col_stats(params.file2_id, column)
+                stats1 = future.result()
+            avg1 = stats1["mean"]
+            avg2 = stats2["mean"]
             diff = avg1 - avg2
             pct_diff = (diff / avg2 * 100) if avg2 != 0 else 0
             
@@ -61,46 +139,43 @@ class PandasEngine:
             
         elif params.group_by:
             # Group by and compare within single file
-            file_id = params.file1_id or list(csv_ingestion.dataframes.keys())[0]
+            file_id = params.file1_id or csv_ingestion.default_file_id
             df = csv_ingestion.get_dataframe(file_id)
             
             if column not in df.columns or params.group_by not in df.columns:
                 raise ValueError(f"Columns not found")
             
-            grouped = df.groupby(params.group_by)[column].mean()
+            groups, averages = self._group_means(file_id, params.group_by, column)
             
             result_table = [
-                {params.group_by: str(group), "average": float(avg)}
-                for group, avg in grouped.items()
+                {params.group_by: group, "average": avg}
+                for group, avg in zip(groups, averages)
             ]
             
+            # max/min skip groups without values, as pandas does
+            defined = [avg for avg in averages if avg == avg]
             numbers = {
-                f"average_by_{params.group_by}": {
-                    str(group): float(avg) for group, avg in grouped.items()
-                },
-                "overall_average": float(df[column].mean()),
-                "max_average": float(grouped.max()),
-                "min_average": float(grouped.min())
+                f"average_by_{params.group_by}": dict(zip(groups, averages)),
+                "overall_average": self._col_stats(file_id, column)["mean"],
+                "max_average": max(defined) if defined else float('nan'),
+                "min_average": min(defined) if defined else float('nan')
             }
             
         else:
             # Single file average
-            file_id = params.file1_id or list(csv_ingestion.dataframes.keys())[0]
+            file_id = params.file1_id or csv_ingestion.default_file_id
             df = csv_ingestion.get_dataframe(file_id)
             
             if column not in df.columns:
                 raise ValueError(f"Column {column} not found")
             
-            avg = float(df[column].mean())
-            std = float(df[column].std())
-            min_val = float(df[column].min())
-            max_val = float(df[column].max())
+            stats = self._col_stats(file_id, column)
             
             numbers = {
-                "average": avg,
-                "std_dev": std,
-                "min": min_val,
-                "max": max_val,
+                "average": stats["mean"],
+                "std_dev": stats["std"],
+                "min": stats["min"],
+                "max": stats["max"],
                 "count": len(df)
             }
             
@@ -108,6 +183,44 @@ class PandasEngine:
         
         return result_table, numbers
     
+    def _group_means(
+        self, 
+        file_id: str, 
+        group_by: str, 
+        column: str
+    ) -> Tuple[List[str], List[float]]:
+        """
+        Mean of a column per group
+        
+        Numeric NumPy columns use a factorize + np.bincount pass; anything
+        else (extension dtypes, unorderable mixed keys) uses groupby.
+        
+        Args:
+            file_id: File identifier
+            group_by: Grouping column
+            column: Column to average
+            
+        Returns:
+            (group labels as strings in sorted order, group means)
+        """
+        values = self._numeric_column(file_id, column)
+        if values is not None:
+            keys = csv_ingestion.get_column(file_id, group_by)
+            present = ~pd.isna(keys)
+            try:
+                groups, means = group_means(keys[present], values[present])
+            except TypeError:
+                pass  # Keys that cannot be ordered against each other
+            else:
+                return [str(group) for group in groups.tolist()], means.tolist()
+        
+        df = csv_ingestion.get_dataframe(file_id)
+        grouped = df.groupby(group_by)[column].mean()
+        return (
+            [str(group) for group in grouped.index],
+            [float(avg) for avg in grouped.to_numpy()]
+        )
+    
     def filter_threshold(
         self, 
         params: FilterThresholdParams
@@ -121,39 +234,57 @@ class PandasEngine:
         Returns:
             (result_table, numbers)
         """
-        file_id = params.file_id or list(csv_ingestion.dataframes.keys())[0]
+        file_id = params.file_id or csv_ingestion.default_file_id
         df = csv_ingestion.get_dataframe(file_id)
         
+        total_rows = len(df)
+        
         if params.column not in df.columns:
             raise ValueError(f"Column {params.column} not found")
         
-        # Apply filter
-        if params.operator == '>':
-            filtered_df = df[df[params.column] > params.value]
-        elif params.operator == '<':
-            filtered_df = df[df[params.column] < params.value]
-        elif params.operator == '>=':
-            filtered_df = df[df[params.column] >= params.value]
-        elif params.operator == '<=':
-            filtered_df = df[df[params.column] <= params.value]
-        elif params.operator == '==':
-            filtered_df = df[df[params.column] == params.value]
-        elif params.operator == '!=':
-            filtered_df = df[df[params.column] != params.value]
+        # Apply filter: thresholds outside the column's ingest-time min/max
+        # are decided without a scan, columns known to be ascending are cut
+        # with a binary search, plain NumPy columns compare without pandas
+        # overhead and extension dtypes (nullable ints, strings, ...) go
+        # through pandas
+        values = self._numeric_column(file_id, params.column)
+        bounds = None
+        column_range = csv_ingestion.column_ranges.get(file_id, {}).get(params.column)
+        if column_range is not None:
+            every = prune_threshold(*column_range, params.operator, params.value)
+            if every is not None:
+                bounds = (0, total_rows if every else 0)
+        if bounds is None and params.column in csv_ingestion.sorted_columns.get(file_id, ()):
+            bounds = sorted_threshold_range(values, params.operator, params.value)
+        
+        if bounds is not None:
+            start, stop = bounds
+            filtered_rows = stop - start
+            head_df = df.iloc[start:min(stop, start + 100)]
         else:
-            raise ValueError(f"Invalid operator: {params.operator}")
+            if values is not None:
+                mask = threshold_mask(values, params.operator, params.value)
+            else:
+                # Missing values in nullable masks count as no match
+                mask = threshold_mask(df[params.column], params.operator, params.value).to_numpy(
+                    dtype=bool, na_value=False
+                )
+            # Only the returned rows are gathered; the count comes from the positions
+            positions = np.flatnonzero(mask)
+            filtered_rows = positions.size
+            head_df = df.iloc[positions[:100]]
         
         # Get results
-        result_table = filtered_df.head(100).to_dict('records')
+        result_table = columnar_table(head_df)
         
         numbers = {
-            "total_rows": len(df),
-            "filtered_rows": len(filtered_df),
+            "total_rows": total_rows,
+            "filtered_rows": filtered_rows,
             "filter_column": params.column,
             "filter_operator": params.operator,
             "filter_value": params.value,
-            "percentage_matched": (len(filtered_df) / len(df) * 100) if len(df) > 0 else 0,
-            "row_indices": filtered_df.index.tolist()[:100]
+            "percentage_matched": (filtered_rows / total_rows * 100) if total_rows > 0 else 0,
+            "row_indices": head_df.index.tolist()
         }
         
         return result_table, numbers
@@ -165,37 +296,81 @@ class PandasEngine:
         """
         Sort data by column
         
+        Without an explicit limit at most settings.MAX_SORT_ROWS rows are
+        returned; use sort_data_iter to walk a full sort.
+        
         Args:
             params: SortParams
             
         Returns:
             (result_table, numbers)
         """
-        file_id = params.file_id or list(csv_ingestion.dataframes.keys())[0]
+        file_id = params.file_id or csv_ingestion.default_file_id
         df = csv_ingestion.get_dataframe(file_id)
         
         if params.column not in df.columns:
             raise ValueError(f"Column {params.column} not found")
         
-        sorted_df = df.sort_values(by=params.column, ascending=params.ascending)
+        limit = params.limit or settings.MAX_SORT_ROWS
+        values = self._numeric_column(file_id, params.column)
+        total_rows = len(df)
+        if values is not None and limit < total_rows:
+            # Only the returned rows need ordering: partial selection, NaN last
+            sorted_df = df.iloc[
+                top_positions(values, limit, ascending=params.ascending, keep_nan=True)
+            ]
+        else:
+            sorted_df = df.sort_values(by=params.column, ascending=params.ascending).head(limit)
         
-        if params.limit:
-            sorted_df = sorted_df.head(params.limit)
+        result_table = columnar_table(sorted_df)
         
-        result_table = sorted_df.to_dict('records')
+        # First and last values converted to Python scalars in one call
+        returned_rows = len(sorted_df)
+        ends = sorted_df[params.column].iloc[[0, -1]].tolist() if returned_rows > 0 else [None, None]
         
         numbers = {
-            "total_rows": len(df),
-            "returned_rows": len(sorted_df),
+            "total_rows": total_rows,
+            "returned_rows": returned_rows,
             "sort_column": params.column,
             "ascending": params.ascending,
-            "first_value": sorted_df[params.column].iloc[0] if len(sorted_df) > 0 else None,
-            "last_value": sorted_df[params.column].iloc[-1] if len(sorted_df) > 0 else None,
-            "row_indices": sorted_df.index.tolist()
+            "first_value": ends[0],
+            "last_value": ends[-1],
+            "row_indices": sorted_df.index[:100].tolist()
         }
         
         return result_table, numbers
     
+    def sort_data_iter(
+        self, 
+        params: SortParams, 
+        chunk_size: int = 4096
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Sort data by column and yield the rows in columnar chunks
+        
+        Only one chunk is converted to Python values at a time, so a full
+        sort (no limit) can be streamed without building the whole table.
+        
+        Args:
+            params: SortParams (limit is optional here)
+            chunk_size: Rows per yielded table
+            
+        Yields:
+            Columnar result tables in sort order
+        """
+        file_id = params.file_id or csv_ingestion.default_file_id
+        df = csv_ingestion.get_dataframe(file_id)
+        
+        if params.column not in df.columns:
+            raise ValueError(f"Column {params.column} not found")
+        
+        sorted_df = df.sort_values(by=params.column, ascending=params.ascending)
+        if params.limit:
+            sorted_df = sorted_df.head(params.limit)
+        
+        for start in range(0, len(sorted_df), chunk_size):
+            yield columnar_table(sorted_df.iloc[start:start + chunk_size])
+    
     def top_n(
         self, 
         params: TopNParams
@@ -209,19 +384,29 @@ class PandasEngine:
         Returns:
             (result_table, numbers)
         """
-        file_id = params.file_id or list(csv_ingestion.dataframes.keys())[0]
+        file_id = params.file_id or csv_ingestion.default_file_id
         df = csv_ingestion.get_dataframe(file_id)
         
         if params.column not in df.columns:
             raise ValueError(f"Column {params.column} not found")
         
-        sorted_df = df.sort_values(by=params.column, ascending=params.ascending)
-        top_df = sorted_df.head(params.n)
+        values = self._numeric_column(file_id, params.column)
+        if values is not None:
+            # Partial selection: only the n winners are sorted and materialized,
+            # and their values come straight from the column buffer
+            positions = top_positions(
+                values, params.n, ascending=params.ascending, keep_nan=True
+            )
+            top_df = df.iloc[positions]
+            top_array = values[positions]
+        else:
+            top_df = df.sort_values(by=params.column, ascending=params.ascending).head(params.n)
+            top_array = top_df[params.column].to_numpy()
         
-        result_table = top_df.to_dict('records')
+        result_table = columnar_table(top_df)
         
-        # Extract actual values
-        top_values = top_df[params.column].tolist()
+        # Summary numbers read the small top-N array; one bulk conversion to Python
+        top_values = top_array.tolist()
         
         numbers = {
             "n": params.n,
@@ -230,11 +415,29 @@ class PandasEngine:
             "top_indices": top_df.index.tolist(),
             "highest_value": top_values[0] if top_values else None,
             "lowest_in_top": top_values[-1] if top_values else None,
-            "average_of_top": float(np.mean(top_values)) if top_values else None
+            "average_of_top": float(np.mean(top_array)) if top_values else None
         }
         
         return result_table, numbers
     
+    def _nlargest(self, file_id: str, n: int, column: str) -> pd.DataFrame:
+        """
+        Equivalent of df.nlargest(n, column) using a partial selection
+        
+        Args:
+            file_id: File identifier
+            n: Number of rows
+            column: Column to rank by
+            
+        Returns:
+            Top n rows, largest first (ties keep their original order)
+        """
+        df = csv_ingestion.get_dataframe(file_id)
+        values = self._numeric_column(file_id, column)
+        if values is not None:
+            return df.iloc[top_positions(values, n)]
+        return df.nlargest(n, column)
+    
     def compare_top(
         self, 
         params: CompareTopParams
@@ -258,26 +461,33 @@ class PandasEngine:
             raise ValueError(f"Column {params.column} not found in both files")
         
         # Get top N from each
-        top1 = df1.nlargest(params.n, params.column)
-        top2 = df2.nlargest(params.n, params.column)
+        top1 = self._nlargest(params.file1_id, params.n, params.column)
+        top2 = self._nlargest(params.file2_id, params.n, params.column)
+        
+        # Combine for result table from bulk-converted values and indices
+        values1, values2 = top1[params.column].tolist(), top2[params.column].tolist()
+        index1, index2 = top1.index.tolist(), top2.index.tolist()
+        value_key1, value_key2 = f"{params.file1_id}_{params.column}", f"{params.file2_id}_{params.column}"
+        index_key1, index_key2 = f"{params.file1_id}_index", f"{params.file2_id}_index"
+        
+        count1, count2 = len(values1), len(values2)
         
-        # Combine for result table
         result_table = []
         for i in range(params.n):
             row = {"rank": i + 1}
-            if i < len(top1):
-                row[f"{params.file1_id}_{params.column}"] = top1.iloc[i][params.column]
-                row[f"{params.file1_id}_index"] = int(top1.index[i])
-            if i < len(top2):
-                row[f"{params.file2_id}_{params.column}"] = top2.iloc[i][params.column]
-                row[f"{params.file2_id}_index"] = int(top2.index[i])
+            if i < count1:
+                row[value_key1] = values1[i]
+                row[index_key1] = int(index1[i])
+            if i < count2:
+                row[value_key2] = values2[i]
+                row[index_key2] = int(index2[i])
             result_table.append(row)
         
         numbers = {
             "n": params.n,
             "column": params.column,
-            f"{params.file1_id}_top_values": top1[params.column].tolist(),
-            f"{params.file2_id}_top_values": top2[params.column].tolist(),
+            f"{params.file1_id}_top_values": values1,
+            f"{params.file2_id}_top_values": values2,
             f"{params.file1_id}_average": float(top1[params.column].mean()),
             f"{params.file2_id}_average": float(top2[params.column].mean()),
             f"{params.file1_id}_max": float(top1[params.column].max()),
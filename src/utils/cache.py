@@ -0,0 +1,179 @@
+"""
+Small persistent caches shared by the agent modules
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    Bounded key/value cache stored in a single SQLite file
+    
+    bytes values (e.g. packed embeddings) are stored as raw BLOBs and
+    anything else as JSON text, so reading an entry never unpickles. Entries
+    older than ttl_seconds are ignored and deleted, and once more than
+    max_entries are stored the oldest are dropped.
+    """
+    
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = 10000,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Initialize cache (the file is created lazily on first use)
+        
+        Args:
+            path: Location of the SQLite file
+            max_entries: Entries kept (oldest are deleted first)
+            ttl_seconds: Entry lifetime (None keeps entries until evicted)
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Upper bound on the stored rows (replacements count twice until the
+        # next prune), so the table is only pruned when it may be over the cap
+        self._row_estimate = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the backing database on first use (caller holds the lock)"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            # Entries of the earlier pickle-valued layout are not read any more
+            conn.execute("DROP TABLE IF EXISTS cache")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            conn.commit()
+            self._row_estimate = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            self._conn = conn
+        return self._conn
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Look up a cached value
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss or for an expired entry
+            
+        Returns:
+            Cached value or default
+        """
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT value, created FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed for {self.path}: {e}")
+            return default
+        
+        if row is None:
+            return default
+        value, created = row
+        if self.ttl_seconds is not None and time.time() - created > self.ttl_seconds:
+            return default  # Deleted by the next prune
+        return value if isinstance(value, bytes) else json.loads(value)
+    
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value
+        
+        Args:
+            key: Cache key
+            value: bytes, or any JSON-serializable value
+        """
+        stored = value if isinstance(value, bytes) else json.dumps(value)
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, created) VALUES (?, ?, ?)",
+                    (key, stored, time.time())
+                )
+                self._row_estimate += 1
+                if self._row_estimate > self.max_entries:
+                    self._prune(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed for {self.path}: {e}")
+    
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Delete expired entries, then the oldest beyond max_entries (caller holds the lock)"""
+        if self.ttl_seconds is not None:
+            conn.execute(
+                "DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,)
+            )
+        conn.execute(
+            "DELETE FROM entries WHERE key IN "
+            "(SELECT key FROM entries ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._row_estimate = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class MemoryCache:
+    """In-process LRU with an optional per-entry time to live"""
+    
+    def __init__(self, max_entries: int = 4096, ttl_seconds: Optional[float] = None):
+        """
+        Initialize cache
+        
+        Args:
+            max_entries: Entries kept (least recently used are dropped)
+            ttl_seconds: Entry lifetime (None keeps entries until evicted)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Look up a cached value
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss or for an expired entry
+            
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if self.ttl_seconds is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value
+        
+        Args:
+            key: Cache key
+            value: Value (shared with later readers)
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,112 @@
+"""
+Coalesces concurrent single-text embedding requests into batched API calls
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Size/time-bounded batcher in front of a batch embedding function
+
+    Callers block in embed(); a background thread takes the first pending
+    request, waits up to max_wait_ms for more (or until max_batch_size is
+    reached) and resolves them all with one embed_batch call.
+    """
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 20.0
+    ):
+        """
+        Initialize batcher (the worker thread starts on first use)
+
+        Args:
+            embed_batch: Function embedding a list of texts into a matrix
+            max_batch_size: Maximum texts per call
+            max_wait_ms: How long a request may wait for others to join
+        """
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Embed one text, sharing an API call with concurrent callers
+
+        Args:
+            text: Input text
+            timeout: Seconds to wait for the result (None waits indefinitely)
+
+        Returns:
+            Embedding vector
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout=timeout)
+
+    def _ensure_worker(self) -> None:
+        """Start the background thread once"""
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        """Block for one request, then gather more until full or the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        """Worker loop"""
+        while True:
+            batch = self._next_batch()
+
+            # Identical texts in one window share a single slot in the call
+            positions: Dict[str, int] = {}
+            for text, _ in batch:
+                positions.setdefault(text, len(positions))
+
+            # Any failure is delivered to this batch's callers; the worker
+            # itself must keep running or every later embed() would hang
+            try:
+                vectors = self.embed_batch(list(positions))
+                if len(vectors) != len(positions):
+                    raise ValueError(
+                        f"Expected {len(positions)} embeddings, got {len(vectors)}"
+                    )
+                results = [vectors[positions[text]] for text, _ in batch]
+            except Exception as e:
+                logger.warning(f"Batched embedding of {len(positions)} texts failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, results):
+                future.set_result(vector)
@@ -0,0 +1,276 @@
+"""
+Content-addressed cache for document embeddings
+
+Vectors are keyed by sha256(model + text), so re-ingesting a file only embeds
+chunks that have not been seen before. Entries live in SQLite (float32 bytes,
+or int8 codes with a per-vector scale) with a bounded in-memory LRU in front
+of it. SimHash fingerprints can be stored alongside, so lightly edited texts
+can reuse the vector of an earlier version.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from src.utils.quantize import pack_int8, unpack_int8
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """SQLite-backed text hash -> embedding store with an in-memory LRU"""
+
+    def __init__(
+        self,
+        path: Path,
+        model: str,
+        max_memory_items: int = 10000,
+        int8: bool = False
+    ):
+        """
+        Initialize cache (the file is created lazily on first use)
+
+        Args:
+            path: Location of the SQLite file
+            model: Embedding model the vectors belong to
+            max_memory_items: Vectors kept in the in-memory LRU
+            int8: Store new vectors as int8 codes plus a scale (4x smaller)
+        """
+        self.path = Path(path)
+        self.model = model
+        self.max_memory_items = max_memory_items
+        self.int8 = int8
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # key -> SimHash of this model's fingerprinted texts, loaded on first use
+        self._fingerprints: Optional[Dict[str, int]] = None
+        # num_bands -> (band, band value) -> keys; rebuilt when fingerprints change
+        self._band_index: Dict[int, Dict[Tuple[int, int], List[str]]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the backing database on first use"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(hash TEXT PRIMARY KEY, model TEXT, dim INT, vec BLOB)"
+            )
+            # SQLite integers are signed, so fingerprints are stored as int64
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints "
+                "(hash TEXT PRIMARY KEY, model TEXT, fp INTEGER)"
+            )
+        return self._conn
+
+    def key(self, text: str) -> str:
+        """
+        Hash a text together with the model name
+
+        Args:
+            text: Text that would be embedded
+
+        Returns:
+            Hex digest used as cache key
+        """
+        return hashlib.sha256(f"{self.model}\0{text}".encode()).hexdigest()
+
+    def _remember(self, h: str, vector: np.ndarray) -> None:
+        """Add a vector to the in-memory LRU (caller holds the lock)"""
+        self._memory[h] = vector
+        self._memory.move_to_end(h)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _decode(blob: bytes, dim: int) -> np.ndarray:
+        """Decode a stored vector (fp32, or int8 codes with a scale prefix)"""
+        if len(blob) == dim * 4:
+            vector = np.frombuffer(blob, dtype=np.float32)
+        else:
+            vector = unpack_int8(blob)
+            vector.setflags(write=False)
+        return vector
+
+    def get(self, h: str) -> Optional[np.ndarray]:
+        """
+        Look up one vector
+
+        Args:
+            h: Key from key()
+
+        Returns:
+            Read-only float32 vector, or None on a miss
+        """
+        return self.get_many([h]).get(h)
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up many vectors, hitting SQLite only for keys not in memory
+
+        Args:
+            hashes: Keys from key()
+
+        Returns:
+            Dict of key -> vector for the keys that were found
+        """
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+
+        with self._lock:
+            for h in hashes:
+                if h in self._memory:
+                    self._memory.move_to_end(h)
+                    found[h] = self._memory[h]
+                else:
+                    missing.append(h)
+
+            if not missing:
+                return found
+
+            try:
+                conn = self._connect()
+                # Stay well under SQLite's bound-parameter limit
+                for i in range(0, len(missing), 500):
+                    chunk = missing[i:i + 500]
+                    rows = conn.execute(
+                        f"SELECT hash, dim, vec FROM embeddings WHERE model = ? AND hash IN "
+                        f"({','.join('?' * len(chunk))})",
+                        (self.model, *chunk)
+                    ).fetchall()
+                    for h, dim, blob in rows:
+                        vector = self._decode(blob, dim)
+                        found[h] = vector
+                        self._remember(h, vector)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache read failed for {self.path}: {e}")
+
+        return found
+
+    def put_many(self, pairs: Iterable[Tuple[str, np.ndarray]]) -> None:
+        """
+        Store vectors (upsert)
+
+        Args:
+            pairs: (key, vector) pairs
+        """
+        rows = []
+        with self._lock:
+            for h, vector in pairs:
+                vector = np.array(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                self._remember(h, vector)
+                blob = pack_int8(vector) if self.int8 else vector.tobytes()
+                rows.append((h, self.model, vector.shape[0], blob))
+
+            if not rows:
+                return
+
+            try:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, model, dim, vec) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed for {self.path}: {e}")
+    
+    def _load_fingerprints(self) -> Dict[str, int]:
+        """Read this model's fingerprints on first use (caller holds the lock)"""
+        if self._fingerprints is None:
+            self._fingerprints = {}
+            try:
+                rows = self._connect().execute(
+                    "SELECT hash, fp FROM fingerprints WHERE model = ?", (self.model,)
+                ).fetchall()
+                self._fingerprints = {h: fp & 0xFFFFFFFFFFFFFFFF for h, fp in rows}
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache fingerprint read failed for {self.path}: {e}")
+        return self._fingerprints
+    
+    def put_fingerprints(self, pairs: Iterable[Tuple[str, int]]) -> None:
+        """
+        Record SimHash fingerprints of cached texts
+        
+        Args:
+            pairs: (key, unsigned 64-bit fingerprint) pairs
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        with self._lock:
+            self._load_fingerprints().update(pairs)
+            self._band_index.clear()
+            try:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO fingerprints (hash, model, fp) VALUES (?, ?, ?)",
+                    [(h, self.model, fp - (1 << 64) if fp >= 1 << 63 else fp) for h, fp in pairs]
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache fingerprint write failed for {self.path}: {e}")
+    
+    def find_near_duplicates(
+        self,
+        fingerprints: List[int],
+        max_distance: int
+    ) -> List[Optional[str]]:
+        """
+        Find cached texts whose fingerprints are within max_distance bits
+        
+        Fingerprints are split into max_distance + 1 bands, as in
+        cluster_near_duplicates, so only entries sharing a band are compared.
+        
+        Args:
+            fingerprints: SimHash fingerprints of texts that missed the cache
+            max_distance: Maximum Hamming distance
+            
+        Returns:
+            For each fingerprint, the key of the closest cached text, or None
+        """
+        num_bands = max_distance + 1
+        band_bits = 64 // num_bands
+        mask = (1 << band_bits) - 1
+        
+        with self._lock:
+            known = self._load_fingerprints()
+            if not known:
+                return [None] * len(fingerprints)
+            
+            index = self._band_index.get(num_bands)
+            if index is None:
+                index = {}
+                for h, fp in known.items():
+                    for band in range(num_bands):
+                        index.setdefault((band, (fp >> (band * band_bits)) & mask), []).append(h)
+                self._band_index[num_bands] = index
+            
+            matches: List[Optional[str]] = []
+            for fp in fingerprints:
+                best, best_distance = None, max_distance + 1
+                for band in range(num_bands):
+                    for h in index.get((band, (fp >> (band * band_bits)) & mask), ()):
+                        distance = (fp ^ known[h]).bit_count()
+                        if distance < best_distance:
+                            best, best_distance = h, distance
+                matches.append(best)
+            return matches
+
+
+# Global cache instance
+embedding_cache = EmbeddingCache(
+    settings.CACHE_DIR / "embeddings.sqlite",
+    model=settings.get_embedding_namespace(),
+    max_memory_items=settings.EMBEDDING_CACHE_SIZE,
+    int8=settings.EMBEDDING_CACHE_INT8
+)
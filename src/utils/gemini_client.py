@@ -3,13 +3,62 @@ Gemini API client for embeddings and text generation
 Extended with document query support
 """
 import google.generativeai as genai
-from typing import List, Dict, Any, Optional
+from google.api_core import exceptions as google_exceptions
+from typing import List, Dict, Any, Callable, Optional, Tuple, Iterator, AsyncIterator
+import asyncio
+import copy
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import json
+import random
+import re
+import time
 import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from config.settings import settings
+from src.utils.cache import DiskCache, MemoryCache
+from src.utils.embedding_batcher import EmbeddingBatcher
+from src.utils.embedding_cache import embedding_cache
+from src.utils.intent_rules import rule_parse
+from src.utils.quantize import pack_int8, unpack_int8
+from src.utils.rate_limiter import TokenBucket
+from src.utils.semantic_cache import SemanticCache
+from src.utils.simhash import cluster_near_duplicates, simhash
+from src.utils.tables import ResultTable, table_rows
+from src.utils.tracing import span
 import logging
 
 logger = logging.getLogger(__name__) 
 
+# Errors worth retrying: rate limits, overloaded or failing backends, timeouts
+_TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    TimeoutError,
+    ConnectionError,
+)
+
+# Body of a markdown code fence (```json ... ```) around a JSON response
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+@functools.lru_cache(maxsize=64)
+def _generation_config(temperature: float, max_output_tokens: int) -> genai.GenerationConfig:
+    """
+    Shared GenerationConfig per (temperature, max_output_tokens)
+    
+    The SDK copies the config into each request, so one instance can serve
+    every call and thread; treat the returned object as read-only.
+    """
+    return genai.GenerationConfig(temperature=temperature, max_output_tokens=max_output_tokens)
+
 class GeminiClient:
     """Client for Google Gemini API"""
     
@@ -25,7 +74,93 @@ class GeminiClient:
             
         genai.configure(api_key=settings.GEMINI_API_KEY)
         self.embedding_model = settings.EMBEDDING_MODEL
+        self._embedding_options = (
+            {"output_dimensionality": settings.EMBEDDING_OUTPUT_DIMENSIONALITY}
+            if settings.EMBEDDING_OUTPUT_DIMENSIONALITY else {}
+        )
         self.generative_model = genai.GenerativeModel(settings.GENERATIVE_MODEL)
+        self._narrative_cache = DiskCache(
+            settings.CACHE_DIR / "narratives.sqlite",
+            settings.DISK_CACHE_MAX_ENTRIES,
+            settings.DISK_CACHE_TTL_SECONDS
+        )
+        self._document_answer_cache = DiskCache(
+            settings.CACHE_DIR / "document_answers.sqlite",
+            settings.DISK_CACHE_MAX_ENTRIES,
+            settings.DISK_CACHE_TTL_SECONDS
+        )
+        self._file_context_cache: Optional[Tuple[Any, Any, Tuple[str, str]]] = None
+        self._rate_limiter = (
+            TokenBucket(settings.GENERATION_REQUESTS_PER_MINUTE, settings.GENERATION_BURST)
+            if settings.GENERATION_REQUESTS_PER_MINUTE else None
+        )
+        self._embedding_pool: Optional[ThreadPoolExecutor] = None
+        self._response_cache = MemoryCache(
+            max_entries=settings.RESPONSE_CACHE_SIZE,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS
+        )
+        self._semantic_cache = SemanticCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            lsh_tables=settings.SEMANTIC_CACHE_LSH_TABLES,
+            lsh_bits=settings.SEMANTIC_CACHE_LSH_BITS,
+            hnsw_m=settings.SEMANTIC_CACHE_HNSW_M,
+            hnsw_ef_search=settings.HNSW_EF_SEARCH
+        )
+    
+    @staticmethod
+    def _retry_delay(attempt: int) -> float:
+        """Full-jitter backoff: uniform in [0, base * 2**attempt], capped"""
+        cap = min(
+            settings.GENERATION_RETRY_MAX_DELAY,
+            settings.GENERATION_RETRY_BASE_DELAY * (2 ** attempt)
+        )
+        return random.uniform(0, cap)
+    
+    def _with_retries(self, call: Callable[[], Any]) -> Any:
+        """Run call, retrying transient errors with backoff"""
+        for attempt in range(settings.GENERATION_MAX_RETRIES + 1):
+            try:
+                return call()
+            except _TRANSIENT_ERRORS as e:
+                if attempt == settings.GENERATION_MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"Gemini request failed ({e}); retrying in {delay:.1f}s")
+                with span("gemini.retry_backoff"):
+                    time.sleep(delay)
+    
+    def _generate_content(self, *args, **kwargs):
+        """
+        generate_content behind the client-side rate limit (if configured)
+        
+        Transient errors are retried with backoff; every attempt takes its own
+        rate-limit token.
+        """
+        def call():
+            if self._rate_limiter is not None:
+                with span("gemini.rate_limit"):
+                    self._rate_limiter.acquire()
+            return self.generative_model.generate_content(*args, **kwargs)
+        
+        return self._with_retries(call)
+    
+    async def _agenerate_content(self, *args, **kwargs):
+        """generate_content_async counterpart of _generate_content"""
+        for attempt in range(settings.GENERATION_MAX_RETRIES + 1):
+            if self._rate_limiter is not None:
+                with span("gemini.rate_limit"):
+                    await self._rate_limiter.acquire_async()
+            try:
+                return await self.generative_model.generate_content_async(*args, **kwargs)
+            except _TRANSIENT_ERRORS as e:
+                if attempt == settings.GENERATION_MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"Gemini request failed ({e}); retrying in {delay:.1f}s")
+                with span("gemini.retry_backoff"):
+                    await asyncio.sleep(delay)
     
     def generate_embedding(self, text: str) -> np.ndarray:
         """
@@ -40,31 +175,62 @@ class GeminiClient:
         result = genai.embed_content(
             model=self.embedding_model,
             content=text,
-            task_type="retrieval_document"
+            task_type="retrieval_document",
+            **self._embedding_options
         )
         return np.array(result['embedding'], dtype=np.float32)
     
-    def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> np.ndarray:
         """
         Generate embeddings for multiple texts
         
+        Batches are sent concurrently (up to EMBEDDING_MAX_CONCURRENCY
+        requests in flight) and transient errors are retried.
+        
         Args:
             texts: List of input texts
+            batch_size: Texts per batchEmbedContents request (the API allows up to 100)
             
         Returns:
             Matrix of embeddings (n_texts x embedding_dim)
         """
-        embeddings = []
+        if not texts:
+            return np.empty((0, settings.VECTOR_DIMENSION), dtype=np.float32)
+        
+        # One round-trip per batch instead of one per text
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        if len(batches) > 1 and settings.EMBEDDING_MAX_CONCURRENCY > 1:
+            results = self._get_embedding_pool().map(self._embed_document_batch, batches)
+        else:
+            results = map(self._embed_document_batch, batches)
         
-        # Process in batches to avoid rate limits
-        batch_size = 100
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            for text in batch:
-                emb = self.generate_embedding(text)
-                embeddings.append(emb)
+        vectors = None
+        for i, batch in zip(range(0, len(texts), batch_size), results):
+            # Allocate the output once the embedding width is known
+            if vectors is None:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[i:i + len(batch)] = batch
         
-        return np.vstack(embeddings)
+        return vectors
+    
+    def _embed_document_batch(self, batch: List[str]) -> np.ndarray:
+        """One batchEmbedContents request (retried on transient errors)"""
+        result = self._with_retries(lambda: genai.embed_content(
+            model=self.embedding_model,
+            content=batch,
+            task_type="retrieval_document",
+            **self._embedding_options
+        ))
+        return np.asarray(result['embedding'], dtype=np.float32)
+    
+    def _get_embedding_pool(self) -> ThreadPoolExecutor:
+        """Get the thread pool for concurrent embedding batches, creating it on first use"""
+        if self._embedding_pool is None:
+            self._embedding_pool = ThreadPoolExecutor(
+                max_workers=settings.EMBEDDING_MAX_CONCURRENCY,
+                thread_name_prefix="gemini-embed"
+            )
+        return self._embedding_pool
     
     def generate_query_embedding(self, query: str) -> np.ndarray:
         """
@@ -79,41 +245,32 @@ class GeminiClient:
         result = genai.embed_content(
             model=self.embedding_model,
             content=query,
-            task_type="retrieval_query"
+            task_type="retrieval_query",
+            **self._embedding_options
         )
         return np.array(result['embedding'], dtype=np.float32)
     
-    def parse_intent(
-        self, 
-        user_query: str, 
-        csv_metadata: List[Dict[str, Any]],
-        doc_metadata: List[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
+    def generate_query_embeddings_batch(self, queries: List[str]) -> np.ndarray:
         """
-        Parse user query into structured action intent
+        Generate query embeddings for several queries in one request
         
         Args:
-            user_query: Natural language query
-            csv_metadata: Metadata about available CSV files
-            doc_metadata: Metadata about available analysis documents
+            queries: Query texts (at most 100)
             
         Returns:
-            Parsed intent as dictionary
+            Matrix of query embeddings (n_queries x embedding_dim)
         """
-        # Build context about available files
-        csv_context = "\n".join([
-            f"- CSV File ID: {f['file_id']}, Columns: {', '.join(f['columns'])}, "
-            f"Numeric columns: {', '.join(f['numeric_columns'])}"
-            for f in csv_metadata
-        ]) if csv_metadata else "No CSV files loaded"
-        
-        doc_context = "\n".join([
-            f"- Analysis ID: {d['file_id']}, Type: {d['document_type']}, "
-            f"Filename: {d['filename']}, Q&A pairs: {d.get('num_qa_pairs', 0)}"
-            for d in (doc_metadata or [])
-        ]) if doc_metadata else "No analysis documents loaded"
-        
-        prompt = f"""You are an intent parser for an analytical agent. Parse the user query into a JSON action.
+        result = genai.embed_content(
+            model=self.embedding_model,
+            content=queries,
+            task_type="retrieval_query",
+            **self._embedding_options
+        )
+        return np.asarray(result['embedding'], dtype=np.float32)
+    
+    # Static intent-parsing instructions; only the file context and the
+    # query/output blocks change between calls
+    _INTENT_PROMPT_TEMPLATE = """You are an intent parser for an analytical agent. Parse the user query into a JSON action.
 
 Available CSV files:
 {csv_context}
@@ -163,7 +320,7 @@ ANALYSIS INTENT (for analysis content):
    Use when: "what does the analysis say", "explain from analysis", "bearing diagnostics analysis", "Q1 from analysis", "rise in envelope", "analysis of kurtosis"
    Parameters: {{"query": str, "file_id": str|null, "top_k": int}}
 
-User query: "{user_query}"
+{query_block}
 
 DECISION RULES:
 - "highest/lowest VALUE in CSV" → top_n (analytical)
@@ -172,38 +329,131 @@ DECISION RULES:
 - "rise in envelope/acceleration/velocity" → document_query (analysis)
 - "harmonic energy", "kurtosis", "crest factor" → document_query (analysis)
 
-Parse this into JSON with keys "intent" and "parameters". 
-Return ONLY valid JSON, no explanation.
+{output_block}
 
 Examples:
 - "Show the highest value" → {{"intent": "top_n", "parameters": {{"column": "auto-detect", "n": 1, "ascending": false}}}}
 - "What does the analysis say about envelope rise?" → {{"intent": "document_query", "parameters": {{"query": "envelope rise", "top_k": 3}}}}
 - "Describe the CSV" → {{"intent": "general_query", "parameters": {{"question": "Describe the CSV"}}}}
 """
-
-        response = self.generative_model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=settings.TEMPERATURE,
-                max_output_tokens=settings.MAX_TOKENS
-            )
+    
+    def _intent_prompt(
+        self,
+        csv_metadata: List[Dict[str, Any]],
+        doc_metadata: Optional[List[Dict[str, Any]]],
+        query_block: str,
+        output_block: str
+    ) -> str:
+        """
+        Build the intent-parsing prompt around one or more user queries
+        
+        Args:
+            csv_metadata: Metadata about available CSV files
+            doc_metadata: Metadata about available analysis documents
+            query_block: Prompt lines presenting the user query (or queries)
+            output_block: Prompt lines describing the expected JSON output
+            
+        Returns:
+            Prompt text
+        """
+        csv_context, doc_context = self._file_context(csv_metadata, doc_metadata)
+        return self._INTENT_PROMPT_TEMPLATE.format(
+            csv_context=csv_context,
+            doc_context=doc_context,
+            query_block=query_block,
+            output_block=output_block
         )
+    
+    def _file_context(
+        self,
+        csv_metadata: List[Dict[str, Any]],
+        doc_metadata: Optional[List[Dict[str, Any]]]
+    ) -> Tuple[str, str]:
+        """
+        Render the available-files sections of the intent prompt
+        
+        The ingestion modules hand out the same cached metadata lists until a
+        file is added, so the rendering is reused while both lists are unchanged.
         
-        # Extract JSON from response
-        import json
-        text = response.text.strip()
+        Args:
+            csv_metadata: Metadata about available CSV files
+            doc_metadata: Metadata about available analysis documents
+            
+        Returns:
+            (CSV section, document section)
+        """
+        cached = self._file_context_cache
+        if cached is not None and cached[0] is csv_metadata and cached[1] is doc_metadata:
+            return cached[2]
         
-        # Remove markdown code blocks if present
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
+        csv_context = "\n".join([
+            f"- CSV File ID: {f['file_id']}, Columns: {', '.join(f['columns'])}, "
+            f"Numeric columns: {', '.join(f['numeric_columns'])}"
+            for f in csv_metadata
+        ]) if csv_metadata else "No CSV files loaded"
         
-        parsed = json.loads(text.strip())
+        doc_context = "\n".join([
+            f"- Analysis ID: {d['file_id']}, Type: {d['document_type']}, "
+            f"Filename: {d['filename']}, Q&A pairs: {d.get('num_qa_pairs', 0)}"
+            for d in (doc_metadata or [])
+        ]) if doc_metadata else "No analysis documents loaded"
         
-        # Post-process: If top_n with auto-detect column, find numeric columns
+        context = (csv_context, doc_context)
+        # Holding the lists keeps their identities from being reused
+        self._file_context_cache = (csv_metadata, doc_metadata, context)
+        return context
+    
+    @staticmethod
+    def _prompt_key(prompt: str) -> str:
+        """Cache key for a prompt sent to the generative model"""
+        return hashlib.blake2b(
+            f"{settings.GENERATIVE_MODEL}\0{prompt}".encode(), digest_size=20
+        ).hexdigest()
+    
+    def _response_key(self, prompt: str, no_cache: bool) -> Optional[str]:
+        """Exact-match cache key for a prompt, or None when the cache is not used"""
+        if no_cache or not settings.RESPONSE_CACHE_ENABLED:
+            return None
+        return self._prompt_key(prompt)
+    
+    def _semantic_key(
+        self,
+        query: str,
+        no_cache: bool,
+        *context: str
+    ) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Namespace and query embedding for the semantic cache
+        
+        Args:
+            query: User query
+            no_cache: Bypass the cache for this call
+            context: Strings the response depends on besides the query
+            
+        Returns:
+            (namespace, embedding), or (None, None) when the cache is not used
+        """
+        if no_cache or not settings.SEMANTIC_CACHE_ENABLED:
+            return None, None
+        namespace = hashlib.blake2b(
+            "\0".join((settings.GENERATIVE_MODEL, *context)).encode(), digest_size=16
+        ).hexdigest()
+        return namespace, embed_query(query)
+    
+    def _parse_json_response(self, text: str) -> Any:
+        """Decode a JSON model response, tolerating markdown code fences"""
+        match = _JSON_FENCE.search(text)
+        payload = match.group(1) if match else text.strip()
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return orjson.loads(payload) if orjson is not None else json.loads(payload)
+    
+    def _postprocess_intent(
+        self, 
+        parsed: Dict[str, Any], 
+        csv_metadata: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Resolve placeholder parameters in a parsed intent"""
+        # If top_n with auto-detect column, find numeric columns
         if parsed.get('intent') == 'top_n' and parsed.get('parameters', {}).get('column') == 'auto-detect':
             if csv_metadata and csv_metadata[0].get('numeric_columns'):
                 numeric_cols = csv_metadata[0]['numeric_columns']
@@ -211,12 +461,191 @@ Examples:
         
         return parsed
     
+    def parse_intent(
+        self, 
+        user_query: str, 
+        csv_metadata: List[Dict[str, Any]],
+        doc_metadata: List[Dict[str, Any]] = None,
+        no_cache: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Parse user query into structured action intent
+        
+        Args:
+            user_query: Natural language query
+            csv_metadata: Metadata about available CSV files
+            doc_metadata: Metadata about available analysis documents
+            no_cache: Skip the response caches
+            
+        Returns:
+            Parsed intent as dictionary
+        """
+        if settings.INTENT_RULES_ENABLED:
+            parsed = rule_parse(user_query, csv_metadata)
+            if parsed is not None:
+                return parsed
+        
+        prompt = self._intent_prompt(
+            csv_metadata,
+            doc_metadata,
+            f'User query: "{user_query}"',
+            'Parse this into JSON with keys "intent" and "parameters". \n'
+            'Return ONLY valid JSON, no explanation.'
+        )
+        
+        # Exact repeats first, then paraphrases; callers modify the result, so
+        # cached intents are handed out as copies
+        key = self._response_key(prompt, no_cache)
+        if key is not None:
+            cached = self._response_cache.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        
+        namespace, vector = self._semantic_key(
+            user_query, no_cache, "intent", *self._file_context(csv_metadata, doc_metadata)
+        )
+        if vector is not None:
+            cached = self._semantic_cache.get(namespace, vector)
+            if cached is not None:
+                return copy.deepcopy(cached)
+
+        response = self._generate_content(
+            prompt,
+            generation_config=_generation_config(settings.TEMPERATURE, settings.MAX_TOKENS)
+        )
+        
+        parsed = self._postprocess_intent(self._parse_json_response(response.text), csv_metadata)
+        if key is not None or vector is not None:
+            stored = copy.deepcopy(parsed)
+            if key is not None:
+                self._response_cache.set(key, stored)
+            if vector is not None:
+                self._semantic_cache.set(namespace, vector, stored)
+        return parsed
+    
+    def _rule_parse_batch(
+        self,
+        user_queries: List[str],
+        csv_metadata: List[Dict[str, Any]]
+    ) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+        """
+        Resolve the formulaic queries of a batch without the LLM
+        
+        Returns:
+            (intents with None for unresolved queries, indices of those queries)
+        """
+        if settings.INTENT_RULES_ENABLED:
+            intents = [rule_parse(query, csv_metadata) for query in user_queries]
+        else:
+            intents = [None] * len(user_queries)
+        return intents, [i for i, intent in enumerate(intents) if intent is None]
+    
+    def _intent_batch_prompt(
+        self,
+        user_queries: List[str],
+        csv_metadata: List[Dict[str, Any]],
+        doc_metadata: Optional[List[Dict[str, Any]]]
+    ) -> str:
+        """Build one intent-parsing prompt covering several user queries"""
+        numbered = "\n".join(f'{i}. "{q}"' for i, q in enumerate(user_queries, 1))
+        return self._intent_prompt(
+            csv_metadata,
+            doc_metadata,
+            f"Parse the following {len(user_queries)} user queries:\n{numbered}",
+            'Parse each query into JSON with keys "intent" and "parameters". \n'
+            f"Return ONLY a JSON list of {len(user_queries)} objects, one per query "
+            "in the same order, no explanation."
+        )
+    
+    def _parse_intent_batch_response(
+        self,
+        text: str,
+        num_queries: int,
+        csv_metadata: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Decode and validate the JSON list returned for a batched parse"""
+        parsed = self._parse_json_response(text)
+        if not isinstance(parsed, list) or len(parsed) != num_queries:
+            raise ValueError(
+                f"Expected a JSON list of {num_queries} intents, got: {text[:200]}"
+            )
+        return [self._postprocess_intent(item, csv_metadata) for item in parsed]
+    
+    def parse_intent_batch(
+        self, 
+        user_queries: List[str], 
+        csv_metadata: List[Dict[str, Any]],
+        doc_metadata: List[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Parse several user queries with a single model call
+        
+        Args:
+            user_queries: Natural language queries
+            csv_metadata: Metadata about available CSV files
+            doc_metadata: Metadata about available analysis documents
+            
+        Returns:
+            Parsed intents, in the same order as user_queries
+        """
+        intents, pending = self._rule_parse_batch(user_queries, csv_metadata)
+        if not pending:
+            return intents
+        queries = [user_queries[i] for i in pending]
+        
+        prompt = self._intent_batch_prompt(queries, csv_metadata, doc_metadata)
+        
+        response = self._generate_content(
+            prompt,
+            generation_config=_generation_config(settings.TEMPERATURE, settings.MAX_TOKENS * len(queries))
+        )
+        
+        parsed = self._parse_intent_batch_response(response.text, len(queries), csv_metadata)
+        for i, intent in zip(pending, parsed):
+            intents[i] = intent
+        return intents
+    
+    async def aparse_intent_batch(
+        self, 
+        user_queries: List[str], 
+        csv_metadata: List[Dict[str, Any]],
+        doc_metadata: List[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of parse_intent_batch
+        
+        Args:
+            user_queries: Natural language queries
+            csv_metadata: Metadata about available CSV files
+            doc_metadata: Metadata about available analysis documents
+            
+        Returns:
+            Parsed intents, in the same order as user_queries
+        """
+        intents, pending = self._rule_parse_batch(user_queries, csv_metadata)
+        if not pending:
+            return intents
+        queries = [user_queries[i] for i in pending]
+        
+        prompt = self._intent_batch_prompt(queries, csv_metadata, doc_metadata)
+        
+        response = await self._agenerate_content(
+            prompt,
+            generation_config=_generation_config(settings.TEMPERATURE, settings.MAX_TOKENS * len(queries))
+        )
+        
+        parsed = self._parse_intent_batch_response(response.text, len(queries), csv_metadata)
+        for i, intent in zip(pending, parsed):
+            intents[i] = intent
+        return intents
+    
     def answer_general_query(
         self,
         question: str,
         csv_metadata: List[Dict[str, Any]],
         doc_metadata: List[Dict[str, Any]] = None,
-        sample_data: Optional[Dict[str, Any]] = None
+        sample_data: Optional[Dict[str, Any]] = None,
+        no_cache: bool = False
     ) -> str:
         """
         Answer general conversational queries about the data
@@ -226,6 +655,7 @@ Examples:
             csv_metadata: Metadata about loaded CSV files
             doc_metadata: Metadata about loaded analysis documents
             sample_data: Optional sample data from files
+            no_cache: Skip the response cache
             
         Returns:
             Natural language answer
@@ -279,33 +709,29 @@ Provide a clear, informative answer. If the question asks about:
 
 Be conversational and helpful. Format your response with clear sections if needed."""
 
-        response = self.generative_model.generate_content(
+        key = self._response_key(prompt, no_cache)
+        if key is not None:
+            cached = self._response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self._generate_content(
             prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=1000
-            )
+            generation_config=_generation_config(0.3, 1000)
         )
         
-        return response.text.strip()
+        answer = response.text.strip()
+        if key is not None:
+            self._response_cache.set(key, answer)
+        return answer
     
-    def answer_document_query(
+    def _document_prompt(
         self,
         query: str,
         context_text: str,
         search_results: List[tuple]
     ) -> str:
-        """
-        Answer query using retrieved analysis context
-        
-        Args:
-            query: User's question
-            context_text: Retrieved context from analysis
-            search_results: List of (chunk, similarity, metadata) tuples
-            
-        Returns:
-            Natural language answer
-        """
+        """Build the prompt answering a query from retrieved passages"""
         # Check if we have Q&A pairs in results
         qa_pairs = []
         for _, _, meta in search_results:
@@ -340,22 +766,160 @@ Instructions:
 - If context doesn't contain exact answer, say so and provide what's available
 
 Provide a comprehensive, professional answer according to the analysis."""
+        return prompt
+    
+    def _document_answer_lookup(
+        self,
+        query: str,
+        context_text: str,
+        prompt: str,
+        no_cache: bool
+    ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[np.ndarray]]:
+        """
+        Look up a document answer in the disk and semantic caches
+        
+        Returns:
+            (cached answer or None, disk cache key, semantic namespace,
+            query embedding); keys are None for caches not in use
+        """
+        # The prompt embeds the retrieved chunks, so re-asking a question over
+        # unchanged documents is answered from disk
+        key = None
+        if settings.DOCUMENT_ANSWER_CACHE_ENABLED and not no_cache:
+            key = self._prompt_key(prompt)
+            cached = self._document_answer_cache.get(key)
+            if cached is not None:
+                return cached, key, None, None
+        
+        namespace, vector = self._semantic_key(query, no_cache, "document", context_text)
+        if vector is not None:
+            cached = self._semantic_cache.get(namespace, vector)
+            if cached is not None:
+                return cached, key, namespace, vector
+        
+        return None, key, namespace, vector
+    
+    def _remember_document_answer(
+        self,
+        answer: str,
+        key: Optional[str],
+        namespace: Optional[str],
+        vector: Optional[np.ndarray]
+    ) -> None:
+        """Store a generated document answer in the caches in use"""
+        if key is not None:
+            self._document_answer_cache.set(key, answer)
+        if vector is not None:
+            self._semantic_cache.set(namespace, vector, answer)
+    
+    def answer_document_query(
+        self,
+        query: str,
+        context_text: str,
+        search_results: List[tuple],
+        no_cache: bool = False
+    ) -> str:
+        """
+        Answer query using retrieved analysis context
+        
+        Args:
+            query: User's question
+            context_text: Retrieved context from analysis
+            search_results: List of (chunk, similarity, metadata) tuples
+            no_cache: Skip the answer caches
+            
+        Returns:
+            Natural language answer
+        """
+        prompt = self._document_prompt(query, context_text, search_results)
+        cached, key, namespace, vector = self._document_answer_lookup(
+            query, context_text, prompt, no_cache
+        )
+        if cached is not None:
+            return cached
 
-        response = self.generative_model.generate_content(
+        response = self._generate_content(
             prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=1500
-            )
+            generation_config=_generation_config(0.3, 1500)
         )
         
-        return response.text.strip()
+        answer = response.text.strip()
+        self._remember_document_answer(answer, key, namespace, vector)
+        return answer
+    
+    def answer_document_query_stream(
+        self,
+        query: str,
+        context_text: str,
+        search_results: List[tuple],
+        no_cache: bool = False
+    ) -> Iterator[str]:
+        """
+        Stream the answer to a document query as the model generates it
+        
+        Args:
+            query: User's question
+            context_text: Retrieved context from analysis
+            search_results: List of (chunk, similarity, metadata) tuples
+            no_cache: Skip the answer caches
+            
+        Yields:
+            Answer text fragments
+        """
+        prompt = self._document_prompt(query, context_text, search_results)
+        cached, key, namespace, vector = self._document_answer_lookup(
+            query, context_text, prompt, no_cache
+        )
+        if cached is not None:
+            yield cached
+            return
+        
+        response = self._generate_content(
+            prompt,
+            generation_config=_generation_config(0.3, 1500),
+            stream=True
+        )
+        
+        parts = []
+        for chunk in response:
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+        
+        # Only a fully consumed stream is cached
+        self._remember_document_answer("".join(parts).strip(), key, namespace, vector)
+    
+    def _narrative_prompt(
+        self, 
+        intent: str, 
+        parameters: Dict[str, Any],
+        result_table: ResultTable,
+        numbers: Dict[str, Any]
+    ) -> str:
+        """Build the narrative prompt shared by the blocking and streaming paths"""
+        return f"""Generate a clear, concise narrative explanation of these analysis results.
+
+Intent: {intent}
+Parameters: {parameters}
+
+Computed numbers: {numbers}
+
+Result preview (first 5 rows): {table_rows(result_table, 5)}
+
+Write a narrative that:
+1. Explains what analysis was performed
+2. Highlights key findings from the numbers
+3. References specific values from the computed numbers
+4. Is 2-4 sentences long
+5. Is professional and clear
+
+Generate only the narrative text, no preamble."""
     
     def generate_narrative(
         self, 
         intent: str, 
         parameters: Dict[str, Any],
-        result_table: List[Dict[str, Any]],
+        result_table: ResultTable,
         numbers: Dict[str, Any]
     ) -> str:
         """
@@ -370,40 +934,196 @@ Provide a comprehensive, professional answer according to the analysis."""
         Returns:
             Natural language narrative
         """
-        prompt = f"""Generate a clear, concise narrative explanation of these analysis results.
+        prompt = self._narrative_prompt(intent, parameters, result_table, numbers)
+        key = self._prompt_key(prompt) if settings.NARRATIVE_CACHE_ENABLED else None
+        if key is not None:
+            cached = self._narrative_cache.get(key)
+            if cached is not None:
+                return cached
 
+        response = self._generate_content(
+            prompt,
+            generation_config=_generation_config(settings.NARRATIVE_TEMPERATURE, 500)
+        )
+        
+        narrative = response.text.strip()
+        if key is not None:
+            self._narrative_cache.set(key, narrative)
+        return narrative
+    
+    def stream_narrative(
+        self, 
+        intent: str, 
+        parameters: Dict[str, Any],
+        result_table: ResultTable,
+        numbers: Dict[str, Any]
+    ) -> Iterator[str]:
+        """
+        Stream the narrative as the model generates it
+        
+        Args:
+            intent: The action intent
+            parameters: Action parameters
+            result_table: Raw result data
+            numbers: Computed numbers
+            
+        Yields:
+            Narrative text fragments
+        """
+        prompt = self._narrative_prompt(intent, parameters, result_table, numbers)
+        key = self._prompt_key(prompt) if settings.NARRATIVE_CACHE_ENABLED else None
+        if key is not None:
+            cached = self._narrative_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        response = self._generate_content(
+            prompt,
+            generation_config=_generation_config(settings.NARRATIVE_TEMPERATURE, 500),
+            stream=True
+        )
+        
+        parts = []
+        for chunk in response:
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+        
+        # Only a fully consumed stream is cached
+        if key is not None:
+            self._narrative_cache.set(key, "".join(parts).strip())
+    
+    async def astream_narrative(
+        self, 
+        intent: str, 
+        parameters: Dict[str, Any],
+        result_table: ResultTable,
+        numbers: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """
+        Async variant of stream_narrative
+        
+        Args:
+            intent: The action intent
+            parameters: Action parameters
+            result_table: Raw result data
+            numbers: Computed numbers
+            
+        Yields:
+            Narrative text fragments
+        """
+        prompt = self._narrative_prompt(intent, parameters, result_table, numbers)
+        key = self._prompt_key(prompt) if settings.NARRATIVE_CACHE_ENABLED else None
+        if key is not None:
+            cached = self._narrative_cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        response = await self._agenerate_content(
+            prompt,
+            generation_config=_generation_config(settings.NARRATIVE_TEMPERATURE, 500),
+            stream=True
+        )
+        
+        parts = []
+        async for chunk in response:
+            if chunk.text:
+                parts.append(chunk.text)
+                yield chunk.text
+        
+        # Only a fully consumed stream is cached
+        if key is not None:
+            self._narrative_cache.set(key, "".join(parts).strip())
+    
+    def _narrative_batch_prompt(
+        self,
+        analyses: List[Tuple[str, Dict[str, Any], ResultTable, Dict[str, Any]]]
+    ) -> str:
+        """Build one narrative prompt covering several analysis results"""
+        sections = "\n\n".join(
+            f"""### Result {i}
 Intent: {intent}
 Parameters: {parameters}
-
 Computed numbers: {numbers}
+Result preview (first 5 rows): {table_rows(result_table, 5)}"""
+            for i, (intent, parameters, result_table, numbers) in enumerate(analyses, 1)
+        )
+        
+        return f"""Generate a clear, concise narrative explanation for each of these {len(analyses)} analysis results.
 
-Result preview (first 5 rows): {result_table[:5]}
-
-Write a narrative that:
-1. Explains what analysis was performed
-2. Highlights key findings from the numbers
-3. References specific values from the computed numbers
-4. Is 2-4 sentences long
-5. Is professional and clear
+{sections}
 
-Generate only the narrative text, no preamble."""
+Each narrative should:
+1. Explain what analysis was performed
+2. Highlight key findings from the numbers
+3. Reference specific values from the computed numbers
+4. Be 2-4 sentences long
+5. Be professional and clear
 
-        response = self.generative_model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=500
+Return ONLY a JSON array of {len(analyses)} strings, one narrative per result in the same order, no preamble."""
+    
+    def _parse_narrative_batch_response(self, text: str, num_analyses: int) -> List[str]:
+        """Decode and validate the JSON array returned for batched narratives"""
+        narratives = self._parse_json_response(text)
+        if not isinstance(narratives, list) or len(narratives) != num_analyses:
+            raise ValueError(
+                f"Expected a JSON array of {num_analyses} narratives, got: {text[:200]}"
             )
+        return [str(narrative).strip() for narrative in narratives]
+    
+    async def agenerate_narratives_batch(
+        self,
+        analyses: List[Tuple[str, Dict[str, Any], ResultTable, Dict[str, Any]]]
+    ) -> List[str]:
+        """
+        Generate narratives for several results with a single model call
+        
+        Args:
+            analyses: (intent, parameters, result_table, numbers) per result
+            
+        Returns:
+            Narratives, in the same order as analyses
+        """
+        # Keyed like the single-result prompt, so both paths share entries
+        keys = [
+            self._prompt_key(self._narrative_prompt(*analysis))
+            if settings.NARRATIVE_CACHE_ENABLED else None
+            for analysis in analyses
+        ]
+        narratives = [
+            self._narrative_cache.get(key) if key is not None else None
+            for key in keys
+        ]
+        
+        # Only results without a cached narrative go to the model
+        missing = [i for i, narrative in enumerate(narratives) if narrative is None]
+        if not missing:
+            return narratives
+        
+        prompt = self._narrative_batch_prompt([analyses[i] for i in missing])
+        
+        response = await self._agenerate_content(
+            prompt,
+            generation_config=_generation_config(settings.NARRATIVE_TEMPERATURE, 500 * len(missing))
         )
         
-        return response.text.strip()
+        generated = self._parse_narrative_batch_response(response.text, len(missing))
+        for i, narrative in zip(missing, generated):
+            narratives[i] = narrative
+            if keys[i] is not None:
+                self._narrative_cache.set(keys[i], narrative)
+        
+        return narratives
     
-    def enhance_prompt(self, user_query: str) -> str:
+    def enhance_prompt(self, user_query: str, no_cache: bool = False) -> str:
         """
         Enhance user prompt for better clarity
         
         Args:
             user_query: Original user query
+            no_cache: Skip the response caches
             
         Returns:
             Enhanced query
@@ -414,16 +1134,164 @@ Generate only the narrative text, no preamble."""
 
 Return only the rephrased query, no explanation."""
 
-        response = self.generative_model.generate_content(
+        key = self._response_key(prompt, no_cache)
+        if key is not None:
+            cached = self._response_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        namespace, vector = self._semantic_key(user_query, no_cache, "enhance")
+        if vector is not None:
+            cached = self._semantic_cache.get(namespace, vector)
+            if cached is not None:
+                return cached
+
+        response = self._generate_content(
             prompt,
-            generation_config=genai.GenerationConfig(
-                temperature=0.3,
-                max_output_tokens=200
-            )
+            generation_config=_generation_config(0.3, 200)
         )
         
-        return response.text.strip()
+        enhanced = response.text.strip()
+        if key is not None:
+            self._response_cache.set(key, enhanced)
+        if vector is not None:
+            self._semantic_cache.set(namespace, vector, enhanced)
+        return enhanced
 
 
 # Global client instance
-gemini_client = GeminiClient()
\ No newline at end of file
+gemini_client = GeminiClient()
+
+# Query embeddings survive restarts; identical queries always embed the same
+_query_embedding_store = DiskCache(
+    settings.CACHE_DIR / "query_embeddings.sqlite",
+    settings.DISK_CACHE_MAX_ENTRIES,
+    settings.DISK_CACHE_TTL_SECONDS
+)
+
+# Concurrent cache misses (e.g. process_queries) share one embedding request
+_query_batcher = EmbeddingBatcher(
+    gemini_client.generate_query_embeddings_batch,
+    max_batch_size=settings.QUERY_EMBED_BATCH_SIZE,
+    max_wait_ms=settings.QUERY_EMBED_BATCH_WAIT_MS
+)
+
+
+@functools.lru_cache(maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE)
+def _embed(query: str) -> np.ndarray:
+    """Embed a query at most once per process (and once per cache directory)"""
+    # The storage format is part of the key, so toggling it never misreads a blob
+    int8 = settings.EMBEDDING_CACHE_INT8
+    namespace = settings.get_embedding_namespace() + ("\0int8" if int8 else "")
+    key = hashlib.sha256(f"{namespace}\0{query}".encode()).hexdigest()
+    
+    blob = _query_embedding_store.get(key)
+    if blob is not None:
+        vector = unpack_int8(blob) if int8 else np.frombuffer(blob, dtype=np.float32).copy()
+    else:
+        if settings.QUERY_EMBED_BATCH_WAIT_MS > 0:
+            vector = _query_batcher.embed(query).copy()
+        else:
+            vector = gemini_client.generate_query_embedding(query)
+        _query_embedding_store.set(key, pack_int8(vector) if int8 else vector.tobytes())
+    
+    # Entries are shared between callers, so hand out read-only arrays
+    vector.setflags(write=False)
+    return vector
+
+
+def embed_query(query: str) -> np.ndarray:
+    """
+    Cached equivalent of gemini_client.generate_query_embedding
+    
+    Args:
+        query: Query text
+        
+    Returns:
+        Read-only float32 query embedding
+    """
+    return _embed(query)
+
+def embed_documents(
+    texts: List[str],
+    batch_size: int = 100,
+    max_hamming: Optional[int] = None
+) -> np.ndarray:
+    """
+    Cached equivalent of gemini_client.generate_embeddings_batch
+    
+    Duplicate texts are embedded once and share a vector, and only texts
+    missing from the embedding cache are sent to the API.
+    
+    Args:
+        texts: List of input texts
+        batch_size: Texts per batchEmbedContents request
+        max_hamming: If set, texts whose SimHash fingerprints differ in at most
+            this many bits also share the vector of the longest one, and texts
+            missing from the cache reuse the vector of a cached near-duplicate
+        
+    Returns:
+        Matrix of embeddings (n_texts x embedding_dim)
+    """
+    if not texts:
+        return np.empty((0, settings.VECTOR_DIMENSION), dtype=np.float32)
+    
+    # Collapse repeated texts (headers, footers, boilerplate) and remember
+    # where each input lands in the unique list
+    first_index: Dict[str, int] = {}
+    remap = np.fromiter(
+        (first_index.setdefault(text, len(first_index)) for text in texts),
+        dtype=np.intp,
+        count=len(texts)
+    )
+    unique_texts = list(first_index)
+    
+    if max_hamming is not None and len(unique_texts) > 1:
+        representative = cluster_near_duplicates(unique_texts, max_hamming)
+        needed, remap = np.unique(representative[remap], return_inverse=True)
+        unique_texts = [unique_texts[i] for i in needed]
+    
+    keys = [embedding_cache.key(text) for text in unique_texts]
+    cached = embedding_cache.get_many(keys)
+    
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    num_near = 0
+    
+    fingerprints: Dict[int, int] = {}
+    if missing and max_hamming is not None:
+        # Lightly edited texts (typos, whitespace) reuse an earlier version's vector
+        fingerprints = {i: simhash(unique_texts[i]) for i in missing}
+        near = embedding_cache.find_near_duplicates(list(fingerprints.values()), max_hamming)
+        reused = embedding_cache.get_many([h for h in near if h is not None])
+        still_missing = []
+        for i, h in zip(missing, near):
+            if h in reused:
+                cached[keys[i]] = reused[h]
+            else:
+                still_missing.append(i)
+        num_near = len(missing) - len(still_missing)
+        missing = still_missing
+    
+    if missing:
+        vectors = gemini_client.generate_embeddings_batch(
+            [unique_texts[i] for i in missing], batch_size
+        )
+        new_pairs = [(keys[i], vector) for i, vector in zip(missing, vectors)]
+        embedding_cache.put_many(new_pairs)
+        cached.update(new_pairs)
+        if fingerprints:
+            embedding_cache.put_fingerprints((keys[i], fingerprints[i]) for i in missing)
+    
+    logger.debug(
+        f"Embedded {len(texts)} texts: {len(texts) - len(unique_texts)} duplicates, "
+        f"{len(unique_texts) - len(missing) - num_near} cache hits, "
+        f"{num_near} near-duplicate hits, {len(missing)} sent to the API"
+    )
+    unique_vectors = np.empty((len(keys), len(cached[keys[0]])), dtype=np.float32)
+    for i, key in enumerate(keys):
+        unique_vectors[i] = cached[key]
+    
+    # Without duplicates remap is the identity, so skip the gather copy
+    if len(keys) == len(texts):
+        return unique_vectors
+    return unique_vectors[remap]
@@ -0,0 +1,135 @@
+"""
+Rule-based fast path for unambiguous analytical queries
+
+Short, formulaic requests ("top 5 by price", "sort by date desc",
+"rows where score > 80", "average of salary") are parsed with precompiled
+patterns instead of an LLM round-trip. Anything else, or any query naming a
+column that is not a numeric column of exactly one loaded CSV, returns None
+and goes to the model.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_NUMBER = r"(?P<value>[-+]?(?:\d+\.?\d*|\.\d+))"
+_PREFIX = r"(?:(?:show|get|find|list|give me|display)\s+)?(?:me\s+)?(?:the\s+)?"
+
+_TOP_N_RE = re.compile(
+    _PREFIX
+    + r"(?P<direction>top|highest|largest|bottom|lowest|smallest)\s+(?P<n>\d+)\s+"
+    r"(?:rows\s+|records\s+|values\s+)?(?:by|of|in|for)\s+(?P<column>.+?)",
+    re.IGNORECASE
+)
+_SORT_RE = re.compile(
+    r"(?:sort|order|arrange)\s+(?:the\s+)?(?:data\s+|rows\s+|records\s+)?by\s+(?P<column>.+?)"
+    r"(?:\s+(?P<direction>asc|ascending|desc|descending))?",
+    re.IGNORECASE
+)
+_FILTER_RE = re.compile(
+    _PREFIX
+    + r"(?:(?:filter\s+)?(?:rows|records)\s+|filter\s+)?(?:where|with)\s+(?P<column>.+?)\s*"
+    r"(?P<operator>>=|<=|==|!=|>|<|=)\s*" + _NUMBER,
+    re.IGNORECASE
+)
+_AVERAGE_RE = re.compile(
+    r"(?:(?:what\s+is|what's|show|get|compute|calculate)\s+)?(?:the\s+)?(?:average|mean)\s+"
+    r"(?:of\s+)?(?P<column>.+?)",
+    re.IGNORECASE
+)
+
+_TRAILING_PUNCTUATION = " \t\n?.!"
+
+
+def _resolve_column(
+    name: str,
+    csv_metadata: List[Dict[str, Any]]
+) -> Optional[Tuple[str, str]]:
+    """
+    Find the one loaded CSV with a numeric column of this name
+
+    Args:
+        name: Column name as written in the query
+        csv_metadata: Metadata about available CSV files
+
+    Returns:
+        (file_id, column) or None when no file or several files match
+    """
+    wanted = name.strip().strip("'\"`").lower()
+    matches = [
+        (meta['file_id'], column)
+        for meta in csv_metadata
+        for column in meta.get('numeric_columns', ())
+        if column.lower() == wanted
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _top_n(match: re.Match, file_id: str, column: str) -> Optional[Dict[str, Any]]:
+    """top_n intent from a _TOP_N_RE match"""
+    n = int(match.group('n'))
+    if n <= 0:
+        return None
+    ascending = match.group('direction').lower() in ('bottom', 'lowest', 'smallest')
+    return {"intent": "top_n", "parameters": {"column": column, "n": n, "ascending": ascending, "file_id": file_id}}
+
+
+def _sort(match: re.Match, file_id: str, column: str) -> Dict[str, Any]:
+    """sort intent from a _SORT_RE match"""
+    direction = (match.group('direction') or 'asc').lower()
+    ascending = direction in ('asc', 'ascending')
+    return {"intent": "sort", "parameters": {"column": column, "ascending": ascending, "file_id": file_id, "limit": None}}
+
+
+def _filter(match: re.Match, file_id: str, column: str) -> Dict[str, Any]:
+    """filter_threshold intent from a _FILTER_RE match"""
+    operator = match.group('operator')
+    return {
+        "intent": "filter_threshold",
+        "parameters": {
+            "column": column,
+            "operator": '==' if operator == '=' else operator,
+            "value": float(match.group('value')),
+            "file_id": file_id
+        }
+    }
+
+
+def _average(match: re.Match, file_id: str, column: str) -> Dict[str, Any]:
+    """Single-file compare_averages intent from an _AVERAGE_RE match"""
+    return {
+        "intent": "compare_averages",
+        "parameters": {"column": column, "file1_id": file_id, "file2_id": None, "group_by": None}
+    }
+
+
+_RULES: List[Tuple[re.Pattern, Callable[[re.Match, str, str], Optional[Dict[str, Any]]]]] = [
+    (_TOP_N_RE, _top_n),
+    (_SORT_RE, _sort),
+    (_FILTER_RE, _filter),
+    (_AVERAGE_RE, _average),
+]
+
+
+def rule_parse(query: str, csv_metadata: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Parse a query without the LLM when it matches a known pattern exactly
+
+    Args:
+        query: Natural language query
+        csv_metadata: Metadata about available CSV files
+
+    Returns:
+        Intent dict in the parse_intent format, or None to defer to the LLM
+    """
+    if not csv_metadata:
+        return None
+
+    text = query.strip().rstrip(_TRAILING_PUNCTUATION)
+    for pattern, build in _RULES:
+        match = pattern.fullmatch(text)
+        if match is None:
+            continue
+        resolved = _resolve_column(match.group('column'), csv_metadata)
+        if resolved is None:
+            return None
+        return build(match, *resolved)
+    return None
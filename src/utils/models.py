@@ -1,26 +1,28 @@
 """
 Pydantic models for request/response validation
 """
-from typing import Any, Dict, List, Optional, Union
-from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List, Literal, Optional, Union
+from pydantic import BaseModel, ConfigDict, Field
+
+from config.settings import settings
+
+# Checked by pydantic-core itself instead of Python validator functions
+IntentName = Literal[tuple(settings.SUPPORTED_INTENTS)]
+ThresholdOperator = Literal['>', '<', '>=', '<=', '==', '!=']
 
 
 class ActionIntent(BaseModel):
     """Parsed action intent from LLM"""
-    intent: str = Field(..., description="The action intent type")
-    parameters: Dict[str, Any] = Field(default_factory=dict, description="Action parameters")
+    model_config = ConfigDict(frozen=True)
     
-    @field_validator('intent')
-    @classmethod
-    def validate_intent(cls, v):
-        from config.settings import settings
-        if v not in settings.SUPPORTED_INTENTS:
-            raise ValueError(f"Unsupported intent: {v}")
-        return v
+    intent: IntentName = Field(..., description="The action intent type")
+    parameters: Dict[str, Any] = Field(default_factory=dict, description="Action parameters")
 
 
 class CompareAveragesParams(BaseModel):
     """Parameters for compare_averages intent"""
+    model_config = ConfigDict(frozen=True)
+    
     column: str
     file1_id: Optional[str] = None
     file2_id: Optional[str] = None
@@ -29,21 +31,18 @@ class CompareAveragesParams(BaseModel):
 
 class FilterThresholdParams(BaseModel):
     """Parameters for filter_threshold intent"""
+    model_config = ConfigDict(frozen=True)
+    
     column: str
-    operator: str = Field(..., description="Operator: >, <, >=, <=, ==")
+    operator: ThresholdOperator = Field(..., description="Operator: >, <, >=, <=, ==, !=")
     value: float
     file_id: Optional[str] = None
-    
-    @field_validator('operator')
-    @classmethod
-    def validate_operator(cls, v):
-        if v not in ['>', '<', '>=', '<=', '==', '!=']:
-            raise ValueError(f"Invalid operator: {v}")
-        return v
 
 
 class SortParams(BaseModel):
     """Parameters for sort intent"""
+    model_config = ConfigDict(frozen=True)
+    
     column: str
     ascending: bool = True
     file_id: Optional[str] = None
@@ -52,6 +51,8 @@ class SortParams(BaseModel):
 
 class TopNParams(BaseModel):
     """Parameters for top_n intent"""
+    model_config = ConfigDict(frozen=True)
+    
     column: str
     n: int = Field(..., gt=0, description="Number of top items")
     ascending: bool = False  # False = highest values first
@@ -60,6 +61,8 @@ class TopNParams(BaseModel):
 
 class CompareTopParams(BaseModel):
     """Parameters for compare_top intent"""
+    model_config = ConfigDict(frozen=True)
+    
     column: str
     n: int = Field(..., gt=0)
     file1_id: Optional[str] = None
@@ -68,13 +71,18 @@ class CompareTopParams(BaseModel):
 
 class ExplainRowParams(BaseModel):
     """Parameters for explain_row intent"""
+    model_config = ConfigDict(frozen=True)
+    
     query: str = Field(..., description="Semantic query to find row")
     file_id: Optional[str] = None
     top_k: int = Field(default=1, ge=1, le=10)
+    ef_search: Optional[int] = Field(default=None, ge=1, description="HNSW recall/latency knob")
 
 
 class DocumentQueryParams(BaseModel):
     """Parameters for document_query intent"""
+    model_config = ConfigDict(frozen=True)
+    
     query: str = Field(..., description="Question about document content")
     file_id: Optional[str] = None
     top_k: int = Field(default=3, ge=1, le=10)
@@ -82,7 +90,10 @@ class DocumentQueryParams(BaseModel):
 
 class AnalysisResult(BaseModel):
     """Result from pandas analysis"""
-    result_table: List[Dict[str, Any]] = Field(default_factory=list, description="Raw data rows")
+    result_table: Union[List[Dict[str, Any]], Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Raw data rows, or a columnar {'columns': [...], 'data': {column: values}} table"
+    )
     numbers: Dict[str, Any] = Field(default_factory=dict, description="Computed numbers (can include lists)")
     narrative: str = Field(default="", description="Human-readable explanation")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
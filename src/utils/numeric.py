@@ -0,0 +1,334 @@
+"""
+Vectorized numeric helpers for search results and pandas analyses
+"""
+from typing import Any, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+from config.settings import settings
+
+
+def distances_to_similarities(distances: np.ndarray) -> np.ndarray:
+    """
+    Convert vector store distances to similarity scores in one array pass
+
+    Stored and query vectors are unit-normalized, so the squared L2 distance
+    d returned by the index equals 2 - 2*cos and cosine similarity is 1 - d/2.
+
+    Args:
+        distances: Squared L2 distances returned by the vector store
+
+    Returns:
+        float32 array of cosine similarities in [-1, 1]
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    return np.subtract(1.0, distances * np.float32(0.5), dtype=np.float32)
+
+
+def result_distances(results: Iterable[Tuple[Any, float]], count: int) -> np.ndarray:
+    """
+    Collect the distances of (metadata, distance) search results
+
+    Args:
+        results: Search results from VectorStore.search
+        count: Number of results
+
+    Returns:
+        float32 array of distances
+    """
+    return np.fromiter((d for _, d in results), dtype=np.float32, count=count)
+
+
+def summary_stats(values: np.ndarray) -> Tuple[float, float, float, float]:
+    """
+    Mean, sample standard deviation, min and max of a numeric column
+
+    Matches pandas' mean/std/min/max (NaN skipped, ddof=1). Uses bottleneck
+    when installed; otherwise the column is read once to drop NaNs and the
+    compacted buffer is reused for every statistic.
+
+    Args:
+        values: Numeric column values
+
+    Returns:
+        (mean, std, min, max); NaN where undefined
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return (np.nan,) * 4
+
+    if bn is not None:
+        # Bottleneck's single-pass NaN-skipping C loops; NaN where undefined
+        return (
+            float(bn.nanmean(values)),
+            float(bn.nanstd(values, ddof=1)),
+            float(bn.nanmin(values)),
+            float(bn.nanmax(values))
+        )
+
+    if np.isnan(values.min()):
+        values = values[~np.isnan(values)]
+
+    n = values.size
+    if n == 0:
+        return (np.nan,) * 4
+
+    mean = np.add.reduce(values) / n
+    centered = values - mean
+    std = float(np.sqrt(np.dot(centered, centered) / (n - 1))) if n > 1 else np.nan
+    return float(mean), std, float(values.min()), float(values.max())
+
+
+def nan_mean(values: np.ndarray) -> float:
+    """
+    Mean ignoring NaN (NaN if nothing is left), like pandas Series.mean
+
+    Args:
+        values: Numeric values
+
+    Returns:
+        Mean as a float
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if bn is not None:
+        return float(bn.nanmean(values))
+    valid = ~np.isnan(values)
+    count = np.count_nonzero(valid)
+    return float(np.add.reduce(values, where=valid) / count) if count else np.nan
+
+
+def group_means(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-group means via hash factorization and np.bincount
+
+    Keys are mapped to dense codes in one hashing pass, then sums and counts
+    are two scatter-adds, so no sort of the rows is needed.
+
+    Args:
+        keys: Group keys without missing values
+        values: Numeric values aligned with keys
+
+    Returns:
+        (sorted unique keys, float64 means; NaN for groups with no values)
+    """
+    if keys.size == 0:
+        return keys, np.empty(0, dtype=np.float64)
+
+    # Raises TypeError for keys that cannot be ordered against each other
+    codes, uniques = pd.factorize(keys, sort=True)
+    num_groups = len(uniques)
+
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    sums = np.bincount(codes, weights=np.where(valid, values, 0.0), minlength=num_groups)
+    counts = np.bincount(codes[valid], minlength=num_groups)
+    with np.errstate(invalid='ignore'):
+        means = sums / counts
+    return np.asarray(uniques), means
+
+
+def top_positions(
+    values: np.ndarray,
+    n: int,
+    ascending: bool = False,
+    keep_nan: bool = False
+) -> np.ndarray:
+    """
+    Positions of the n largest (or smallest) values, best first
+
+    Uses a partial selection (O(N)) and only sorts the n winners. Ties keep
+    their original order, so the result equals a stable sort followed by
+    head(n) / nlargest(n, keep='first').
+
+    Args:
+        values: Numeric values
+        n: Number of positions to return
+        ascending: Select the smallest values instead of the largest
+        keep_nan: Pad with NaN positions (sorted last) when fewer than n
+            values are present, as sort_values().head(n) does
+
+    Returns:
+        int array of positions into values
+    """
+    values = np.asarray(values)
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    if values.dtype.kind == 'b':
+        values = values.view(np.int8)
+
+    present = None
+    if values.dtype.kind == 'f':
+        nan = np.isnan(values)
+        if nan.any():
+            present = np.flatnonzero(~nan)
+            values = values[present]
+
+    m = values.size
+    k = min(n, m)
+    if k < m:
+        # Everything strictly better than the k-th value, then the earliest ties
+        kth = np.partition(values, k - 1)[k - 1] if ascending else np.partition(values, m - k)[m - k]
+        chosen = np.flatnonzero(values < kth if ascending else values > kth)
+        ties = np.flatnonzero(values == kth)[:k - chosen.size]
+        chosen = np.sort(np.concatenate([chosen, ties]))
+    else:
+        chosen = np.arange(m)
+
+    selected = values[chosen]
+    if ascending:
+        order = np.argsort(selected, kind='stable')
+    else:
+        # Stable descending: sort the reversed array, then map back and flip
+        order = (selected.size - 1 - np.argsort(selected[::-1], kind='stable'))[::-1]
+    positions = chosen[order]
+
+    if present is not None:
+        positions = present[positions]
+        if keep_nan and positions.size < n:
+            positions = np.concatenate([positions, np.flatnonzero(nan)[:n - positions.size]])
+    return positions
+
+
+# Threshold operators accepted by filter_threshold, as NumPy ufuncs
+COMPARATORS = {
+    '>': np.greater,
+    '<': np.less,
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+# Column dtypes numexpr compares natively
+NUMEXPR_DTYPES = {np.dtype(np.int32), np.dtype(np.int64), np.dtype(np.float32), np.dtype(np.float64)}
+
+
+def threshold_mask(values: np.ndarray, operator: str, threshold: float) -> np.ndarray:
+    """
+    Evaluate `values OP threshold` in a single vectorized pass
+
+    Large int/float columns are compared with numexpr when it is installed,
+    which splits the work across threads.
+
+    Args:
+        values: Numeric column values
+        operator: One of the COMPARATORS keys
+        threshold: Value to compare against
+
+    Returns:
+        Boolean mask (NaN never matches, except for '!=')
+    """
+    try:
+        comparator = COMPARATORS[operator]
+    except KeyError:
+        raise ValueError(f"Invalid operator: {operator}") from None
+
+    if (
+        ne is not None
+        and isinstance(values, np.ndarray)
+        and values.dtype in NUMEXPR_DTYPES
+        and values.size >= settings.NUMEXPR_MIN_ROWS
+    ):
+        return ne.evaluate(
+            f"values {operator} threshold",
+            local_dict={"values": values, "threshold": float(threshold)}
+        )
+    return comparator(values, threshold)
+
+
+def sorted_threshold_range(
+    values: np.ndarray,
+    operator: str,
+    threshold: float
+) -> Optional[Tuple[int, int]]:
+    """
+    Rows matching `values OP threshold` on an ascending column, by binary search
+
+    Args:
+        values: NaN-free numeric values sorted in ascending order
+        operator: One of the COMPARATORS keys
+        threshold: Value to compare against
+
+    Returns:
+        (start, stop) slice of matching positions, or None for '!=' (which
+        does not select a contiguous range)
+    """
+    if operator not in COMPARATORS:
+        raise ValueError(f"Invalid operator: {operator}")
+    if operator == '!=':
+        return None
+    if threshold != threshold:
+        return 0, 0  # NaN threshold never matches
+
+    n = len(values)
+    if operator == '>':
+        return int(np.searchsorted(values, threshold, side='right')), n
+    if operator == '>=':
+        return int(np.searchsorted(values, threshold, side='left')), n
+    if operator == '<':
+        return 0, int(np.searchsorted(values, threshold, side='left'))
+    if operator == '<=':
+        return 0, int(np.searchsorted(values, threshold, side='right'))
+    return (
+        int(np.searchsorted(values, threshold, side='left')),
+        int(np.searchsorted(values, threshold, side='right'))
+    )
+
+
+def prune_threshold(
+    low: float,
+    high: float,
+    has_nan: bool,
+    operator: str,
+    threshold: float
+) -> Optional[bool]:
+    """
+    Decide `values OP threshold` from a column's min/max alone, when possible
+
+    Args:
+        low: Minimum of the non-NaN values
+        high: Maximum of the non-NaN values
+        has_nan: Whether the column contains NaN
+        operator: One of the COMPARATORS keys
+        threshold: Value to compare against
+
+    Returns:
+        True if every row matches, False if no row matches, None if the
+        column has to be scanned
+    """
+    if operator not in COMPARATORS:
+        raise ValueError(f"Invalid operator: {operator}")
+    if threshold != threshold:
+        return operator == '!='  # NaN compares unequal to everything
+
+    if operator == '!=':
+        if threshold < low or threshold > high:
+            return True  # NaN rows match '!=' as well
+        return False if low == high and not has_nan else None
+
+    if operator == '>':
+        none, every = threshold >= high, threshold < low
+    elif operator == '>=':
+        none, every = threshold > high, threshold <= low
+    elif operator == '<':
+        none, every = threshold <= low, threshold > high
+    elif operator == '<=':
+        none, every = threshold < low, threshold >= high
+    else:
+        none, every = threshold < low or threshold > high, low == high == threshold
+
+    if none:
+        return False
+    # NaN rows never satisfy an ordered or '==' comparison
+    return True if every and not has_nan else None
@@ -0,0 +1,69 @@
+"""
+Symmetric int8 quantization for embeddings kept on disk
+
+Each vector is stored as int8 codes plus one float32 scale (max|v| / 127),
+a quarter of the fp32 size. For cosine search the per-component rounding
+error is well below what the sq8 FAISS index already introduces.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def quantize_int8(vector: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Quantize one vector to int8 with a per-vector scale
+
+    Args:
+        vector: float vector
+
+    Returns:
+        Tuple of (int8 codes, scale)
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    peak = float(np.abs(vector).max()) if vector.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    codes = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def dequantize_int8(codes: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Restore a float32 vector from int8 codes
+
+    Args:
+        codes: int8 codes from quantize_int8
+        scale: Scale from quantize_int8
+
+    Returns:
+        float32 vector
+    """
+    return codes.astype(np.float32) * np.float32(scale)
+
+
+def pack_int8(vector: np.ndarray) -> bytes:
+    """
+    Serialize a vector as a float32 scale followed by its int8 codes
+
+    Args:
+        vector: float vector
+
+    Returns:
+        4 + len(vector) bytes
+    """
+    codes, scale = quantize_int8(vector)
+    return np.float32(scale).tobytes() + codes.tobytes()
+
+
+def unpack_int8(blob: bytes) -> np.ndarray:
+    """
+    Deserialize a blob written by pack_int8
+
+    Args:
+        blob: Packed scale and codes
+
+    Returns:
+        float32 vector
+    """
+    scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+    return dequantize_int8(np.frombuffer(blob, dtype=np.int8, offset=4), scale)
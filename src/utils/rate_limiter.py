@@ -0,0 +1,52 @@
+"""
+Token-bucket rate limiting for Gemini generation requests
+"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket that only waits for the part of the budget not yet refilled
+
+    Tokens refill continuously at requests_per_minute / 60 per second up to
+    burst. Each request reserves one token; when the bucket is empty the
+    caller sleeps just until its token has refilled, so time spent waiting
+    on the previous response already counts toward the interval.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """
+        Initialize limiter (starts full)
+
+        Args:
+            requests_per_minute: Sustained request rate
+            burst: Requests allowed back to back before throttling starts
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token, returning how long to wait until it is available"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait without blocking the event loop until a request may be sent"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,228 @@
+"""
+Embedding-keyed cache for LLM responses to paraphrased queries
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+
+class _Namespace:
+    """Entries sharing one context: unit vectors, values and insertion times"""
+
+    def __init__(self, dimension: int, num_tables: int):
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.values: List[Any] = []
+        self.created: List[float] = []
+        # LSH bucket codes per entry (n x num_tables) and, per table,
+        # bucket code -> ids of its entries in insertion order
+        self.codes = np.empty((0, num_tables), dtype=np.int64)
+        self.buckets: List[Dict[int, Deque[int]]] = [{} for _ in range(num_tables)]
+        self.first_id = 0  # Entries are only dropped from the front
+        # Optional HNSW graph over the vectors; node i holds entry hnsw_base + i.
+        # Evicted entries stay in the graph and are filtered out at search time.
+        self.hnsw: Optional[faiss.IndexHNSWFlat] = None
+        self.hnsw_base = 0
+
+
+class SemanticCache:
+    """
+    Returns a stored response when a new query embeds close to an old one
+
+    Entries are grouped by namespace (e.g. a hash of the loaded files), so a
+    response is only reused for the context it was produced in. By default a
+    lookup scans all of the namespace's unit vectors; with lsh_tables > 0 only
+    entries sharing a random-hyperplane bucket with the query in at least one
+    table are compared, which trades some recall for lookups that do not grow
+    with the number of entries. With hnsw_m > 0 the nearest entry is found by
+    walking a FAISS HNSW graph instead (logarithmic in the number of entries).
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = 3600.0,
+        lsh_tables: int = 0,
+        lsh_bits: int = 8,
+        hnsw_m: int = 0,
+        hnsw_ef_search: int = 64
+    ):
+        """
+        Initialize cache
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Entries kept per namespace (oldest are dropped)
+            ttl_seconds: Entry lifetime (None keeps entries until evicted)
+            lsh_tables: Random-projection hash tables (0 scans every entry)
+            lsh_bits: Hyperplanes per table
+            hnsw_m: Graph neighbours per node of an HNSW lookup index (0 disables it)
+            hnsw_ef_search: HNSW search breadth
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lsh_tables = lsh_tables
+        self.lsh_bits = lsh_bits
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search
+        self._planes: Optional[np.ndarray] = None
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        """Unit-length float32 copy of vector"""
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _codes(self, vector: np.ndarray) -> np.ndarray:
+        """Bucket code of vector in every LSH table (caller holds the lock)"""
+        if self._planes is None or self._planes.shape[1] != vector.shape[0]:
+            rng = np.random.default_rng(0)
+            self._planes = rng.standard_normal(
+                (self.lsh_tables * self.lsh_bits, vector.shape[0])
+            ).astype(np.float32)
+        signs = (self._planes @ vector > 0).reshape(self.lsh_tables, self.lsh_bits)
+        return signs @ (1 << np.arange(self.lsh_bits, dtype=np.int64))
+
+    def _hnsw_add(self, entries: _Namespace, vector: np.ndarray) -> None:
+        """
+        Add the next entry's vector to the HNSW graph (caller holds the lock)
+
+        HNSW graphs do not support removal, so the graph is rebuilt from the
+        live vectors once evicted nodes outnumber them.
+        """
+        evicted = entries.first_id - entries.hnsw_base
+        if entries.hnsw is None or evicted > len(entries.values):
+            entries.hnsw = faiss.IndexHNSWFlat(
+                vector.shape[0], self.hnsw_m, faiss.METRIC_INNER_PRODUCT
+            )
+            entries.hnsw_base = entries.first_id
+            if entries.values:
+                entries.hnsw.add(entries.vectors)
+        entries.hnsw.add(vector[np.newaxis])
+
+    def _hnsw_search(self, entries: _Namespace, query: np.ndarray) -> Optional[int]:
+        """Position of the live entry most similar to query (caller holds the lock)"""
+        live = entries.first_id - entries.hnsw_base
+        params = faiss.SearchParametersHNSW(
+            sel=faiss.IDSelectorRange(live, entries.hnsw.ntotal),
+            efSearch=self.hnsw_ef_search
+        )
+        similarities, labels = entries.hnsw.search(query[np.newaxis], 1, params=params)
+        label = int(labels[0, 0])
+        if label < 0 or similarities[0, 0] < self.threshold:
+            return None
+        return label - live
+
+    def _drop_oldest(self, entries: _Namespace, count: int) -> None:
+        """Remove the count oldest entries (caller holds the lock)"""
+        for row in entries.codes[:count]:
+            for table, code in enumerate(row.tolist()):
+                bucket = entries.buckets[table][code]
+                bucket.popleft()
+                if not bucket:
+                    del entries.buckets[table][code]
+        entries.vectors = entries.vectors[count:]
+        entries.codes = entries.codes[count:]
+        del entries.values[:count]
+        del entries.created[:count]
+        entries.first_id += count
+
+    def _expire(self, entries: _Namespace) -> None:
+        """Drop entries older than the TTL (caller holds the lock)"""
+        if self.ttl_seconds is None or not entries.created:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        # Entries are appended in time order, so expired ones form a prefix
+        stale = int(np.searchsorted(np.asarray(entries.created), cutoff, side='right'))
+        if stale:
+            self._drop_oldest(entries, stale)
+
+    def get(self, namespace: str, vector: np.ndarray) -> Optional[Any]:
+        """
+        Look up the response of the most similar cached query
+
+        Args:
+            namespace: Context the response must belong to
+            vector: Embedding of the new query
+
+        Returns:
+            Cached value, or None if no entry reaches the threshold
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if entries is None:
+                return None
+            self._expire(entries)
+            if not entries.values:
+                return None
+
+            if entries.hnsw is not None:
+                best = self._hnsw_search(entries, query)
+                return None if best is None else entries.values[best]
+
+            if self.lsh_tables:
+                candidates = set()
+                for table, code in enumerate(self._codes(query).tolist()):
+                    candidates.update(entries.buckets[table].get(code, ()))
+                if not candidates:
+                    return None
+                positions = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+                positions -= entries.first_id
+                similarities = entries.vectors[positions] @ query
+            else:
+                # One matrix-vector product over the contiguous matrix, no gather copy
+                positions = None
+                similarities = entries.vectors @ query
+
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return entries.values[best if positions is None else positions[best]]
+
+    def set(self, namespace: str, vector: np.ndarray, value: Any) -> None:
+        """
+        Store a response for a query embedding
+
+        Args:
+            namespace: Context the response belongs to
+            vector: Embedding of the query
+            value: Response to reuse (treat as read-only once stored)
+        """
+        vector = self._normalize(vector)
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if entries is None:
+                entries = self._namespaces[namespace] = _Namespace(vector.shape[0], self.lsh_tables)
+            self._expire(entries)
+
+            if self.lsh_tables:
+                codes = self._codes(vector)
+                entry_id = entries.first_id + len(entries.values)
+                for table, code in enumerate(codes.tolist()):
+                    entries.buckets[table].setdefault(code, deque()).append(entry_id)
+            else:
+                codes = np.empty(0, dtype=np.int64)
+            entries.codes = np.vstack([entries.codes, codes[np.newaxis]])
+            if self.hnsw_m:
+                self._hnsw_add(entries, vector)
+
+            entries.vectors = np.vstack([entries.vectors, vector[np.newaxis]])
+            entries.values.append(value)
+            entries.created.append(time.monotonic())
+            overflow = len(entries.values) - self.max_entries
+            if overflow > 0:
+                self._drop_oldest(entries, overflow)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._namespaces.clear()
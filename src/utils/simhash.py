@@ -0,0 +1,82 @@
+"""
+SimHash fingerprints for grouping near-duplicate texts before embedding
+"""
+import hashlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    Compute a 64-bit SimHash over word shingles
+
+    Args:
+        text: Input text
+        shingle_size: Words per shingle
+
+    Returns:
+        Fingerprint as an unsigned 64-bit integer
+    """
+    words = text.split()
+    if len(words) <= shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [
+            " ".join(words[i:i + shingle_size])
+            for i in range(len(words) - shingle_size + 1)
+        ]
+
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(s.encode(), digest_size=8).digest() for s in shingles),
+        dtype=np.uint8
+    )
+    # One row of 64 bits per shingle; each bit is set where most shingles agree
+    bits = np.unpackbits(hashes).reshape(len(shingles), 64)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def cluster_near_duplicates(texts: List[str], max_distance: int = 3) -> np.ndarray:
+    """
+    Group texts whose SimHash fingerprints differ in at most max_distance bits
+
+    Fingerprints are split into max_distance + 1 bands; two fingerprints
+    within the distance must agree on at least one band, so only texts
+    sharing a band are compared.
+
+    Args:
+        texts: Texts to group
+        max_distance: Maximum Hamming distance within a cluster
+
+    Returns:
+        Array mapping each text to the index of its cluster representative
+        (the longest text of the cluster)
+    """
+    fingerprints = [simhash(text) for text in texts]
+    num_bands = max_distance + 1
+    band_bits = 64 // num_bands
+
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    for i, fp in enumerate(fingerprints):
+        for band in range(num_bands):
+            key = (band, (fp >> (band * band_bits)) & ((1 << band_bits) - 1))
+            buckets.setdefault(key, []).append(i)
+
+    representative = np.arange(len(texts), dtype=np.intp)
+    assigned = np.zeros(len(texts), dtype=bool)
+
+    # Longest texts first, so each cluster is represented by its fullest member
+    for i in sorted(range(len(texts)), key=lambda j: -len(texts[j])):
+        if assigned[i]:
+            continue
+        assigned[i] = True
+        fp = fingerprints[i]
+        for band in range(num_bands):
+            key = (band, (fp >> (band * band_bits)) & ((1 << band_bits) - 1))
+            for j in buckets[key]:
+                if not assigned[j] and (fp ^ fingerprints[j]).bit_count() <= max_distance:
+                    assigned[j] = True
+                    representative[j] = i
+
+    return representative
@@ -0,0 +1,137 @@
+"""
+Helpers for result tables
+
+A result_table is either row-oriented (a list of dicts) or columnar:
+{"columns": [...], "data": {column: [values, ...]}}. Columnar tables are
+built straight from pandas columns or NumPy column arrays without materializing
+a dict per row.
+"""
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+ResultTable = Union[List[Dict[str, Any]], Dict[str, Any]]
+
+
+def _add_extra_columns(
+    data: Dict[str, List[Any]],
+    extra_columns: Optional[Dict[str, List[Any]]]
+) -> Dict[str, Any]:
+    """
+    Append extra columns to table data and wrap it as a columnar table
+
+    Raises:
+        ValueError: If an extra column has the name of an existing one
+    """
+    if extra_columns:
+        clashes = [col for col in extra_columns if col in data]
+        if clashes:
+            raise ValueError(f"Extra columns clash with result columns: {clashes}")
+        data.update(extra_columns)
+    return {"columns": list(data), "data": data}
+
+
+def columnar_table(
+    df: pd.DataFrame,
+    extra_columns: Optional[Dict[str, List[Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Build a columnar result table from a dataframe
+
+    Args:
+        df: Result rows
+        extra_columns: Additional columns appended after the dataframe columns
+
+    Returns:
+        Columnar result table
+
+    Raises:
+        ValueError: If column names repeat (columns are keyed by name)
+    """
+    if not df.columns.is_unique:
+        duplicates = df.columns[df.columns.duplicated()].unique().tolist()
+        raise ValueError(f"Duplicate column names in result: {duplicates}")
+
+    # Series.tolist converts a whole column to Python scalars in one call
+    data = {col: df.iloc[:, i].tolist() for i, col in enumerate(df.columns)}
+    return _add_extra_columns(data, extra_columns)
+
+
+def gather_table(
+    columns: Dict[str, np.ndarray],
+    positions: List[int],
+    extra_columns: Optional[Dict[str, List[Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Build a columnar result table by gathering rows from column arrays
+
+    Args:
+        columns: Column name -> array of all rows
+        positions: Row positions to gather, in output order
+        extra_columns: Additional columns appended after the gathered ones
+
+    Returns:
+        Columnar result table with Python scalar values
+
+    Raises:
+        ValueError: If an extra column has the name of a gathered one
+    """
+    idx = np.asarray(positions, dtype=np.intp)
+    data = {col: values[idx].tolist() for col, values in columns.items()}
+    return _add_extra_columns(data, extra_columns)
+
+
+def is_columnar(table: ResultTable) -> bool:
+    """Check whether a result table uses the columnar layout"""
+    return isinstance(table, dict) and "columns" in table and "data" in table
+
+
+def table_length(table: ResultTable) -> int:
+    """
+    Count the rows of a result table
+
+    Args:
+        table: Row-oriented or columnar result table
+
+    Returns:
+        Number of rows
+    """
+    if is_columnar(table):
+        columns = table["columns"]
+        return len(table["data"][columns[0]]) if columns else 0
+    return len(table)
+
+
+def table_rows(table: ResultTable, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Get the rows of a result table as dicts
+
+    Args:
+        table: Row-oriented or columnar result table
+        limit: Maximum number of rows to return
+
+    Returns:
+        List of row dicts
+    """
+    if not is_columnar(table):
+        return list(table[:limit])
+
+    columns = table["columns"]
+    values = [table["data"][col][:limit] for col in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def table_to_dataframe(table: ResultTable) -> pd.DataFrame:
+    """
+    Convert a result table to a dataframe for display or export
+
+    Args:
+        table: Row-oriented or columnar result table
+
+    Returns:
+        Dataframe with one row per result row
+    """
+    if is_columnar(table):
+        return pd.DataFrame(table["data"], columns=table["columns"])
+    return pd.DataFrame(table)
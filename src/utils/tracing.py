@@ -0,0 +1,89 @@
+"""
+Timing spans for the query pipeline
+
+Shows where wall time goes (rate-limit waits, retrieval, LLM calls, pandas
+work) before anything else is optimized. Disabled unless TRACE_SPANS is set.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+import numpy as np
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SpanRecorder:
+    """Collects recent durations per span name"""
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Initialize recorder
+
+        Args:
+            max_samples: Durations kept per span name (oldest are dropped)
+        """
+        self.max_samples = max_samples
+        self._durations: Dict[str, Deque[int]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        Time the enclosed block under name (no-op when tracing is off)
+
+        Args:
+            name: Span name, e.g. "document_query.retrieve"
+        """
+        if not settings.TRACE_SPANS:
+            yield
+            return
+
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            with self._lock:
+                durations = self._durations.get(name)
+                if durations is None:
+                    durations = self._durations[name] = deque(maxlen=self.max_samples)
+                durations.append(elapsed)
+            logger.debug("span=%s ms=%.2f", name, elapsed / 1e6)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Aggregate the recorded durations
+
+        Returns:
+            Dict of span name -> count, p50_ms, p95_ms and total_ms
+        """
+        with self._lock:
+            samples = {name: list(durations) for name, durations in self._durations.items()}
+
+        summary = {}
+        for name, durations in samples.items():
+            ms = np.asarray(durations, dtype=np.float64) / 1e6
+            p50, p95 = np.percentile(ms, [50, 95])
+            summary[name] = {
+                "count": len(durations),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "total_ms": float(ms.sum())
+            }
+        return summary
+
+    def reset(self) -> None:
+        """Forget all recorded durations"""
+        with self._lock:
+            self._durations.clear()
+
+
+# Global recorder instance
+span_recorder = SpanRecorder(settings.TRACE_MAX_SAMPLES)
+span = span_recorder.span
@@ -3,26 +3,336 @@ FAISS-based vector database for storing and retrieving embeddings
 """
 import faiss
 import numpy as np
+import os
 import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Iterator, Sequence, Set, Tuple, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 from config.settings import settings
-from src.utils.models import VectorMetadata
+from src.utils.models import DocumentChunkMetadata, VectorMetadata
+
+# Bumped when the columnar metadata layout changes
+METADATA_FORMAT_VERSION = "1"
+
+# Metadata models that can be stored as columns, by class name
+METADATA_MODELS = {model.__name__: model for model in (VectorMetadata, DocumentChunkMetadata)}
+
+
+@contextmanager
+def omp_threads(count: int) -> Iterator[None]:
+    """
+    Run the calling thread's FAISS work with count OpenMP threads
+    
+    The OpenMP thread count is per calling thread, so this does not affect
+    searches running concurrently in other threads.
+    
+    Args:
+        count: Thread count (0 keeps the current setting)
+    """
+    previous = faiss.omp_get_max_threads()
+    if count and count != previous:
+        faiss.omp_set_num_threads(count)
+        try:
+            yield
+        finally:
+            faiss.omp_set_num_threads(previous)
+    else:
+        yield
+
+
+@lru_cache(maxsize=1)
+def gpu_resources() -> Optional[Any]:
+    """
+    Shared FAISS GPU resources
+    
+    Returns:
+        StandardGpuResources, or None without a GPU build of FAISS and a device
+    """
+    if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+        return None
+    return faiss.StandardGpuResources()
+
+
+def _restore(model: type, values: Dict[str, Any]) -> Any:
+    """
+    Rebuild a metadata object without validation (it was validated when written)
+    
+    Uses the same state restore as unpickling: about 3x cheaper than model_construct.
+    """
+    meta = model.__new__(model)
+    meta.__setstate__({
+        '__dict__': values,
+        '__pydantic_fields_set__': set(values),
+        '__pydantic_extra__': None,
+        '__pydantic_private__': None
+    })
+    return meta
+
+
+class MetadataTable(Sequence):
+    """
+    Read-only sequence of metadata objects backed by Arrow columns
+    
+    Loading a store keeps the Parquet columns as they are; an object is only
+    built when its position is accessed (typically a search hit), so a store
+    of N vectors does not hold N Python models.
+    """
+    
+    def __init__(self, model: type, table: "pa.Table"):
+        """
+        Initialize view
+        
+        Args:
+            model: METADATA_MODELS class of the rows
+            table: Columns written by write_metadata_table
+        """
+        self.model = model
+        self.table = table
+        self._built: Dict[int, Any] = {}
+    
+    def __len__(self) -> int:
+        return self.table.num_rows
+    
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        meta = self._built.get(idx)
+        if meta is None:
+            if not 0 <= idx < len(self):
+                raise IndexError("metadata index out of range")
+            meta = _restore(self.model, self.table.slice(idx, 1).to_pylist()[0])
+            self._built[idx] = meta
+        return meta
+    
+    def column(self, name: str) -> List[Any]:
+        """
+        All values of one field, without building objects
+        
+        Args:
+            name: Field name
+            
+        Returns:
+            Values in position order
+        """
+        return self.table.column(name).to_pylist()
+
+
+def write_metadata_table(metadata: Sequence[Any], path: Path) -> bool:
+    """
+    Write vector metadata as a zstd-compressed Parquet table, one column per field
+    
+    Args:
+        metadata: Metadata objects of one METADATA_MODELS type, or a MetadataTable
+        path: Destination file
+        
+    Returns:
+        False (nothing written) if pyarrow is missing or the list mixes types
+    """
+    if isinstance(metadata, MetadataTable):
+        pq.write_table(metadata.table, str(path), compression='zstd')
+        return True
+    
+    model = type(metadata[0]) if metadata else VectorMetadata
+    if pa is None or model.__name__ not in METADATA_MODELS:
+        return False
+    if any(type(meta) is not model for meta in metadata):
+        return False
+    
+    columns = {
+        name: [getattr(meta, name) for meta in metadata] for name in model.model_fields
+    }
+    table = pa.Table.from_pydict(columns).replace_schema_metadata({
+        "format_version": METADATA_FORMAT_VERSION,
+        "model": model.__name__
+    })
+    pq.write_table(table, str(path), compression='zstd')
+    return True
+
+
+def read_metadata_table(path: Path) -> MetadataTable:
+    """
+    Read metadata written by write_metadata_table
+    
+    Args:
+        path: Parquet file
+        
+    Returns:
+        Lazily built metadata objects
+    """
+    table = pq.read_table(str(path))
+    header = table.schema.metadata or {}
+    version = header.get(b"format_version", b"").decode()
+    if version != METADATA_FORMAT_VERSION:
+        raise ValueError(f"Unsupported metadata format version: {version!r}")
+    return MetadataTable(METADATA_MODELS[header[b"model"].decode()], table)
 
 
 class VectorStore:
     """FAISS vector store with metadata"""
     
-    def __init__(self, dimension: int = settings.VECTOR_DIMENSION):
+    def __init__(
+        self, 
+        dimension: int = settings.VECTOR_DIMENSION,
+        quantization: str = settings.VECTOR_QUANTIZATION,
+        index: Optional[faiss.Index] = None
+    ):
         """
         Initialize vector store
         
         Args:
             dimension: Embedding dimension
+            quantization: Vector encoding: "fp32", "sq8" or "pq"
+            index: Existing index to wrap; its dimension and encoding are used instead
         """
+        if index is not None:
+            dimension, quantization = index.d, self._index_quantization(index)
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)  # L2 distance
-        self.metadata: List[VectorMetadata] = []
+        self.quantization = quantization
+        self.index = index if index is not None else self._build_index(dimension, quantization)
+        # A list, or a MetadataTable for stores loaded from Parquet
+        self.metadata: Sequence[VectorMetadata] = []
+        # file_id -> int64 positions of its vectors; built on first use
+        self._positions_by_file: Optional[Dict[str, np.ndarray]] = None
+        # File the index was opened read-only from by load (None once writable)
+        self._read_only_path: Optional[Path] = None
+    
+    @staticmethod
+    def _index_quantization(index: faiss.Index) -> str:
+        """
+        Vector encoding of an existing index
+        
+        Args:
+            index: Index built by _build_index or _build_ivf_index
+            
+        Returns:
+            "fp32", "sq8" or "pq"
+        """
+        if isinstance(index, faiss.IndexHNSW):
+            index = faiss.downcast_index(index.storage)
+        if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+            return "sq8"
+        if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+            return "pq"
+        return "fp32"
+    
+    def _make_writable(self) -> None:
+        """Replace an index opened read-only by load with an in-memory copy"""
+        if self._read_only_path is not None:
+            self.index = faiss.read_index(str(self._read_only_path))
+            self._read_only_path = None
+    
+    @staticmethod
+    def _build_index(dimension: int, quantization: str) -> faiss.Index:
+        """
+        Create an empty index of the configured type and encoding
+        
+        Args:
+            dimension: Embedding dimension
+            quantization: Vector encoding: "fp32", "sq8" or "pq"
+            
+        Returns:
+            FAISS index scoring by inner product, which equals cosine on the
+            stored unit vectors (HNSW+PQ only supports L2); quantized indexes
+            need training
+        """
+        if quantization not in ("fp32", "sq8", "pq"):
+            raise ValueError(f"Unsupported vector quantization: {quantization}")
+        
+        metric = faiss.METRIC_INNER_PRODUCT
+        if settings.FAISS_INDEX_TYPE == "HNSW":
+            if quantization == "sq8":
+                index = faiss.IndexHNSWSQ(
+                    dimension, faiss.ScalarQuantizer.QT_8bit, settings.HNSW_M, metric
+                )
+            elif quantization == "pq":
+                index = faiss.IndexHNSWPQ(
+                    dimension, settings.PQ_SUBQUANTIZERS, settings.HNSW_M
+                )
+            else:
+                index = faiss.IndexHNSWFlat(dimension, settings.HNSW_M, metric)
+            index.hnsw.efConstruction = settings.HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = settings.HNSW_EF_SEARCH
+            return index
+        
+        if quantization == "sq8":
+            return faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_8bit, metric
+            )
+        if quantization == "pq":
+            return faiss.IndexPQ(dimension, settings.PQ_SUBQUANTIZERS, 8, metric)
+        return faiss.IndexFlatIP(dimension)
+    
+    @staticmethod
+    def _build_ivf_index(dimension: int, quantization: str, num_vectors: int) -> faiss.Index:
+        """
+        Create an inverted-file index for a store of num_vectors vectors
+        
+        Queries only scan the lists nearest to them, so search cost grows
+        with sqrt(N) instead of N; vectors keep the configured encoding.
+        
+        Args:
+            dimension: Embedding dimension
+            quantization: Vector encoding: "fp32", "sq8" or "pq"
+            num_vectors: Vectors the index is built for
+            
+        Returns:
+            Untrained IVF index with about sqrt(num_vectors) lists, scoring by inner product
+        """
+        nlist = max(1, int(np.sqrt(num_vectors)))
+        metric = faiss.METRIC_INNER_PRODUCT
+        quantizer = faiss.IndexFlatIP(dimension)
+        if quantization == "sq8":
+            return faiss.IndexIVFScalarQuantizer(
+                quantizer, dimension, nlist, faiss.ScalarQuantizer.QT_8bit, metric
+            )
+        if quantization == "pq":
+            return faiss.IndexIVFPQ(
+                quantizer, dimension, nlist, settings.PQ_SUBQUANTIZERS, 8, metric
+            )
+        return faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+    
+    def _train(self, vectors: np.ndarray) -> None:
+        """
+        Train a quantized index on the first batch of vectors
+        
+        Args:
+            vectors: Normalized vectors about to be added
+        """
+        if self.quantization == "pq" and len(vectors) < settings.PQ_MIN_TRAINING_VECTORS:
+            # PQ codebooks need thousands of points; int8 only needs value ranges
+            print(
+                f"  - {len(vectors)} vectors are too few to train PQ, "
+                f"using sq8 quantization instead"
+            )
+            self.quantization = "sq8"
+            if isinstance(self.index, faiss.IndexIVF):
+                self.index = self._build_ivf_index(self.dimension, self.quantization, len(vectors))
+            else:
+                self.index = self._build_index(self.dimension, self.quantization)
+        
+        if isinstance(self.index, faiss.IndexIVF):
+            # Clustering converges on a sample; training on millions of points
+            # would only cost time
+            sample_size = settings.IVF_TRAINING_POINTS_PER_LIST * self.index.nlist
+            if len(vectors) > sample_size:
+                rng = np.random.default_rng(0)
+                vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        
+        self.index.train(vectors)
     
     def add_vectors(
         self, 
@@ -42,18 +352,79 @@ class VectorStore:
         if vectors.shape[1] != self.dimension:
             raise ValueError(f"Vector dimension {vectors.shape[1]} doesn't match {self.dimension}")
         
-        # Normalize vectors for better search
+        # Normalize once, in place, at write time (faiss needs C-contiguous
+        # float32); searches rely on stored vectors being unit length
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
         faiss.normalize_L2(vectors)
         
+        # Mapped read-only indexes abort the process on add instead of raising
+        self._make_writable()
+        
+        if self.index.ntotal == 0 and len(vectors) >= settings.IVF_MIN_VECTORS:
+            self.index = self._build_ivf_index(self.dimension, self.quantization, len(vectors))
+        
+        if not self.index.is_trained:
+            self._train(vectors)
+        
         # Add to index
+        if isinstance(self.metadata, MetadataTable):
+            self.metadata = list(self.metadata)
+        
+        base = len(self.metadata)
         self.index.add(vectors)
         self.metadata.extend(metadata)
+        
+        # Extend the file_id -> positions map with just the new vectors
+        if self._positions_by_file is not None:
+            for fid, positions in self._group_positions(metadata, base).items():
+                existing = self._positions_by_file.get(fid)
+                self._positions_by_file[fid] = (
+                    positions if existing is None else np.concatenate([existing, positions])
+                )
+    
+    @staticmethod
+    def _group_positions(metadata: Sequence[Any], base: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Group index positions by file_id
+        
+        Args:
+            metadata: Metadata of consecutive vectors
+            base: Index position of the first of them
+            
+        Returns:
+            Dict of file_id -> sorted int64 positions
+        """
+        if isinstance(metadata, MetadataTable):
+            file_ids = metadata.column('file_id')
+        else:
+            file_ids = [meta.file_id for meta in metadata]
+        
+        groups: Dict[str, List[int]] = {}
+        for idx, file_id in enumerate(file_ids, base):
+            groups.setdefault(file_id, []).append(idx)
+        return {fid: np.asarray(positions, dtype=np.int64) for fid, positions in groups.items()}
+    
+    def _file_positions(self, file_id: str) -> np.ndarray:
+        """
+        Positions of a file's vectors in the index
+        
+        Args:
+            file_id: File identifier
+            
+        Returns:
+            Sorted int64 positions (empty if the file has no vectors here)
+        """
+        if self._positions_by_file is None:
+            # Built in one pass on first use (e.g. after load), then kept current by add_vectors
+            self._positions_by_file = self._group_positions(self.metadata)
+        return self._positions_by_file.get(file_id, np.empty(0, dtype=np.int64))
     
     def search(
         self, 
         query_vector: np.ndarray, 
         k: int = 5,
-        file_id: Optional[str] = None
+        file_id: Optional[str] = None,
+        ef_search: Optional[int] = None
     ) -> List[Tuple[VectorMetadata, float]]:
         """
         Search for similar vectors
@@ -62,34 +433,142 @@ class VectorStore:
             query_vector: Query vector
             k: Number of results to return
             file_id: Optional file_id to filter results
+            ef_search: HNSW search breadth for this query (ignored by flat indexes)
             
         Returns:
-            List of (metadata, distance) tuples
+            List of (metadata, squared L2 distance) tuples
         """
-        # Normalize query
-        query_vector = query_vector.reshape(1, -1).astype(np.float32)
-        faiss.normalize_L2(query_vector)
+        return self.search_batch(query_vector.reshape(1, -1), k, file_id, ef_search)[0]
+    
+    def search_batch(
+        self, 
+        query_vectors: np.ndarray, 
+        k: int = 5,
+        file_id: Optional[str] = None,
+        ef_search: Optional[int] = None
+    ) -> List[List[Tuple[VectorMetadata, float]]]:
+        """
+        Search for several queries with one FAISS call
+        
+        Args:
+            query_vectors: Query vectors (n_queries x dimension)
+            k: Number of results to return per query
+            file_id: Optional file_id to filter results
+            ef_search: HNSW search breadth for these queries (ignored by flat indexes)
+            
+        Returns:
+            One list of (metadata, distance) tuples per query
+        """
+        # Normalize a float32 copy (callers' arrays may be shared or read-only)
+        query_vectors = np.array(query_vectors, dtype=np.float32, ndmin=2)
+        total = self.index.ntotal
+        if total == 0 or k <= 0:
+            return [[] for _ in range(len(query_vectors))]
+        faiss.normalize_L2(query_vectors)
+        
+        # Small HNSW graphs: an exhaustive scan of the graph's vector storage
+        # is exact and visits fewer vectors than the graph walk would
+        index = self.index
+        if isinstance(index, faiss.IndexHNSW) and total < settings.HNSW_MIN_VECTORS:
+            index = faiss.downcast_index(index.storage)
+        
+        search_k = min(k, total)
+        selector = None
+        allowed = None  # Sorted positions to filter hits by after the search
+        if file_id:
+            positions = self._file_positions(file_id)
+            if positions.size == 0:
+                return [[] for _ in range(len(query_vectors))]
+            if positions.size < total:
+                if isinstance(index, faiss.IndexPQ):
+                    # IndexPQ has no selector support: over-fetch and filter below
+                    search_k = min(k * 10, total)
+                    allowed = positions
+                else:
+                    # Let FAISS skip other files' vectors during the search
+                    selector = faiss.IDSelectorBatch(positions)
+                    search_k = min(k, positions.size)
         
-        # Search more results if filtering by file_id
-        search_k = k * 10 if file_id else k
+        if (
+            settings.USE_GPU
+            and len(query_vectors) >= settings.GPU_MIN_QUERIES
+            and isinstance(index, faiss.IndexFlat)
+            and gpu_resources() is not None
+        ):
+            # Large batches over raw float32 vectors: one brute-force GPU pass,
+            # no GPU index to build or keep in sync
+            base = faiss.rev_swig_ptr(index.get_xb(), index.ntotal * index.d)
+            base = base.reshape(index.ntotal, index.d)
+            if selector is not None:
+                base = base[positions]
+            distances, indices = faiss.knn_gpu(
+                gpu_resources(), query_vectors, base, search_k, metric=index.metric_type
+            )
+            if selector is not None:
+                indices = np.where(indices >= 0, positions[indices], -1)
+            return self._collect(distances, indices, index.metric_type, k, allowed)
+        
+        if isinstance(index, faiss.IndexHNSW):
+            # efSearch is not persisted with the index, so always pass it; it
+            # must be at least search_k for HNSW to return search_k results
+            ef = max(ef_search or settings.HNSW_EF_SEARCH, search_k)
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=ef)
+        elif isinstance(index, faiss.IndexIVF):
+            # nprobe is not persisted with the index either
+            nprobe = settings.IVF_NPROBE or max(1, index.nlist // 16)
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+        elif selector is not None:
+            params = faiss.SearchParameters(sel=selector)
+        else:
+            params = None
+        
+        # FAISS splits work across queries, so a lone query gains nothing from
+        # more threads; batches keep the default and parallelize
+        threads = settings.FAISS_SEARCH_THREADS if len(query_vectors) == 1 else 0
+        with omp_threads(threads):
+            distances, indices = index.search(query_vectors, search_k, params=params)
+        return self._collect(distances, indices, index.metric_type, k, allowed)
+    
+    def _collect(
+        self,
+        distances: np.ndarray,
+        indices: np.ndarray,
+        metric: int,
+        k: int,
+        allowed: Optional[np.ndarray]
+    ) -> List[List[Tuple[VectorMetadata, float]]]:
+        """
+        Turn raw k-NN results into (metadata, distance) lists
+        
+        Args:
+            distances: Distances or similarities per query (n_queries x search_k)
+            indices: Index positions, -1 for padding
+            metric: FAISS metric the distances were computed with
+            k: Results to keep per query
+            allowed: Sorted positions hits must be in (None keeps all)
+            
+        Returns:
+            One list of (metadata, squared L2 distance) tuples per query
+        """
+        if metric == faiss.METRIC_INNER_PRODUCT:
+            # Report squared L2 (2 - 2*cos on unit vectors) like L2 indexes,
+            # so callers and stores saved with either metric compare alike
+            distances = 2.0 - 2.0 * distances
         
-        distances, indices = self.index.search(query_vector, min(search_k, len(self.metadata)))
+        # Drop padding (-1) and other files' hits with array masks, so the
+        # Python loop below only touches the results that are returned
+        valid = (indices >= 0) & (indices < len(self.metadata))
+        if allowed is not None:
+            slots = np.minimum(np.searchsorted(allowed, indices), allowed.size - 1)
+            valid &= allowed[slots] == indices
         
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx >= 0 and idx < len(self.metadata):
-                meta = self.metadata[idx]
-                
-                # Filter by file_id if specified
-                if file_id and meta.file_id != file_id:
-                    continue
-                
-                results.append((meta, float(dist)))
-                
-                if len(results) >= k:
-                    break
+        batch_results = []
+        for row_distances, row_indices, row_valid in zip(distances, indices, valid):
+            hits = row_indices[row_valid][:k].tolist()
+            dists = row_distances[row_valid][:k].tolist()
+            batch_results.append([(self.metadata[idx], dist) for idx, dist in zip(hits, dists)])
         
-        return results
+        return batch_results
     
     def get_vectors_by_file(self, file_id: str) -> List[Tuple[int, VectorMetadata]]:
         """
@@ -101,11 +580,7 @@ class VectorStore:
         Returns:
             List of (index, metadata) tuples
         """
-        results = []
-        for idx, meta in enumerate(self.metadata):
-            if meta.file_id == file_id:
-                results.append((idx, meta))
-        return results
+        return [(idx, self.metadata[idx]) for idx in self._file_positions(file_id).tolist()]
     
     def save(self, file_id: str) -> None:
         """
@@ -115,14 +590,22 @@ class VectorStore:
             file_id: Identifier for the saved files
         """
         index_path = settings.get_vector_db_path(file_id)
-        metadata_path = settings.get_metadata_path(file_id)
+        table_path = settings.get_metadata_table_path(file_id)
+        pickle_path = settings.get_metadata_path(file_id)
         
-        # Save FAISS index
+        # Save FAISS index (an index mapped read-only from disk, e.g. the
+        # inverted lists of a loaded IVF store, cannot be written back as is)
+        self._make_writable()
         faiss.write_index(self.index, str(index_path))
         
-        # Save metadata
-        with open(metadata_path, 'wb') as f:
-            pickle.dump(self.metadata, f)
+        # Save metadata as columns, or pickle when pyarrow is unavailable; the
+        # other format is removed so load never picks up a stale file
+        if write_metadata_table(self.metadata, table_path):
+            pickle_path.unlink(missing_ok=True)
+        else:
+            with open(pickle_path, 'wb') as f:
+                pickle.dump(self.metadata, f)
+            table_path.unlink(missing_ok=True)
     
     @classmethod
     def load(cls, file_id: str) -> 'VectorStore':
@@ -136,22 +619,29 @@ class VectorStore:
             Loaded VectorStore instance
         """
         index_path = settings.get_vector_db_path(file_id)
-        metadata_path = settings.get_metadata_path(file_id)
+        table_path = settings.get_metadata_table_path(file_id)
+        pickle_path = settings.get_metadata_path(file_id)
+        use_table = pq is not None and table_path.exists()
         
-        if not index_path.exists() or not metadata_path.exists():
+        if not index_path.exists() or not (use_table or pickle_path.exists()):
             raise FileNotFoundError(f"Vector store for {file_id} not found")
         
-        # Load FAISS index
-        index = faiss.read_index(str(index_path))
+        # Load FAISS index read-only through mmap where FAISS supports it, so
+        # the page cache rather than the heap holds the vectors (FAISS 1.7.x
+        # only maps IVF lists and still reads flat/HNSW codes into memory)
+        index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
         
-        # Load metadata
-        with open(metadata_path, 'rb') as f:
-            metadata = pickle.load(f)
+        # Load metadata (pickle files are from older saves or pyarrow-less setups)
+        if use_table:
+            metadata = read_metadata_table(table_path)
+        else:
+            with open(pickle_path, 'rb') as f:
+                metadata = pickle.load(f)
         
-        # Create store instance
-        store = cls(dimension=index.d)
-        store.index = index
+        # Create store instance; add_vectors swaps in a writable copy of the index
+        store = cls(index=index)
         store.metadata = metadata
+        store._read_only_path = index_path
         
         return store
     
@@ -165,7 +655,31 @@ class VectorStoreManager:
     
     def __init__(self):
         """Initialize manager"""
-        self.stores: Dict[str, VectorStore] = {}
+        # Least recently used first; saved stores beyond VECTOR_STORE_CACHE_SIZE
+        # are dropped and reloaded from disk on their next use
+        self.stores: "OrderedDict[str, VectorStore]" = OrderedDict()
+        # Stores whose in-memory state matches disk (safe to drop)
+        self._persisted: set = set()
+        self._lock = threading.Lock()
+        # file_id -> lock held while that store is loaded, so concurrent
+        # misses for one file wait for a single load (single flight)
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # (scan time, file_ids) of the last VECTOR_DIR scan; reset by save_store
+        self._disk_ids: Optional[Tuple[float, Set[str]]] = None
+        # Worker threads only start on first submit
+        self._search_pool = ThreadPoolExecutor(
+            max_workers=settings.SEARCH_WORKERS, thread_name_prefix="vector-search"
+        )
+    
+    def _evict(self) -> None:
+        """Drop least recently used saved stores over the cap (caller holds the lock)"""
+        excess = len(self.stores) - settings.VECTOR_STORE_CACHE_SIZE
+        if excess <= 0:
+            return
+        # Unsaved stores (ingestion in progress) are never dropped
+        for file_id in [fid for fid in self.stores if fid in self._persisted][:excess]:
+            del self.stores[file_id]
+            self._persisted.discard(file_id)
     
     def create_store(self, file_id: str) -> VectorStore:
         """
@@ -178,7 +692,11 @@ class VectorStoreManager:
             New VectorStore instance
         """
         store = VectorStore()
-        self.stores[file_id] = store
+        with self._lock:
+            self.stores[file_id] = store
+            self.stores.move_to_end(file_id)
+            self._persisted.discard(file_id)
+            self._evict()
         return store
     
     def get_store(self, file_id: str) -> Optional[VectorStore]:
@@ -191,13 +709,42 @@ class VectorStoreManager:
         Returns:
             VectorStore instance or None
         """
-        if file_id not in self.stores:
+        with self._lock:
+            store = self.stores.get(file_id)
+            if store is not None:
+                self.stores.move_to_end(file_id)
+                return store
+            load_lock = self._load_locks.setdefault(file_id, threading.Lock())
+        
+        # Other files keep loading in parallel; only the same file waits
+        with load_lock:
+            with self._lock:
+                # Loaded (or created) by another thread while we waited
+                store = self.stores.get(file_id)
+                if store is not None:
+                    self.stores.move_to_end(file_id)
+                    return store
+            
             try:
-                self.stores[file_id] = VectorStore.load(file_id)
+                store = VectorStore.load(file_id)
             except FileNotFoundError:
-                return None
-        
-        return self.stores[file_id]
+                store = None
+            
+            with self._lock:
+                # Retire the load lock together with publishing the result, so
+                # no thread can start a second load in between
+                if self._load_locks.get(file_id) is load_lock:
+                    del self._load_locks[file_id]
+                if store is None:
+                    return None
+                # Keep a store create_store put in place during the load
+                if file_id in self.stores:
+                    self.stores.move_to_end(file_id)
+                    return self.stores[file_id]
+                self.stores[file_id] = store
+                self._persisted.add(file_id)
+                self._evict()
+        return store
     
     def save_store(self, file_id: str) -> None:
         """
@@ -206,8 +753,95 @@ class VectorStoreManager:
         Args:
             file_id: File identifier
         """
-        if file_id in self.stores:
-            self.stores[file_id].save(file_id)
+        store = self.stores.get(file_id)
+        if store is not None:
+            store.save(file_id)
+            with self._lock:
+                if self.stores.get(file_id) is store:
+                    self._persisted.add(file_id)
+                self._evict()
+                self._disk_ids = None
+
+    def delete_store(self, file_id: str) -> bool:
+        """
+        Remove a file's vectors from memory and disk
+
+        Each file has its own store, so this drops whole indexes and never
+        rebuilds one.
+
+        Callers unloading a file should go through
+        document_ingestion.delete_document or csv_ingestion.delete_file,
+        which also drop the file's data and cached search results.
+
+        Args:
+            file_id: File identifier
+
+        Returns:
+            True if an in-memory or saved store existed
+        """
+        with self._lock:
+            existed = self.stores.pop(file_id, None) is not None
+            self._persisted.discard(file_id)
+            self._disk_ids = None
+
+        for path in (
+            settings.get_vector_db_path(file_id),
+            settings.get_metadata_table_path(file_id),
+            settings.get_metadata_path(file_id)
+        ):
+            try:
+                path.unlink()
+                existed = True
+            except FileNotFoundError:
+                pass
+        return existed
+
+    def search_all(
+        self, 
+        query_vector: np.ndarray, 
+        k: int = 5,
+        file_ids: Optional[List[str]] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Tuple[VectorMetadata, float]]:
+        """
+        Search several stores and merge their results
+        
+        Stores are searched concurrently (FAISS releases the GIL) and the
+        global top k is selected with a partial sort over all hits.
+        
+        Args:
+            query_vector: Query vector
+            k: Number of results to return
+            file_ids: Stores to search (default: all available stores)
+            ef_search: HNSW search breadth for this query
+            
+        Returns:
+            List of (metadata, distance) tuples, closest first
+        """
+        stores = [
+            store for store in (self.get_store(fid) for fid in (file_ids or self.list_stores()))
+            if store is not None
+        ]
+        if not stores:
+            return []
+        
+        def search_one(store: VectorStore) -> List[Tuple[VectorMetadata, float]]:
+            return store.search(query_vector, k=k, ef_search=ef_search)
+        
+        if len(stores) == 1:
+            per_store = [search_one(stores[0])]
+        else:
+            per_store = list(self._search_pool.map(search_one, stores))
+        
+        hits = [hit for results in per_store for hit in results]
+        if len(hits) <= k:
+            return sorted(hits, key=lambda hit: hit[1])
+        
+        # Partial sort: select the k smallest distances, then order just those
+        distances = np.fromiter((d for _, d in hits), dtype=np.float32, count=len(hits))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind='stable')]
+        return [hits[i] for i in top.tolist()]
     
     def list_stores(self) -> List[str]:
         """
@@ -217,14 +851,28 @@ class VectorStoreManager:
             List of file_ids
         """
         # Check both in-memory and on-disk stores
-        file_ids = set(self.stores.keys())
+        with self._lock:
+            file_ids = set(self.stores)
+            cached = self._disk_ids
         
-        # Add saved stores from disk
-        for path in settings.VECTOR_DIR.glob("*.faiss"):
-            file_id = path.stem
-            file_ids.add(file_id)
+        # Add saved stores from disk (rescanned at most every STORE_LIST_TTL_SECONDS)
+        if cached is not None and time.monotonic() - cached[0] < settings.STORE_LIST_TTL_SECONDS:
+            disk_ids = cached[1]
+        else:
+            scanned_at = time.monotonic()
+            try:
+                with os.scandir(settings.VECTOR_DIR) as entries:
+                    disk_ids = {
+                        entry.name[:-len(".faiss")]
+                        for entry in entries
+                        if entry.name.endswith(".faiss")
+                    }
+            except FileNotFoundError:
+                disk_ids = set()
+            with self._lock:
+                self._disk_ids = (scanned_at, disk_ids)
         
-        return sorted(list(file_ids))
+        return sorted(file_ids | disk_ids)
 
 
 # Global manager instance
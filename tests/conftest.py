@@ -0,0 +1,12 @@
+"""
+Shared test setup
+"""
+import os
+import sys
+from pathlib import Path
+
+# Run from any directory; modules import config/src from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# The global Gemini client is built at import; tests never send requests
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
@@ -0,0 +1,105 @@
+"""
+Tests for the disk and in-memory caches
+"""
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.utils import cache as cache_module
+from src.utils.cache import DiskCache, MemoryCache
+
+
+class FakeClock:
+    """Stands in for time.time / time.monotonic"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "time", fake)
+    monkeypatch.setattr(cache_module.time, "monotonic", fake)
+    return fake
+
+
+def test_disk_cache_round_trips_without_pickle(tmp_path):
+    path = tmp_path / "c.sqlite"
+    cache = DiskCache(path)
+    vector = np.arange(4, dtype=np.float32)
+    cache.set("vec", vector.tobytes())
+    cache.set("text", "narrative")
+    cache.set("obj", {"a": [1, 2]})
+
+    # A fresh instance reads the same file
+    reopened = DiskCache(path)
+    assert np.array_equal(np.frombuffer(reopened.get("vec"), dtype=np.float32), vector)
+    assert reopened.get("text") == "narrative"
+    assert reopened.get("obj") == {"a": [1, 2]}
+    assert reopened.get("missing", "default") == "default"
+
+    stored = sqlite3.connect(str(path)).execute(
+        "SELECT key, typeof(value) FROM entries ORDER BY key"
+    ).fetchall()
+    assert stored == [("obj", "text"), ("text", "text"), ("vec", "blob")]
+
+    with pytest.raises(TypeError):
+        cache.set("bad", object())
+
+
+def test_disk_cache_expires_entries(tmp_path, clock):
+    cache = DiskCache(tmp_path / "c.sqlite", ttl_seconds=60)
+    cache.set("k", "v")
+    clock.now += 30
+    assert cache.get("k") == "v"
+    clock.now += 31
+    assert cache.get("k") is None
+
+
+def test_disk_cache_caps_rows(tmp_path, clock):
+    path = tmp_path / "c.sqlite"
+    cache = DiskCache(path, max_entries=3)
+    for i in range(10):
+        clock.now += 1
+        cache.set(f"k{i}", i)
+        cache.set(f"k{i}", i)  # Replacing a key does not grow the table
+
+    count = sqlite3.connect(str(path)).execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    assert count <= 3
+    assert [cache.get(f"k{i}") for i in range(10)] == [None] * 7 + [7, 8, 9]
+
+
+def test_disk_cache_drops_legacy_pickle_table(tmp_path):
+    path = tmp_path / "c.sqlite"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE cache (key TEXT PRIMARY KEY, value BLOB)")
+    conn.execute("INSERT INTO cache VALUES ('k', x'80')")
+    conn.commit()
+
+    assert DiskCache(path).get("k") is None
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert "cache" not in tables
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_memory_cache_ttl(clock):
+    cache = MemoryCache(ttl_seconds=10)
+    cache.set("a", 1)
+    clock.now += 5
+    assert cache.get("a") == 1
+    clock.now += 6
+    assert cache.get("a", "gone") == "gone"
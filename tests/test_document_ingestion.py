@@ -0,0 +1,173 @@
+"""
+Tests for document chunking and unloading
+"""
+import pytest
+
+from src.agents.document_ingestion import DocumentIngestion
+
+
+def baseline_chunk_text(text, chunk_size=1000, overlap=200):
+    """The original paragraph-packing chunker, kept as a reference"""
+    chunks = []
+    current_chunk = ""
+    for para in text.split('\n'):
+        para = para.strip()
+        if not para:
+            continue
+        if len(current_chunk) + len(para) > chunk_size and current_chunk:
+            chunks.append(current_chunk)
+            words = current_chunk.split()
+            current_chunk = " ".join(words[-overlap//5:]) + " " + para
+        else:
+            current_chunk += "\n" + para if current_chunk else para
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def _paragraphs(count, words_per_paragraph):
+    return [
+        " ".join(f"p{p}w{w}" for w in range(words_per_paragraph))
+        for p in range(count)
+    ]
+
+
+@pytest.fixture
+def ingestion():
+    return DocumentIngestion()
+
+
+def test_short_document_matches_baseline(ingestion):
+    text = "\n".join(_paragraphs(4, 10))
+    assert ingestion.chunk_text(text, chunk_size=1000, overlap=200) == baseline_chunk_text(text)
+
+
+def test_long_document_keeps_paragraph_breaks(ingestion):
+    paragraphs = _paragraphs(30, 25)
+    text = "\n\n".join(paragraphs)
+    chunk_size, overlap = 400, 100
+
+    chunks = ingestion.chunk_text(text, chunk_size=chunk_size, overlap=overlap)
+    baseline = baseline_chunk_text(text, chunk_size, overlap)
+    assert len(chunks) > 1 and len(baseline) > 1
+
+    # Both chunkers cover every paragraph
+    for para in paragraphs:
+        for word in (para.split()[0], para.split()[-1]):
+            assert any(word in chunk for chunk in chunks)
+            assert any(word in chunk for chunk in baseline)
+
+    # Chunks are verbatim slices of the source, in order, within chunk_size
+    position = 0
+    previous_end = 0
+    for chunk in chunks:
+        assert len(chunk) <= chunk_size
+        begin = text.index(chunk, position)
+        assert begin <= previous_end  # No gap between neighbours
+        assert previous_end - begin <= overlap + 10  # Overlap of about overlap characters
+        position, previous_end = begin + 1, begin + len(chunk)
+    assert text.startswith(chunks[0]) and text.endswith(chunks[-1])
+
+    # Paragraph breaks are kept as in the source, not joined with spaces
+    assert any("\n\n" in chunk for chunk in chunks)
+    for chunk in chunks:
+        inner = chunk.split("\n\n")[1:-1]
+        assert all(para in paragraphs for para in inner)
+
+
+def test_oversized_token_is_own_chunk(ingestion):
+    text = "short words\n" + "x" * 50 + "\nend"
+    chunks = ingestion.chunk_text(text, chunk_size=20, overlap=5)
+    assert "x" * 50 in chunks
+    assert chunks[-1].endswith("end")
+
+
+def test_empty_text(ingestion):
+    assert ingestion.chunk_text(" \n\n ") == []
+
+
+def test_delete_document_drops_data_vectors_and_cached_searches(ingestion, tmp_path, monkeypatch):
+    from config.settings import settings
+
+    monkeypatch.setattr(type(settings), "VECTOR_DIR", tmp_path)
+    path = tmp_path / "notes.txt"
+    path.write_text("first paragraph\n\nsecond paragraph")
+    file_id, _ = ingestion.ingest_document(str(path), file_id="notes", vectorize=False)
+    settings.get_vector_db_path(file_id).write_bytes(b"index")
+
+    searches = []
+    monkeypatch.setattr(ingestion, "embed", lambda query: query)
+    monkeypatch.setattr(
+        ingestion, "search_by_vector",
+        lambda vector, file_id=None, top_k=3: searches.append(vector) or [("chunk", 1.0, {})]
+    )
+    ingestion.search_document("q")
+    ingestion.search_document("q")
+    assert len(searches) == 1
+    assert [meta["file_id"] for meta in ingestion.metadata_dicts()] == ["notes"]
+
+    assert ingestion.delete_document(file_id)
+    assert file_id not in ingestion.documents and file_id not in ingestion.document_chunks
+    assert ingestion.metadata_dicts() == []
+    assert not settings.get_vector_db_path(file_id).exists()
+    ingestion.search_document("q")
+    assert len(searches) == 2
+    assert not ingestion.delete_document(file_id)
+
+
+def test_extract_questions_and_answers_stays_within_each_question(ingestion):
+    text = (
+        "Intro\n\n"
+        "Q1: What is the mean?\n\nAns: 4.2\n\nANALYSIS: Mean of column a\n\n"
+        "Q2: Which file is larger?\n\nAns: sales.csv\n\n"
+        "Q3: Top row?\n\nAns: row 7\n\nANALYSIS: Sorted by b"
+    )
+    pairs = ingestion.extract_questions_and_answers(text)
+    assert [pair["question"] for pair in pairs] == [
+        "What is the mean?", "Which file is larger?", "Top row?"
+    ]
+    assert pairs[0]["answer"] == "4.2" and pairs[0]["analysis"] == "Mean of column a"
+    # Q2 has no analysis of its own and must not borrow Q3's
+    assert pairs[1]["answer"] == "sales.csv" and pairs[1]["analysis"] == ""
+    assert pairs[2]["answer"] == "row 7" and pairs[2]["analysis"] == "Sorted by b"
+
+
+def baseline_read_docx(filepath):
+    """The original python-docx reader, kept as a reference"""
+    import docx
+
+    doc = docx.Document(filepath)
+    paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
+    table_texts = []
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
+            if row_text:
+                table_texts.append(row_text)
+    full_text = "\n".join(paragraphs)
+    if table_texts:
+        full_text += "\n\nTables:\n" + "\n".join(table_texts)
+    return full_text
+
+
+def test_read_docx_matches_python_docx(ingestion, tmp_path):
+    docx = pytest.importorskip("docx")
+
+    document = docx.Document()
+    document.add_paragraph("First paragraph")
+    document.add_paragraph("")
+    run = document.add_paragraph("Tabbed").add_run()
+    run.add_tab()
+    run.add_text("after tab")
+    run.add_break()
+    run.add_text("next line")
+    table = document.add_table(rows=2, cols=3)
+    table.cell(0, 0).text = "name"
+    table.cell(0, 1).text = "score"
+    table.cell(1, 0).text = "alice"
+    table.cell(1, 2).add_paragraph("second line")
+    document.add_paragraph("After the table")
+    path = tmp_path / "doc.docx"
+    document.save(path)
+
+    assert ingestion.read_docx(str(path)) == baseline_read_docx(str(path))
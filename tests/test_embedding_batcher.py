@@ -0,0 +1,37 @@
+"""
+Tests for the embedding request batcher
+"""
+import numpy as np
+import pytest
+
+from src.utils.embedding_batcher import EmbeddingBatcher
+
+
+def test_short_response_fails_batch_and_keeps_worker():
+    calls = []
+
+    def embed_batch(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            return np.zeros((len(texts) - 1, 4), dtype=np.float32)  # One row short
+        return np.arange(len(texts) * 4, dtype=np.float32).reshape(len(texts), 4)
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=0)
+
+    with pytest.raises(ValueError):
+        batcher.embed("first", timeout=5)
+
+    # The worker survived and serves later requests
+    np.testing.assert_array_equal(batcher.embed("second", timeout=5), [0, 1, 2, 3])
+    assert len(calls) == 2
+
+
+def test_embed_batch_error_reaches_caller():
+    def embed_batch(texts):
+        raise RuntimeError("quota exceeded")
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        batcher.embed("text", timeout=5)
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        batcher.embed("text", timeout=5)
@@ -0,0 +1,54 @@
+"""
+Tests for int8 embedding quantization and the persistent embedding cache
+"""
+import numpy as np
+import pytest
+
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.quantize import pack_int8, unpack_int8
+
+DIMENSION = 64
+
+
+def _vectors(count, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+
+def test_int8_round_trip_error_is_bounded():
+    for vector in _vectors(20):
+        blob = pack_int8(vector)
+        assert len(blob) == 4 + DIMENSION
+        restored = unpack_int8(blob)
+        assert restored.dtype == np.float32 and restored.shape == vector.shape
+        # Rounding to the nearest code is off by at most half a step
+        step = np.abs(vector).max() / 127
+        assert np.abs(restored - vector).max() <= step / 2 + 1e-6
+        cosine = restored @ vector / (np.linalg.norm(restored) * np.linalg.norm(vector))
+        assert cosine > 0.999
+
+
+def test_int8_zero_vector():
+    assert not unpack_int8(pack_int8(np.zeros(DIMENSION))).any()
+
+
+@pytest.mark.parametrize("int8", [False, True])
+def test_cache_round_trip_through_sqlite(tmp_path, int8):
+    path = tmp_path / "embeddings.sqlite"
+    writer = EmbeddingCache(path, model="m", int8=int8)
+    vectors = _vectors(3)
+    keys = [writer.key(f"text {i}") for i in range(3)]
+    writer.put_many(zip(keys, vectors))
+
+    # A fresh instance has an empty LRU, so every hit is decoded from disk
+    reader = EmbeddingCache(path, model="m")
+    found = reader.get_many(keys + [reader.key("unseen")])
+    assert set(found) == set(keys)
+    for key, vector in zip(keys, vectors):
+        assert not found[key].flags.writeable
+        if int8:
+            np.testing.assert_allclose(found[key], vector, atol=np.abs(vector).max() / 127)
+        else:
+            np.testing.assert_array_equal(found[key], vector)
+
+    # Vectors belong to one model only
+    assert EmbeddingCache(path, model="other").get(keys[0]) is None
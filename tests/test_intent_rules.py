@@ -0,0 +1,50 @@
+"""
+Tests for the rule-based intent fast path
+"""
+from src.utils.intent_rules import rule_parse
+
+CSV_METADATA = [
+    {"file_id": "sales", "numeric_columns": ["price", "Units"]},
+    {"file_id": "staff", "numeric_columns": ["salary", "units"]},
+]
+
+
+def test_top_n():
+    assert rule_parse("Show me the top 5 by price?", CSV_METADATA) == {
+        "intent": "top_n",
+        "parameters": {"column": "price", "n": 5, "ascending": False, "file_id": "sales"}
+    }
+    assert rule_parse("lowest 3 rows by salary", CSV_METADATA)["parameters"]["ascending"] is True
+
+
+def test_sort():
+    assert rule_parse("sort by salary desc", CSV_METADATA) == {
+        "intent": "sort",
+        "parameters": {"column": "salary", "ascending": False, "file_id": "staff", "limit": None}
+    }
+    assert rule_parse("order by price", CSV_METADATA)["parameters"]["ascending"] is True
+
+
+def test_filter():
+    assert rule_parse("rows where price >= 10.5", CSV_METADATA) == {
+        "intent": "filter_threshold",
+        "parameters": {"column": "price", "operator": ">=", "value": 10.5, "file_id": "sales"}
+    }
+    assert rule_parse("filter where salary = -3", CSV_METADATA)["parameters"]["operator"] == "=="
+
+
+def test_average():
+    assert rule_parse("What is the average of salary?", CSV_METADATA) == {
+        "intent": "compare_averages",
+        "parameters": {"column": "salary", "file1_id": "staff", "file2_id": None, "group_by": None}
+    }
+
+
+def test_defers_to_the_llm():
+    # Unknown column, a column in several files (case-insensitive), n of zero,
+    # free-form wording and no loaded files all go to the model
+    assert rule_parse("top 5 by revenue", CSV_METADATA) is None
+    assert rule_parse("top 5 by units", CSV_METADATA) is None
+    assert rule_parse("top 0 by price", CSV_METADATA) is None
+    assert rule_parse("why did prices go up in march?", CSV_METADATA) is None
+    assert rule_parse("top 5 by price", []) is None
@@ -0,0 +1,126 @@
+"""
+Tests for the numeric helpers, with and without the optional accelerators
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.settings import settings
+from src.utils import numeric
+from src.utils.numeric import (
+    COMPARATORS,
+    prune_threshold,
+    sorted_threshold_range,
+    summary_stats,
+    threshold_mask
+)
+
+OPERATORS = list(COMPARATORS)
+
+COLUMNS = {
+    "plain": np.array([3.5, -1.0, 2.0, 8.25, 0.0, 2.0]),
+    "with_nan": np.array([np.nan, 4.0, 1.5, np.nan, -2.0, 7.0]),
+    "all_nan": np.array([np.nan, np.nan]),
+    "single": np.array([5.0]),
+    "empty": np.array([], dtype=np.float64),
+    "ints": np.arange(-5, 6, dtype=np.int64),
+}
+
+
+@pytest.fixture(params=["numpy", "bottleneck"])
+def stats_backend(request, monkeypatch):
+    """Run summary_stats through the NumPy fallback and through bottleneck"""
+    if request.param == "numpy":
+        monkeypatch.setattr(numeric, "bn", None)
+    else:
+        monkeypatch.setattr(numeric, "bn", pytest.importorskip("bottleneck"))
+    return request.param
+
+
+@pytest.fixture(params=["numpy", "numexpr"])
+def mask_backend(request, monkeypatch):
+    """Run threshold_mask through NumPy ufuncs and through numexpr"""
+    if request.param == "numpy":
+        monkeypatch.setattr(numeric, "ne", None)
+    else:
+        monkeypatch.setattr(numeric, "ne", pytest.importorskip("numexpr"))
+        monkeypatch.setattr(type(settings), "NUMEXPR_MIN_ROWS", 0)
+    return request.param
+
+
+def _pandas_stats(values):
+    series = pd.Series(values, dtype=np.float64)
+    return series.mean(), series.std(), series.min(), series.max()
+
+
+@pytest.mark.parametrize("name", COLUMNS)
+def test_summary_stats_matches_pandas(stats_backend, name):
+    values = COLUMNS[name]
+    np.testing.assert_allclose(summary_stats(values), _pandas_stats(values), rtol=1e-12, equal_nan=True)
+
+
+def test_nan_mean_matches_pandas(stats_backend):
+    for values in COLUMNS.values():
+        expected = pd.Series(values, dtype=np.float64).mean()
+        np.testing.assert_allclose(numeric.nan_mean(values), expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("operator", OPERATORS)
+@pytest.mark.parametrize("name", ["plain", "with_nan", "ints"])
+@pytest.mark.parametrize("threshold", [2.0, -10, 100, np.nan])
+def test_threshold_mask_matches_pandas(mask_backend, operator, name, threshold):
+    values = COLUMNS[name]
+    expected = COMPARATORS[operator](pd.Series(values), threshold).to_numpy()
+    mask = threshold_mask(values, operator, threshold)
+    assert mask.dtype == np.bool_
+    np.testing.assert_array_equal(mask, expected)
+
+
+@pytest.mark.parametrize("operator", OPERATORS)
+def test_threshold_mask_nullable_column(mask_backend, operator):
+    # Extension dtypes stay on the pandas path; missing values never match
+    series = pd.Series([1, None, 3, 4], dtype="Int64")
+    mask = threshold_mask(series, operator, 3).to_numpy(dtype=bool, na_value=False)
+    expected = COMPARATORS[operator](np.array([1, 3, 4]), 3)
+    np.testing.assert_array_equal(mask[[0, 2, 3]], expected)
+    assert not mask[1]
+
+
+def test_threshold_mask_rejects_unknown_operator():
+    with pytest.raises(ValueError):
+        threshold_mask(COLUMNS["plain"], "=>", 1.0)
+
+
+@pytest.mark.parametrize("operator", OPERATORS)
+def test_sorted_threshold_range_matches_scan(operator):
+    values = np.array([-3.0, -1.0, 0.0, 0.0, 2.0, 2.0, 2.0, 5.0])
+    for threshold in [-5.0, -3.0, 0.0, 1.0, 2.0, 5.0, 9.0, np.nan]:
+        bounds = sorted_threshold_range(values, operator, threshold)
+        expected = COMPARATORS[operator](values, threshold)
+        if operator == '!=':
+            assert bounds is None
+            continue
+        start, stop = bounds
+        selected = np.zeros(values.size, dtype=bool)
+        selected[start:stop] = True
+        np.testing.assert_array_equal(selected, expected)
+
+
+@pytest.mark.parametrize("operator", OPERATORS)
+@pytest.mark.parametrize("name", ["plain", "with_nan", "single", "ints"])
+def test_prune_threshold_agrees_with_scan(operator, name):
+    values = COLUMNS[name].astype(np.float64)
+    present = values[~np.isnan(values)]
+    low, high, has_nan = present.min(), present.max(), bool(np.isnan(values).any())
+    for threshold in [low - 1, low, (low + high) / 2, high, high + 1, np.nan]:
+        decided = prune_threshold(low, high, has_nan, operator, threshold)
+        mask = COMPARATORS[operator](values, threshold)
+        if decided is True:
+            assert mask.all()
+        elif decided is False:
+            assert not mask.any()
+    # Thresholds past the range on the non-matching side need no scan
+    assert any(
+        prune_threshold(low, high, has_nan, operator, threshold) is not None
+        for threshold in (low - 1, high + 1)
+    )
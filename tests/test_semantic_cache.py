@@ -0,0 +1,85 @@
+"""
+Tests for the embedding-keyed response cache and its lookup structures
+"""
+import numpy as np
+import pytest
+
+from src.utils import semantic_cache as semantic_cache_module
+from src.utils.semantic_cache import SemanticCache
+
+DIMENSION = 32
+
+LOOKUPS = {
+    "scan": {},
+    "lsh": {"lsh_tables": 8, "lsh_bits": 4},
+    "hnsw": {"hnsw_m": 8},
+}
+
+
+def _unit_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _paraphrase(vector, seed=1):
+    """A nearby vector (cosine similarity well above 0.95)"""
+    noise = np.random.default_rng(seed).standard_normal(DIMENSION).astype(np.float32)
+    return vector + 0.02 * noise
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize("lookup", LOOKUPS)
+def test_hits_paraphrases_and_misses_unrelated_queries(lookup):
+    cache = SemanticCache(threshold=0.95, ttl_seconds=None, **LOOKUPS[lookup])
+    vectors = _unit_vectors(50)
+    for i, vector in enumerate(vectors):
+        cache.set("files-a", vector * 3.0, f"answer {i}")  # Stored vectors are normalized
+
+    for i in (0, 17, 49):
+        assert cache.get("files-a", _paraphrase(vectors[i], seed=i)) == f"answer {i}"
+    assert cache.get("files-a", _unit_vectors(1, seed=99)[0]) is None
+    assert cache.get("files-b", vectors[0]) is None
+
+
+@pytest.mark.parametrize("lookup", LOOKUPS)
+def test_evicts_oldest_entries(lookup):
+    cache = SemanticCache(max_entries=10, ttl_seconds=None, **LOOKUPS[lookup])
+    vectors = _unit_vectors(35)
+    for i, vector in enumerate(vectors):
+        cache.set("ns", vector, i)
+
+    # Enough churn for the HNSW graph to be rebuilt from the live entries
+    assert all(cache.get("ns", vector) is None for vector in vectors[:25])
+    assert [cache.get("ns", vector) for vector in vectors[25:]] == list(range(25, 35))
+
+
+@pytest.mark.parametrize("lookup", LOOKUPS)
+def test_expires_entries(lookup, clock):
+    cache = SemanticCache(ttl_seconds=60, **LOOKUPS[lookup])
+    old, new = _unit_vectors(2)
+    cache.set("ns", old, "old")
+    clock[0] += 45
+    cache.set("ns", new, "new")
+    clock[0] += 30
+    assert cache.get("ns", old) is None
+    assert cache.get("ns", new) == "new"
+
+
+def test_lsh_and_hnsw_agree_with_a_full_scan():
+    vectors = _unit_vectors(200, seed=3)
+    queries = [_paraphrase(vectors[i], seed=i) for i in range(0, 200, 7)]
+    caches = {lookup: SemanticCache(ttl_seconds=None, **options) for lookup, options in LOOKUPS.items()}
+    for cache in caches.values():
+        for i, vector in enumerate(vectors):
+            cache.set("ns", vector, i)
+
+    expected = [caches["scan"].get("ns", query) for query in queries]
+    assert None not in expected
+    for lookup in ("lsh", "hnsw"):
+        assert [caches[lookup].get("ns", query) for query in queries] == expected
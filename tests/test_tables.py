@@ -0,0 +1,62 @@
+"""
+Tests for result table helpers
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.tables import (
+    columnar_table,
+    gather_table,
+    table_length,
+    table_rows,
+    table_to_dataframe
+)
+
+
+def test_columnar_table_round_trip():
+    df = pd.DataFrame({"name": ["a", "b"], "score": [1.5, 2.0], "n": [1, 2]})
+    table = columnar_table(df, {"_rank": [1, 2]})
+
+    assert table["columns"] == ["name", "score", "n", "_rank"]
+    assert table_length(table) == 2
+    assert table_rows(table) == [
+        {"name": "a", "score": 1.5, "n": 1, "_rank": 1},
+        {"name": "b", "score": 2.0, "n": 2, "_rank": 2},
+    ]
+    assert table_rows(table, limit=1) == table_rows(table)[:1]
+    # Values are Python scalars, as df.to_dict('records') produced
+    assert type(table["data"]["n"][0]) is int
+    pd.testing.assert_frame_equal(table_to_dataframe(table), df.assign(_rank=[1, 2]))
+
+
+def test_columnar_table_rejects_duplicate_columns():
+    df = pd.DataFrame([[1, 2]], columns=["a", "a"])
+    with pytest.raises(ValueError, match="Duplicate"):
+        columnar_table(df)
+
+
+def test_extra_columns_must_not_clash():
+    df = pd.DataFrame({"a": [1]})
+    with pytest.raises(ValueError, match="clash"):
+        columnar_table(df, {"a": [2]})
+    with pytest.raises(ValueError, match="clash"):
+        gather_table({"a": np.array([1, 2])}, [0], {"a": [9]})
+
+
+def test_gather_table_matches_row_selection():
+    columns = {"x": np.array([10, 20, 30]), "y": np.array(["p", "q", "r"], dtype=object)}
+    table = gather_table(columns, [2, 0], {"_score": [0.9, 0.1]})
+
+    assert table_rows(table) == [
+        {"x": 30, "y": "r", "_score": 0.9},
+        {"x": 10, "y": "p", "_score": 0.1},
+    ]
+    assert table_length(gather_table(columns, [])) == 0
+
+
+def test_row_oriented_tables_pass_through():
+    rows = [{"a": 1}, {"a": 2}]
+    assert table_length(rows) == 2
+    assert table_rows(rows, limit=1) == [{"a": 1}]
+    assert table_to_dataframe(rows).equals(pd.DataFrame(rows))
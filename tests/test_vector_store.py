@@ -0,0 +1,69 @@
+"""
+Tests for saving, loading and extending vector stores
+"""
+import faiss
+import numpy as np
+import pytest
+
+from config.settings import settings
+from src.utils.models import VectorMetadata
+from src.vectordb.vector_store import VectorStore
+
+DIMENSION = 32
+
+
+def _metadata(count: int, start: int = 0):
+    return [
+        VectorMetadata(file_id="data", row_idx=i, original_text=f"row {i}")
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.fixture
+def ivf_settings(tmp_path, monkeypatch):
+    """Write stores to tmp_path and use IVF indexes from 500 vectors"""
+    # Paths and knobs are read through the class by the settings classmethods
+    monkeypatch.setattr(type(settings), "VECTOR_DIR", tmp_path)
+    monkeypatch.setattr(type(settings), "IVF_MIN_VECTORS", 500)
+    monkeypatch.setattr(type(settings), "IVF_TRAINING_POINTS_PER_LIST", 39)
+
+
+@pytest.mark.parametrize("quantization", ["fp32", "sq8"])
+def test_add_to_loaded_ivf_store(ivf_settings, quantization):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((600, DIMENSION), dtype=np.float32)
+
+    store = VectorStore(DIMENSION, quantization)
+    store.add_vectors(vectors, _metadata(600))
+    assert isinstance(store.index, faiss.IndexIVF)
+    store.save("ivf")
+
+    loaded = VectorStore.load("ivf")
+    assert loaded.quantization == quantization
+    extra = rng.random((5, DIMENSION), dtype=np.float32)
+    loaded.add_vectors(extra, _metadata(5, start=600))
+    assert loaded.size() == 605
+
+    results = loaded.search(extra[0], k=1)
+    assert results[0][0].row_idx == 600
+
+    # Saving the extended store and loading it again keeps every vector
+    loaded.save("ivf")
+    reloaded = VectorStore.load("ivf")
+    assert reloaded.size() == 605
+    assert reloaded.search(extra[1], k=1)[0][0].row_idx == 601
+
+
+def test_resave_loaded_ivf_store(ivf_settings):
+    rng = np.random.default_rng(1)
+    vectors = rng.random((600, DIMENSION), dtype=np.float32)
+
+    store = VectorStore(DIMENSION, "fp32")
+    store.add_vectors(vectors, _metadata(600))
+    store.save("ivf")
+
+    VectorStore.load("ivf").save("ivf")
+    reloaded = VectorStore.load("ivf")
+    assert reloaded.size() == 600
+    assert reloaded.search(vectors[7], k=1)[0][0].row_idx == 7
+